@@ -0,0 +1,295 @@
+import os
+import math
+import numpy as np
+
+# Lado máximo (em pixels) da imagem reduzida usada na análise
+LADO_MAXIMO_ANALISE = int(os.environ.get('IMAGEM_LADO_MAXIMO_ANALISE', 2000))
+
+# Memória máxima (em bytes) usada para decodificar uma imagem ou uma faixa dela
+MEMORIA_MAXIMA_IMAGEM = int(os.environ.get('IMAGEM_MEMORIA_MAXIMA', 128 * 1024 * 1024))
+
+# Quantidade máxima de quadros (páginas) analisados em um TIFF
+MAX_QUADROS_IMAGEM = int(os.environ.get('IMAGEM_MAX_QUADROS', 20))
+
+# Fração mínima da largura (ou altura) ocupada por uma linha da moldura do desenho
+FRACAO_MOLDURA = 0.5
+
+# Fração mínima da moldura ocupada por um membro dominante (linha longa)
+FRACAO_MEMBRO = 0.3
+
+# Fração de pixels escuros abaixo da qual uma linha ou coluna é considerada vazia
+FRACAO_RUIDO = 0.002
+
+# Membros dominantes retornados por direção
+MAX_MEMBROS = 20
+
+# Tag ResolutionUnit do TIFF
+TAG_UNIDADE_RESOLUCAO = 296
+
+# Bits por pixel dos modos brutos que podem ser decodificados em faixas
+_BITS_POR_PIXEL = {
+    '1': 1, '1;I': 1, 'L': 8, 'L;I': 8, 'P': 8, 'LA': 16,
+    'RGB': 24, 'BGR': 24, 'RGBA': 32, 'RGBX': 32, 'BGRX': 32, 'CMYK': 32
+}
+
+class ImagemMuitoGrande(Exception):
+    """A imagem não pode ser decodificada dentro do limite de memória"""
+
+def ler_cabecalho(imagem):
+    """
+    Informações da imagem lidas apenas do cabeçalho (Image.open não
+    decodifica os pixels): formato, modo, tamanho, quadros e resolução.
+
+    A resolução é None quando o arquivo não a informa: o Pillow devolve
+    dpi (1, 1) para TIFF sem as tags de resolução, e resoluções de até
+    1 dpi (ou TIFF sem ResolutionUnit) não são uma escala real.
+    """
+    largura, altura = imagem.size
+    dpi = imagem.info.get('dpi')
+    if dpi and (min(dpi) <= 1 or (imagem.format == 'TIFF' and TAG_UNIDADE_RESOLUCAO not in imagem.tag_v2)):
+        dpi = None
+    return {
+        'formato': imagem.format,
+        'modo': imagem.mode,
+        'largura_px': largura,
+        'altura_px': altura,
+        'quadros': getattr(imagem, 'n_frames', 1),
+        'dpi': [float(valor) for valor in dpi] if dpi else None
+    }
+
+def _bytes_por_pixel(modo):
+    """Bytes por pixel da imagem decodificada na memória do Pillow"""
+    if modo in ('1', 'L', 'P'):
+        return 1
+    if modo.startswith('I;16'):
+        return 2
+    return 4
+
+def _fator_reducao(largura, altura):
+    return max(1, math.ceil(max(largura, altura) / LADO_MAXIMO_ANALISE))
+
+def _tiles_em_faixas(imagem):
+    """
+    Retorna os tiles da imagem com o stride de cada um se ela puder ser
+    decodificada em faixas horizontais (dados sem compressão, como BMP e
+    TIFF sem compressão), ou None.
+    """
+    largura = imagem.size[0]
+    tiles = []
+    for tile in imagem.tile:
+        codec, (x0, y0, x1, y1), offset, args = tile
+        if codec != 'raw' or x0 != 0 or x1 != largura or not isinstance(args, tuple) or len(args) != 3:
+            return None
+        modo_bruto, stride, orientacao = args
+        if modo_bruto not in _BITS_POR_PIXEL or orientacao not in (1, -1):
+            return None
+        if not stride:
+            stride = (largura * _BITS_POR_PIXEL[modo_bruto] + 7) // 8
+        tiles.append((y0, y1, offset, modo_bruto, stride, orientacao))
+    if not tiles or (len(tiles) > 1 and any(tile[5] != 1 for tile in tiles)):
+        return None
+    return tiles
+
+def _decodificar_em_faixas(fonte, modo, tamanho, tiles, fator):
+    """
+    Decodifica a imagem em faixas horizontais (altura múltipla do fator de
+    redução), lendo os bytes de cada faixa diretamente do arquivo e
+    reduzindo-a em seguida; a memória usada é limitada pela faixa.
+    """
+    from PIL import Image
+
+    largura, altura = tamanho
+    altura_faixa = MEMORIA_MAXIMA_IMAGEM // (2 * largura * _bytes_por_pixel(modo))
+    altura_faixa = (altura_faixa // fator) * fator
+    if altura_faixa == 0:
+        raise ImagemMuitoGrande(f'Imagem de {largura}x{altura} pixels excede o limite de memória para análise')
+
+    faixas = []
+    for inicio in range(0, altura, altura_faixa):
+        fim = min(inicio + altura_faixa, altura)
+        faixa = Image.new(modo, (largura, fim - inicio))
+        for y0, y1, offset, modo_bruto, stride, orientacao in tiles:
+            a, b = max(inicio, y0), min(fim, y1)
+            if a >= b:
+                continue
+            # Linhas de baixo para cima (BMP): o trecho começa pela linha b - 1
+            fonte.seek(offset + ((a - y0) if orientacao == 1 else (y1 - b)) * stride)
+            dados = fonte.read((b - a) * stride)
+            trecho = Image.frombytes(modo, (largura, b - a), dados, 'raw', modo_bruto, stride, orientacao)
+            faixa.paste(trecho, (0, a - inicio))
+        faixas.append(np.asarray(_converter_cinza(faixa).reduce(fator)))
+    return np.vstack(faixas)
+
+def _converter_cinza(imagem):
+    """Converte a imagem decodificada para tons de cinza (modo L)"""
+    if imagem.mode == 'L':
+        return imagem
+    if imagem.mode in ('I;16', 'I;16B', 'I;16L', 'I'):
+        # Normalizar a faixa de 16 bits para 0-255
+        return imagem.convert('I').point(lambda valor: valor * (1 / 256)).convert('L')
+    return imagem.convert('L')
+
+def decodificar_reduzida(fonte, quadro=0):
+    """
+    Decodifica um quadro da imagem em tons de cinza, reduzido para que o
+    maior lado tenha no máximo LADO_MAXIMO_ANALISE pixels.
+
+    - JPEG: modo rascunho (draft), que decodifica já em escala reduzida
+    - dados sem compressão (BMP, TIFF): decodificação em faixas
+    - demais formatos: decodificação completa, se couber em
+      MEMORIA_MAXIMA_IMAGEM, seguida de reduce
+
+    fonte é o arquivo binário da imagem. Retorna a tupla (matriz uint8,
+    fator de redução). Levanta ImagemMuitoGrande se a imagem não couber no
+    limite de memória.
+    """
+    from PIL import Image
+
+    fonte.seek(0)
+    with Image.open(fonte) as imagem:
+        imagem.seek(quadro)
+        largura, altura = imagem.size
+        fator = _fator_reducao(largura, altura)
+
+        if imagem.format == 'JPEG' and fator > 1:
+            imagem.draft('L', (largura // fator, altura // fator))
+        else:
+            tiles = _tiles_em_faixas(imagem)
+            if tiles is not None and largura * altura * _bytes_por_pixel(imagem.mode) > MEMORIA_MAXIMA_IMAGEM // 2:
+                cinza = _decodificar_em_faixas(fonte, imagem.mode, imagem.size, tiles, fator)
+                return cinza, largura / cinza.shape[1]
+
+        largura_decodificada, altura_decodificada = imagem.size
+        if 2 * largura_decodificada * altura_decodificada * _bytes_por_pixel(imagem.mode) > MEMORIA_MAXIMA_IMAGEM:
+            raise ImagemMuitoGrande(f'Imagem de {largura}x{altura} pixels excede o limite de memória para análise')
+
+        cinza = _converter_cinza(imagem)
+        # Fator restante após o rascunho (o JPEG reduz em potências de 2)
+        fator_restante = _fator_reducao(largura_decodificada, altura_decodificada)
+        if fator_restante > 1:
+            cinza = cinza.reduce(fator_restante)
+        return np.asarray(cinza), largura / cinza.size[0]
+
+def limiar_otsu(cinza):
+    """Limiar de Otsu calculado pelo histograma (separa traço e fundo)"""
+    histograma = np.bincount(cinza.ravel(), minlength=256).astype(np.float64)
+    probabilidades = histograma / histograma.sum()
+    peso = np.cumsum(probabilidades)
+    media = np.cumsum(probabilidades * np.arange(256))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variancia = (media[-1] * peso - media) ** 2 / (peso * (1 - peso))
+    variancia[~np.isfinite(variancia)] = -1
+    if variancia.max() <= 0:
+        return None
+    return int(np.argmax(variancia))
+
+def _trechos(mascara):
+    """Início e fim (exclusivo) de cada sequência de valores True"""
+    bordas = np.diff(np.concatenate(([0], mascara.astype(np.int8), [0])))
+    return np.flatnonzero(bordas == 1), np.flatnonzero(bordas == -1)
+
+def _membros(projecao, deslocamento, escala):
+    """Linhas longas agrupadas em membros: posição, espessura e extensão"""
+    inicios, fins = _trechos(projecao >= FRACAO_MEMBRO)
+    membros = [{
+        'posicao_px': round(float((deslocamento + (inicio + fim - 1) / 2) * escala), 1),
+        'espessura_px': round(float((fim - inicio) * escala), 1),
+        'extensao': round(float(projecao[inicio:fim].max()), 3)
+    } for inicio, fim in zip(inicios, fins)]
+    membros.sort(key=lambda membro: (-membro['extensao'], membro['posicao_px']))
+    return membros[:MAX_MEMBROS]
+
+def analisar_projecoes(cinza, escala=1.0):
+    """
+    Encontra a moldura do desenho e os membros dominantes (linhas longas
+    horizontais e verticais) pelas projeções dos pixels escuros em cada
+    linha e coluna. escala converte pixels da matriz em pixels originais.
+
+    A moldura vem das linhas que ocupam ao menos FRACAO_MOLDURA da imagem;
+    sem elas, do contorno dos traços; sem traços, da imagem inteira.
+    """
+    altura, largura = cinza.shape
+    limiar = limiar_otsu(cinza)
+    tinta = cinza <= limiar if limiar is not None else cinza < 128
+    # Desenhos em negativo (traço claro sobre fundo escuro)
+    if tinta.mean() > 0.5:
+        tinta = ~tinta
+
+    linhas = tinta.mean(axis=1)
+    colunas = tinta.mean(axis=0)
+
+    fonte = 'moldura'
+    bordas_h = np.flatnonzero(linhas >= FRACAO_MOLDURA)
+    bordas_v = np.flatnonzero(colunas >= FRACAO_MOLDURA)
+    if (len(bordas_h) < 2 or bordas_h[-1] - bordas_h[0] < altura * 0.1 or
+            len(bordas_v) < 2 or bordas_v[-1] - bordas_v[0] < largura * 0.1):
+        fonte = 'contorno'
+        bordas_h = np.flatnonzero(linhas > FRACAO_RUIDO)
+        bordas_v = np.flatnonzero(colunas > FRACAO_RUIDO)
+        if len(bordas_h) < 2 or len(bordas_v) < 2:
+            fonte = 'imagem'
+            bordas_h = np.array([0, altura - 1])
+            bordas_v = np.array([0, largura - 1])
+
+    topo, base = int(bordas_h[0]), int(bordas_h[-1])
+    esquerda, direita = int(bordas_v[0]), int(bordas_v[-1])
+
+    # Membros dentro da moldura (excluindo as próprias linhas da moldura)
+    if fonte == 'moldura':
+        topo_interno = topo + int(np.argmax(linhas[topo:] < FRACAO_MOLDURA))
+        base_interna = base - int(np.argmax(linhas[base::-1] < FRACAO_MOLDURA))
+        esquerda_interna = esquerda + int(np.argmax(colunas[esquerda:] < FRACAO_MOLDURA))
+        direita_interna = direita - int(np.argmax(colunas[direita::-1] < FRACAO_MOLDURA))
+    else:
+        topo_interno, base_interna, esquerda_interna, direita_interna = topo, base, esquerda, direita
+
+    interior = tinta[topo_interno:base_interna + 1, esquerda_interna:direita_interna + 1]
+    if interior.size:
+        horizontais = _membros(interior.mean(axis=1), topo_interno, escala)
+        verticais = _membros(interior.mean(axis=0), esquerda_interna, escala)
+    else:
+        horizontais = verticais = []
+
+    return {
+        'fonte': fonte,
+        'moldura_px': {
+            'esquerda': round(esquerda * escala),
+            'topo': round(topo * escala),
+            'largura': round((direita - esquerda + 1) * escala),
+            'altura': round((base - topo + 1) * escala)
+        },
+        'membros_horizontais': horizontais,
+        'membros_verticais': verticais
+    }
+
+def analisar_imagem(arquivo):
+    """
+    Analisa uma imagem (caminho ou arquivo binário aberto) quadro a
+    quadro, com memória limitada independentemente da resolução.
+
+    Retorna o cabeçalho da imagem e, para cada quadro analisado (até
+    MAX_QUADROS_IMAGEM), a moldura e os membros em pixels originais.
+    """
+    from PIL import Image
+
+    if isinstance(arquivo, (str, os.PathLike)):
+        with open(arquivo, 'rb') as fonte:
+            return analisar_imagem(fonte)
+
+    try:
+        with Image.open(arquivo) as imagem:
+            cabecalho = ler_cabecalho(imagem)
+
+        quadros = []
+        for quadro in range(min(cabecalho['quadros'], MAX_QUADROS_IMAGEM)):
+            cinza, escala = decodificar_reduzida(arquivo, quadro)
+            analise = analisar_projecoes(cinza, escala)
+            analise['quadro'] = quadro
+            analise['fator_reducao'] = round(escala, 3)
+            quadros.append(analise)
+            del cinza
+    except Image.DecompressionBombError as e:
+        raise ImagemMuitoGrande(str(e))
+
+    cabecalho['quadros_analisados'] = len(quadros)
+    return cabecalho, quadros
@@ -1,6 +1,7 @@
-from flask import Flask, render_template
+from flask import Flask, render_template, jsonify
 from dotenv import load_dotenv
 import os
+import time
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -16,18 +17,75 @@ def create_app():
     # Configuração do banco de dados
     app.config['DATABASE'] = os.environ.get('DATABASE_URL', 'serralheria.db')
     
+    # Limites de upload: tamanho máximo da requisição e tamanho até o qual
+    # o arquivo enviado é mantido em memória (acima disso vai para o disco)
+    app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))
+    app.config['UPLOAD_LIMITE_MEMORIA'] = int(os.environ.get('UPLOAD_LIMITE_MEMORIA', 2 * 1024 * 1024))
+    
+    # Cache em disco dos PDFs de orçamentos
+    app.config['PDF_CACHE_FOLDER'] = os.environ.get('PDF_CACHE_FOLDER', 'cache_pdf')
+    app.config['PDF_CACHE_MAX_BYTES'] = int(os.environ.get('PDF_CACHE_MAX_BYTES', 100 * 1024 * 1024))
+    
+    # Cache das análises de documentos no banco (tamanho em bytes, idade em segundos)
+    app.config['ANALISES_CACHE_MAX_BYTES'] = int(os.environ.get('ANALISES_CACHE_MAX_BYTES', 50 * 1024 * 1024))
+    app.config['ANALISES_CACHE_MAX_IDADE'] = int(os.environ.get('ANALISES_CACHE_MAX_IDADE', 30 * 24 * 3600))
+    
+    # Pool de tarefas pesadas (PDF e análise de documentos); 0 processos = executar na própria thread
+    app.config['TAREFAS_MAX_PROCESSOS'] = int(os.environ.get('TAREFAS_MAX_PROCESSOS', 2))
+    app.config['TAREFAS_MAX_FILA'] = int(os.environ.get('TAREFAS_MAX_FILA', 16))
+    app.config['TAREFAS_TEMPO_LIMITE'] = int(os.environ.get('TAREFAS_TEMPO_LIMITE', 120))
+    
+    # Perfil de requisições sob demanda (ver perfilamento.py): fração das
+    # requisições amostradas e chave das assinaturas do cabeçalho X-Perfil.
+    # Sem nenhum dos dois, o middleware não é instalado
+    app.config['PERFIL_AMOSTRAGEM'] = float(os.environ.get('PERFIL_AMOSTRAGEM', 0))
+    app.config['PERFIL_CHAVE'] = os.environ.get('PERFIL_CHAVE', '')
+    app.config['PERFIL_DIR'] = os.environ.get('PERFIL_DIR', 'perfis')
+    app.config['PERFIL_MAX_ARQUIVOS'] = int(os.environ.get('PERFIL_MAX_ARQUIVOS', 40))
+    
+    # Tempos de cada fase da inicialização (em segundos)
+    tempos = {}
+    inicio = time.perf_counter()
+    
     # Registrar blueprints
-    from routes.main import main_bp
+    from routes.main import main_bp, inicializar_banco, get_classificador
     from routes.api import api_bp
+    import banco_dados
+    import metricas
+    import perfilamento
     
     app.register_blueprint(main_bp)
     app.register_blueprint(api_bp, url_prefix='/api')
+    metricas.init_app(app)
+    perfilamento.init_app(app)
+    tempos['importacao'] = time.perf_counter() - inicio
+    
+    # Carregar o modelo de classificação (pode ser adiado para a primeira requisição)
+    if os.environ.get('CARREGAR_MODELO_NA_INICIALIZACAO', 'true').lower() == 'true':
+        fase = time.perf_counter()
+        get_classificador()
+        tempos['carregamento_modelo'] = time.perf_counter() - fase
+    
+    # Inicializar o banco de dados
+    fase = time.perf_counter()
+    banco_dados.init_app(app)
+    inicializar_banco(app.config['DATABASE'])
+    tempos['banco_dados'] = time.perf_counter() - fase
+    
+    tempos['total'] = time.perf_counter() - inicio
+    app.config['TEMPOS_INICIALIZACAO'] = tempos
+    app.logger.info('Inicialização: %s', ', '.join(f'{nome}={valor * 1000:.1f}ms' for nome, valor in tempos.items()))
     
     # Manipuladores de erro
     @app.errorhandler(404)
     def page_not_found(e):
         return render_template('errors/404.html'), 404
     
+    @app.errorhandler(413)
+    def request_entity_too_large(e):
+        limite = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+        return jsonify({'error': f'Arquivo muito grande (máximo {limite}MB)'}), 413
+    
     @app.errorhandler(500)
     def internal_server_error(e):
         return render_template('errors/500.html'), 500
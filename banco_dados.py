@@ -0,0 +1,172 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, current_app, has_app_context
+
+# Banco usado quando não há configuração (ou fora de um contexto de aplicação)
+CAMINHO_PADRAO = 'serralheria.db'
+
+# Pragmas aplicados uma única vez, quando a conexão é aberta
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA mmap_size=268435456',
+)
+
+# Quantidade de comandos SQL preparados mantidos em cache por conexão
+TAMANHO_CACHE_COMANDOS = 256
+
+# Conexões abertas por thread (e por processo, ver get_db_connection)
+_local = threading.local()
+
+class CursorContado(sqlite3.Cursor):
+    """
+    Cursor que registra os comandos executados nos contadores ativos da
+    thread (ver contar_consultas) e, durante uma medição (ver
+    iniciar_medicao), soma sua quantidade e tempo de execução.
+    executemany conta como um único comando.
+    """
+
+    def execute(self, sql, parametros=()):
+        return self._registrar(super().execute, sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self._registrar(super().executemany, sql, parametros)
+
+    def _registrar(self, executar, sql, parametros):
+        for consultas in getattr(_local, 'contadores', ()):
+            consultas.append(sql)
+        medicao = getattr(_local, 'medicao', None)
+        if medicao is None:
+            return executar(sql, parametros)
+        inicio = time.perf_counter()
+        try:
+            return executar(sql, parametros)
+        finally:
+            medicao[0] += 1
+            medicao[1] += time.perf_counter() - inicio
+
+class ConexaoReutilizavel(sqlite3.Connection):
+    """
+    Conexão SQLite reaproveitada entre requisições da mesma thread.
+    close() apenas desfaz transações pendentes e devolve a conexão ao pool;
+    para encerrá-la de fato, use fechar().
+    """
+
+    def cursor(self, factory=CursorContado):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def fechar(self):
+        super().close()
+
+def caminho_banco(database=None):
+    """
+    Converte a configuração DATABASE (caminho ou URL sqlite:///) no
+    caminho do arquivo do banco de dados.
+    """
+    if not database:
+        return CAMINHO_PADRAO
+    if database.startswith('sqlite:///'):
+        return database[len('sqlite:///'):] or CAMINHO_PADRAO
+    return database
+
+def abrir_conexao(caminho):
+    """Abre uma nova conexão já configurada com os pragmas de desempenho"""
+    conn = sqlite3.connect(
+        caminho,
+        factory=ConexaoReutilizavel,
+        cached_statements=TAMANHO_CACHE_COMANDOS
+    )
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def get_db_connection():
+    """
+    Retorna a conexão com o banco de dados da requisição atual.
+    A conexão é mantida aberta por thread e reaproveitada nas requisições
+    seguintes; dentro de uma requisição, chamadas repetidas retornam a mesma.
+    """
+    if has_app_context() and '_conexao_banco' in g:
+        return g._conexao_banco
+
+    caminho = caminho_banco(current_app.config.get('DATABASE') if has_app_context() else None)
+
+    # Conexões herdadas de outro processo (fork dos workers) não são reaproveitadas
+    if getattr(_local, 'pid', None) != os.getpid():
+        _local.pid = os.getpid()
+        _local.conexoes = {}
+
+    conn = _local.conexoes.get(caminho)
+    if conn is None:
+        conn = abrir_conexao(caminho)
+        _local.conexoes[caminho] = conn
+
+    if has_app_context():
+        g._conexao_banco = conn
+    return conn
+
+def liberar_conexao(exc=None):
+    """Devolve a conexão da requisição ao pool ao fim do contexto da aplicação"""
+    conn = g.pop('_conexao_banco', None)
+    if conn is not None:
+        conn.close()
+
+def init_app(app):
+    """Registra a liberação das conexões ao fim de cada contexto da aplicação"""
+    app.teardown_appcontext(liberar_conexao)
+
+@contextmanager
+def contar_consultas():
+    """
+    Registra os comandos SQL executados na thread atual dentro do bloco.
+    Uso: with contar_consultas() as consultas: ...; len(consultas)
+    """
+    consultas = []
+    if not hasattr(_local, 'contadores'):
+        _local.contadores = []
+    _local.contadores.append(consultas)
+    try:
+        yield consultas
+    finally:
+        _local.contadores[:] = [lista for lista in _local.contadores if lista is not consultas]
+
+def iniciar_medicao():
+    """
+    Passa a somar a quantidade e o tempo dos comandos SQL executados na
+    thread atual, até encerrar_medicao (usado nas métricas por requisição)
+    """
+    _local.medicao = [0, 0.0]
+
+def encerrar_medicao():
+    """Encerra a medição da thread e retorna (comandos executados, tempo em segundos)"""
+    medicao = getattr(_local, 'medicao', None)
+    _local.medicao = None
+    return tuple(medicao) if medicao is not None else (0, 0.0)
+
+@contextmanager
+def limite_consultas(maximo):
+    """
+    Falha com AssertionError se o bloco executar mais de `maximo` comandos SQL.
+    Usado para detectar regressões do tipo N+1.
+    """
+    with contar_consultas() as consultas:
+        yield consultas
+    if len(consultas) > maximo:
+        raise AssertionError(
+            f'{len(consultas)} comandos SQL executados (máximo {maximo}):\n' + '\n'.join(consultas)
+        )
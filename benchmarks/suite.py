@@ -0,0 +1,310 @@
+"""
+Suíte de benchmarks dos caminhos principais da aplicação: classificador de
+riscos (individual e em lote), análise de projetos, criação de orçamentos
+com muitos itens, geração do PDF do orçamento, análise de PDFs de várias
+páginas e varredura de texto em documentos grandes.
+
+As rotas são exercitadas pelo cliente de testes do Flask sobre um banco
+temporário. Cada benchmark é executado uma vez para aquecimento e depois
+medido em várias repetições; registra-se a mediana, o mínimo e a
+quantidade de comandos SQL por repetição.
+
+Uso:
+  python -m benchmarks.suite                          # executar e mostrar
+  python -m benchmarks.suite --salvar base.json       # gravar a linha de base
+  python -m benchmarks.suite --comparar base.json     # falhar (código 1) se
+      algum benchmark ficar mais lento que a base além de --limite (fração,
+      padrão 0.25) ou executar mais comandos SQL que a base
+  --repeticoes N, --filtro texto (apenas benchmarks cujo nome contém o texto)
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# Versão do formato do arquivo de resultados
+VERSAO_FORMATO = 1
+
+# Diferença mínima (s) para considerar regressão, abaixo disso é ruído de medição
+TOLERANCIA_ABSOLUTA = 0.002
+
+COMPLEXIDADES = ('baixa', 'media', 'alta')
+AMBIENTES = ('controlado', 'externo', 'externo_adverso')
+
+def projetos_aleatorios(quantidade, semente):
+    """Projetos com alturas distintas (sem acertos no cache do classificador)"""
+    aleatorio = random.Random(semente)
+    return [
+        {
+            'nome': f'Projeto {i}',
+            'cliente': f'Cliente {i % 50}',
+            'altura_maxima': round(aleatorio.uniform(0, 15), 4),
+            'complexidade': aleatorio.choice(COMPLEXIDADES),
+            'ambiente': aleatorio.choice(AMBIENTES),
+            'largura': round(aleatorio.uniform(1, 20), 2),
+            'comprimento': round(aleatorio.uniform(1, 40), 2)
+        }
+        for i in range(quantidade)
+    ]
+
+def gerar_pdf_documento(paginas, semente):
+    """PDF de várias páginas com texto técnico (dimensões, elementos e materiais)"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    from benchmarks.varredura_texto import gerar_texto
+
+    saida = io.BytesIO()
+    pdf = canvas.Canvas(saida, pagesize=A4)
+    for pagina in range(paginas):
+        texto = gerar_texto(3000, semente * 1000 + pagina)
+        y = 800
+        for inicio in range(0, len(texto), 90):
+            pdf.drawString(30, y, texto[inicio:inicio + 90].replace('\n', ' '))
+            y -= 12
+            if y < 40:
+                break
+        pdf.showPage()
+    pdf.save()
+    return saida.getvalue()
+
+class Contexto:
+    """Aplicação, cliente de testes e diretório temporário da suíte"""
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        # Banco, caches e modelos publicados isolados no diretório temporário
+        os.environ['DATABASE_URL'] = os.path.join(diretorio, 'benchmark.db')
+        os.environ['PDF_CACHE_FOLDER'] = os.path.join(diretorio, 'cache_pdf')
+        os.environ['MODELOS_RISCO_DIR'] = os.path.join(diretorio, 'modelos_risco')
+        # Tarefas na própria thread: mede-se o trabalho, não a comunicação com o pool
+        os.environ.setdefault('TAREFAS_MAX_PROCESSOS', '0')
+
+        from app import create_app
+        self.app = create_app()
+        self.cliente = self.app.test_client()
+
+    def post(self, url, **kwargs):
+        resposta = self.cliente.post(url, **kwargs)
+        if resposta.status_code >= 400:
+            raise AssertionError(f'POST {url}: {resposta.status_code} {resposta.get_data(as_text=True)[:200]}')
+        return resposta
+
+    def get(self, url):
+        resposta = self.cliente.get(url)
+        if resposta.status_code >= 400:
+            raise AssertionError(f'GET {url}: {resposta.status_code}')
+        return resposta
+
+# Cada benchmark recebe o contexto, faz sua preparação e retorna a função
+# medida, chamada com o número da repetição, e opcionalmente uma função de
+# preparação de cada repetição (não medida)
+
+def classificador_classificar(ctx):
+    from routes.main import get_classificador
+    classificador = get_classificador()
+    projetos = projetos_aleatorios(2000, 1)
+
+    def rodada(_):
+        for projeto in projetos:
+            classificador.classificar(projeto)
+    return rodada, lambda _: classificador.limpar_cache()
+
+def classificador_classificar_lote(ctx):
+    from routes.main import get_classificador
+    classificador = get_classificador()
+    projetos = projetos_aleatorios(2000, 2)
+    return lambda _: classificador.classificar_lote(projetos), None
+
+def api_analisar_projeto(ctx):
+    from routes.main import get_classificador
+    projetos = projetos_aleatorios(200, 3)
+
+    def rodada(_):
+        for projeto in projetos:
+            ctx.post('/api/analisar-projeto', json=projeto)
+    return rodada, lambda _: get_classificador().limpar_cache()
+
+def api_analisar_projeto_lote(ctx):
+    from routes.main import get_classificador
+    projetos = projetos_aleatorios(1000, 4)
+    return (lambda _: ctx.post('/api/analisar-projeto/lote', json={'projetos': projetos}),
+            lambda _: get_classificador().limpar_cache())
+
+def api_criar_orcamento(ctx):
+    projeto_id = ctx.post('/api/projetos', json=projetos_aleatorios(1, 5)[0]).get_json()['id']
+    itens = [{'material_id': 1 + i % 11, 'quantidade': 1 + i % 7} for i in range(5000)]
+
+    def rodada(_):
+        # O endpoint completa os itens recebidos; enviar uma cópia a cada repetição
+        ctx.post('/api/orcamentos', json={'projeto_id': projeto_id, 'itens': [dict(item) for item in itens]})
+    return rodada, None
+
+def api_orcamento_pdf(ctx):
+    projeto_id = ctx.post('/api/projetos', json=projetos_aleatorios(1, 6)[0]).get_json()['id']
+    itens = [{'material_id': 1 + i % 11, 'quantidade': 1 + i % 7} for i in range(200)]
+    orcamento_id = ctx.post('/api/orcamentos', json={'projeto_id': projeto_id, 'itens': itens}).get_json()['id']
+    cache = ctx.app.config['PDF_CACHE_FOLDER']
+
+    def limpar_cache(_):
+        # Sem o PDF em cache, cada repetição gera o documento
+        shutil.rmtree(cache, ignore_errors=True)
+        os.makedirs(cache, exist_ok=True)
+    return lambda _: ctx.get(f'/api/orcamentos/{orcamento_id}/pdf'), limpar_cache
+
+def api_analisar_documento_pdf(ctx):
+    # Um PDF diferente por repetição, para não acertar o cache de análises
+    documentos = {}
+
+    def preparar(repeticao):
+        documentos[repeticao] = gerar_pdf_documento(20, repeticao)
+
+    def rodada(repeticao):
+        ctx.post('/api/analisar-documento', data={
+            'arquivo': (io.BytesIO(documentos.pop(repeticao)), 'projeto.pdf')
+        }, content_type='multipart/form-data')
+    return rodada, preparar
+
+def varredura_texto_grande(ctx):
+    from routes.api import extrair_dimensoes, identificar_elementos, identificar_materiais
+    from benchmarks.varredura_texto import gerar_texto
+    texto = gerar_texto(1_000_000, 7)
+
+    def rodada(_):
+        extrair_dimensoes(texto)
+        identificar_elementos(texto)
+        identificar_materiais(texto)
+    return rodada, None
+
+BENCHMARKS = {
+    'classificador.classificar': classificador_classificar,
+    'classificador.classificar_lote': classificador_classificar_lote,
+    'api.analisar_projeto': api_analisar_projeto,
+    'api.analisar_projeto_lote': api_analisar_projeto_lote,
+    'api.criar_orcamento': api_criar_orcamento,
+    'api.orcamento_pdf': api_orcamento_pdf,
+    'api.analisar_documento_pdf': api_analisar_documento_pdf,
+    'varredura.texto_grande': varredura_texto_grande
+}
+
+def medir(ctx, criar, repeticoes):
+    """Executa um benchmark e retorna mediana, mínimo e comandos SQL por repetição"""
+    from banco_dados import contar_consultas
+
+    rodada, preparar = criar(ctx)
+    tempos = []
+    consultas = 0
+    # Repetição 0: aquecimento (não medida)
+    for repeticao in range(repeticoes + 1):
+        if preparar is not None:
+            preparar(repeticao)
+        with ctx.app.app_context(), contar_consultas() as comandos:
+            inicio = time.perf_counter()
+            rodada(repeticao)
+            decorrido = time.perf_counter() - inicio
+        if repeticao:
+            tempos.append(decorrido)
+            consultas = max(consultas, len(comandos))
+    return {
+        'mediana': statistics.median(tempos),
+        'minimo': min(tempos),
+        'repeticoes': repeticoes,
+        'consultas': consultas
+    }
+
+def executar(repeticoes, filtro=None):
+    """Executa os benchmarks selecionados e retorna o documento de resultados"""
+    diretorio = tempfile.mkdtemp(prefix='benchmarks_')
+    try:
+        ctx = Contexto(diretorio)
+        resultados = {}
+        for nome, criar in BENCHMARKS.items():
+            if filtro and filtro not in nome:
+                continue
+            resultados[nome] = medir(ctx, criar, repeticoes)
+            print(f'{nome:<34} {resultados[nome]["mediana"] * 1000:>10.1f} ms '
+                  f'{resultados[nome]["consultas"]:>6} SQL', file=sys.stderr)
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    return {
+        'versao_formato': VERSAO_FORMATO,
+        'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'ambiente': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'processadores': os.cpu_count()
+        },
+        'resultados': resultados
+    }
+
+def comparar(base, atual, limite):
+    """
+    Compara os resultados com a linha de base. Retorna a lista de
+    regressões: mediana acima de (1 + limite) vezes a da base (e acima da
+    tolerância absoluta) ou mais comandos SQL por repetição.
+    """
+    regressoes = []
+    print(f'{"benchmark":<34} {"base (ms)":>10} {"atual (ms)":>11} {"razão":>7} {"SQL":>11}')
+    for nome, resultado in atual['resultados'].items():
+        referencia = base['resultados'].get(nome)
+        if referencia is None:
+            print(f'{nome:<34} {"-":>10} {resultado["mediana"] * 1000:>11.1f} {"novo":>7}')
+            continue
+        razao = resultado['mediana'] / referencia['mediana'] if referencia['mediana'] else float('inf')
+        mais_lento = (razao > 1 + limite
+                      and resultado['mediana'] - referencia['mediana'] > TOLERANCIA_ABSOLUTA)
+        mais_consultas = resultado['consultas'] > referencia['consultas']
+        situacao = ' REGRESSÃO' if mais_lento or mais_consultas else ''
+        print(f'{nome:<34} {referencia["mediana"] * 1000:>10.1f} {resultado["mediana"] * 1000:>11.1f} '
+              f'{razao:>6.2f}x {referencia["consultas"]:>5}->{resultado["consultas"]:<5}{situacao}')
+        if mais_lento:
+            regressoes.append(f'{nome}: {razao:.2f}x mais lento que a base (limite {1 + limite:.2f}x)')
+        if mais_consultas:
+            regressoes.append(f'{nome}: {resultado["consultas"]} comandos SQL (base {referencia["consultas"]})')
+    return regressoes
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description='Benchmarks da aplicação')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--filtro', help='executar apenas benchmarks cujo nome contém o texto')
+    parser.add_argument('--salvar', metavar='ARQUIVO', help='gravar os resultados como linha de base')
+    parser.add_argument('--comparar', metavar='ARQUIVO', help='comparar com a linha de base')
+    parser.add_argument('--limite', type=float, default=0.25,
+                        help='fração de aumento da mediana tolerada na comparação (padrão 0.25)')
+    argumentos = parser.parse_args(argumentos)
+
+    base = None
+    if argumentos.comparar:
+        with open(argumentos.comparar, encoding='utf-8') as arquivo:
+            base = json.load(arquivo)
+        if base.get('versao_formato') != VERSAO_FORMATO:
+            parser.error(f'{argumentos.comparar}: formato de resultados incompatível')
+
+    atual = executar(argumentos.repeticoes, argumentos.filtro)
+
+    if argumentos.salvar:
+        with open(argumentos.salvar, 'w', encoding='utf-8') as arquivo:
+            json.dump(atual, arquivo, indent=2, sort_keys=True)
+            arquivo.write('\n')
+
+    if base is None:
+        json.dump(atual['resultados'], sys.stdout, indent=2, sort_keys=True)
+        print()
+        return 0
+
+    regressoes = comparar(base, atual, argumentos.limite)
+    if regressoes:
+        print('\nRegressões de desempenho:\n- ' + '\n- '.join(regressoes))
+        return 1
+    print('\nSem regressões em relação à linha de base')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,247 @@
+"""
+Benchmark da varredura de texto dos documentos (varredura_texto) contra a
+implementação anterior, padrão a padrão, mantida abaixo como referência.
+
+Verifica também que os resultados são idênticos em textos aleatórios.
+
+Uso: python -m benchmarks.varredura_texto [tamanho_em_caracteres ...]
+"""
+import random
+import re
+import sys
+import time
+
+from varredura_texto import varrer_texto
+from routes.api import completar_dimensoes
+
+# Implementação anterior (referência)
+
+def extrair_dimensoes_referencia(texto):
+    """Extrai dimensões de um texto usando expressões regulares"""
+    dimensoes = {}
+    
+    # Padrões para buscar dimensões
+    padroes = {
+        'comprimento': r'comprimento[:\s]*(\d+[.,]?\d*)[\s]*m',
+        'largura': r'largura[:\s]*(\d+[.,]?\d*)[\s]*m',
+        'altura': r'altura[:\s]*(\d+[.,]?\d*)[\s]*m',
+        'profundidade': r'profundidade[:\s]*(\d+[.,]?\d*)[\s]*m'
+    }
+    
+    # Padrões alternativos
+    padroes_alt = {
+        'comprimento': [r'(\d+[.,]?\d*)[\s]*m[\s]*[x×]', r'c\s*=\s*(\d+[.,]?\d*)[\s]*m'],
+        'largura': [r'[x×][\s]*(\d+[.,]?\d*)[\s]*m', r'l\s*=\s*(\d+[.,]?\d*)[\s]*m'],
+        'altura': [r'h\s*=\s*(\d+[.,]?\d*)[\s]*m', r'alt[:\s]*(\d+[.,]?\d*)[\s]*m']
+    }
+    
+    # Buscar dimensões usando os padrões principais
+    for dim, padrao in padroes.items():
+        match = re.search(padrao, texto, re.IGNORECASE)
+        if match:
+            valor = match.group(1).replace(',', '.')
+            dimensoes[dim] = float(valor)
+    
+    # Se não encontrou com os padrões principais, tentar padrões alternativos
+    for dim, padroes_lista in padroes_alt.items():
+        if dim not in dimensoes:
+            for padrao in padroes_lista:
+                match = re.search(padrao, texto, re.IGNORECASE)
+                if match:
+                    valor = match.group(1).replace(',', '.')
+                    dimensoes[dim] = float(valor)
+                    break
+    
+    # Se ainda não encontrou comprimento e largura, buscar por padrão "LxC"
+    if 'comprimento' not in dimensoes or 'largura' not in dimensoes:
+        match = re.search(r'(\d+[.,]?\d*)[\s]*[x×][\s]*(\d+[.,]?\d*)', texto)
+        if match:
+            largura = float(match.group(1).replace(',', '.'))
+            comprimento = float(match.group(2).replace(',', '.'))
+            dimensoes['largura'] = largura
+            dimensoes['comprimento'] = comprimento
+    
+    # Valores padrão se não encontrar
+    if 'comprimento' not in dimensoes:
+        dimensoes['comprimento'] = 5.0  # valor padrão
+    if 'largura' not in dimensoes:
+        dimensoes['largura'] = 3.0  # valor padrão
+    if 'altura' not in dimensoes:
+        dimensoes['altura'] = 2.8  # valor padrão
+    
+    return dimensoes
+
+def identificar_elementos_referencia(texto):
+    """Identifica elementos estruturais mencionados no texto"""
+    elementos = []
+    
+    # Dicionário de elementos a procurar e seus padrões
+    elementos_dict = {
+        'viga': r'viga[s]?',
+        'coluna': r'coluna[s]?',
+        'pilar': r'pilar(es)?',
+        'treliça': r'treliça[s]?',
+        'perfil': r'perfil(is)?',
+        'metalon': r'metalon',
+        'chapa': r'chapa[s]?',
+        'telha': r'telha[s]?',
+        'grade': r'grade[s]?',
+        'tela': r'tela[s]?',
+        'vidro': r'vidro[s]?'
+    }
+    
+    # Buscar elementos no texto
+    for elemento, padrao in elementos_dict.items():
+        matches = re.finditer(padrao, texto, re.IGNORECASE)
+        for match in matches:
+            # Buscar quantidade próxima
+            contexto = texto[max(0, match.start() - 50):min(len(texto), match.end() + 50)]
+            qtd_match = re.search(r'(\d+)[\s]*' + padrao, contexto, re.IGNORECASE)
+            
+            quantidade = 1
+            if qtd_match:
+                quantidade = int(qtd_match.group(1))
+            
+            # Buscar dimensões próximas
+            dim_match = re.search(r'(\d+)[x×](\d+)', contexto)
+            dimensoes = ""
+            if dim_match:
+                dimensoes = f"{dim_match.group(1)}x{dim_match.group(2)}"
+            
+            # Verificar se este elemento já foi adicionado
+            elemento_existente = next((e for e in elementos if e['tipo'] == elemento), None)
+            
+            if elemento_existente:
+                elemento_existente['quantidade'] += quantidade
+            else:
+                elementos.append({
+                    'tipo': elemento,
+                    'quantidade': quantidade,
+                    'dimensoes': dimensoes
+                })
+    
+    # Se não encontrou elementos, estimar com base na área
+    if not elementos and 'area' in locals():
+        area = locals()['area']
+        if area > 0:
+            # Estimar número de pilares (1 a cada 3m²)
+            num_pilares = max(4, int(area / 3))
+            elementos.append({
+                'tipo': 'pilar',
+                'quantidade': num_pilares,
+                'dimensoes': '40x40'
+            })
+            
+            # Estimar comprimento de metalon para estrutura
+            comprimento_metalon = area * 2  # 2m por m²
+            elementos.append({
+                'tipo': 'metalon',
+                'quantidade': int(comprimento_metalon),
+                'dimensoes': '40x40'
+            })
+            
+            # Estimar comprimento de metalon para detalhes
+            comprimento_metalon_detalhes = area * 3  # 3m por m²
+            elementos.append({
+                'tipo': 'metalon',
+                'quantidade': int(comprimento_metalon_detalhes),
+                'dimensoes': '20x20'
+            })
+    
+    return elementos
+
+def identificar_materiais_referencia(texto):
+    """Identifica materiais mencionados no texto"""
+    materiais = []
+    
+    # Lista de materiais comuns em serralheria
+    materiais_dict = {
+        'Tubo Metalon 20x20': r'metalon[\s]*20[\s]*x[\s]*20',
+        'Tubo Metalon 30x30': r'metalon[\s]*30[\s]*x[\s]*30',
+        'Tubo Metalon 40x40': r'metalon[\s]*40[\s]*x[\s]*40',
+        'Tubo Metalon 50x30': r'metalon[\s]*50[\s]*x[\s]*30',
+        'Chapa Galvanizada #18': r'chapa[\s]*galvanizada[\s]*#?18',
+        'Chapa Galvanizada #20': r'chapa[\s]*galvanizada[\s]*#?20',
+        'Telha Trapezoidal': r'telha[\s]*trapezoidal',
+        'Parafuso Autobrocante': r'parafuso[\s]*autobrocante',
+        'Eletrodo 6013': r'eletrodo[\s]*6013',
+        'Disco de Corte': r'disco[\s]*de[\s]*corte',
+        'Tinta Anticorrosiva': r'tinta[\s]*anticorrosiva'
+    }
+    
+    # Buscar materiais no texto
+    for material, padrao in materiais_dict.items():
+        if re.search(padrao, texto, re.IGNORECASE):
+            materiais.append(material)
+    
+    return materiais
+
+# Geração de textos de teste
+
+TRECHOS = [
+    'viga', 'Vigas', 'coluna', 'COLUNAS', 'pilar', 'pilares', 'treliça', 'TRELIÇAS', 'perfil', 'perfis',
+    'metalon', 'chapa', 'chapas', 'telha', 'telhas', 'grade', 'tela', 'telas', 'vidro', 'vidros',
+    'metalon 20x20', 'Metalon 40 x 40', 'metalon30x30', 'metalon 50x30', 'chapa galvanizada #18',
+    'Chapa Galvanizada 20', 'telha trapezoidal', 'parafuso autobrocante', 'eletrodo 6013',
+    'disco de corte', 'tinta anticorrosiva', 'comprimento:', 'Largura', 'altura', 'ALT:', 'profundidade',
+    'c =', 'l=', 'h =', 'm', 'x', 'X', '×', '#', ':', '=', ',', '.', 'de', 'com', 'e', 'a', 'para',
+    'estrutura', 'cobertura', 'portão', 'navigation', 'estela', 'corteletrodo'
+]
+
+def gerar_texto(tamanho, semente):
+    """Texto aleatório com termos técnicos, números e separadores variados"""
+    aleatorio = random.Random(semente)
+    partes = []
+    total = 0
+    while total < tamanho:
+        sorteio = aleatorio.random()
+        if sorteio < 0.35:
+            parte = str(aleatorio.choice([aleatorio.randint(0, 9), aleatorio.randint(10, 999)]))
+            if aleatorio.random() < 0.2:
+                parte += aleatorio.choice(['.', ',']) + str(aleatorio.randint(0, 99))
+        else:
+            parte = aleatorio.choice(TRECHOS)
+        partes.append(parte)
+        partes.append(aleatorio.choice(['', ' ', ' ', '  ', '\n', 'm ', 'x', '×']))
+        total += len(parte) + 1
+    return ''.join(partes)
+
+def resultados_referencia(texto):
+    return extrair_dimensoes_referencia(texto), identificar_elementos_referencia(texto), identificar_materiais_referencia(texto)
+
+def resultados_varredura(texto):
+    varredura = varrer_texto(texto)
+    return completar_dimensoes(varredura['dimensoes']), varredura['elementos'], varredura['materiais']
+
+def verificar_equivalencia(quantidade=2000):
+    """Compara as duas implementações em textos aleatórios de tamanhos variados"""
+    for semente in range(quantidade):
+        texto = gerar_texto(random.Random(semente).randint(1, 400), semente)
+        esperado = resultados_referencia(texto)
+        obtido = resultados_varredura(texto)
+        if esperado != obtido:
+            raise AssertionError(f'Resultados diferentes para o texto {texto!r}:\n{esperado}\n{obtido}')
+    print(f'{quantidade} textos aleatórios: resultados idênticos')
+
+def medir(funcao, texto, repeticoes=3):
+    """Menor tempo (em segundos) entre as repetições"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(texto)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+def main(tamanhos):
+    verificar_equivalencia()
+    print(f'{"caracteres":>12} {"referência (s)":>15} {"varredura (s)":>14} {"ganho":>7}')
+    for tamanho in tamanhos:
+        texto = gerar_texto(tamanho, tamanho)
+        if resultados_referencia(texto) != resultados_varredura(texto):
+            raise AssertionError(f'Resultados diferentes no texto de {tamanho} caracteres')
+        referencia = medir(resultados_referencia, texto)
+        varredura = medir(resultados_varredura, texto)
+        print(f'{tamanho:>12} {referencia:>15.3f} {varredura:>14.3f} {referencia / varredura:>6.1f}x')
+
+if __name__ == '__main__':
+    main([int(tamanho) for tamanho in sys.argv[1:]] or [100_000, 500_000, 2_000_000])
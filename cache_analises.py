@@ -0,0 +1,96 @@
+import json
+import sqlite3
+import time
+
+# Versão do analisador de documentos; alterar ao mudar processar_pdf,
+# processar_imagem ou a varredura de texto para invalidar as análises já salvas
+VERSAO_ANALISADOR = 3
+
+# Campos do resultado que dependem dos preços dos materiais
+# (recalculados quando a tabela de materiais muda)
+CAMPOS_ESTIMATIVA = ('materiais_estimados', 'valor_materiais', 'valor_mao_obra', 'valor_total')
+
+class CacheAnalises:
+    """
+    Cache persistente (tabela analises_documentos) dos resultados da análise
+    de documentos, endereçado pelo hash SHA-256 do arquivo, pelo tipo e pela
+    versão do analisador.
+
+    A análise do documento e a estimativa de materiais são guardadas em
+    separado: a estimativa registra a versão da tabela de materiais com que
+    foi calculada, para que apenas ela seja refeita quando os preços mudam.
+    O cache é limitado por tamanho total (removendo as análises acessadas
+    há mais tempo) e por idade.
+    """
+
+    def __init__(self, tamanho_maximo, idade_maxima):
+        self.tamanho_maximo = tamanho_maximo
+        self.idade_maxima = idade_maxima
+
+    def obter(self, conn, hash_conteudo, tipo):
+        """
+        Retorna a tupla (analise, estimativa, versao_materiais) salva para o
+        documento, ou None se não existir ou estiver expirada.
+        """
+        try:
+            row = conn.execute('''
+            SELECT analise, estimativa, versao_materiais FROM analises_documentos
+            WHERE hash = ? AND tipo = ? AND versao_analisador = ? AND criada_em >= ?
+            ''', (hash_conteudo, tipo, VERSAO_ANALISADOR, time.time() - self.idade_maxima)).fetchone()
+            if row is None:
+                return None
+            conn.execute('''
+            UPDATE analises_documentos SET acessada_em = ?
+            WHERE hash = ? AND tipo = ? AND versao_analisador = ?
+            ''', (time.time(), hash_conteudo, tipo, VERSAO_ANALISADOR))
+            conn.commit()
+        except sqlite3.Error:
+            # Cache indisponível (ex.: banco bloqueado): analisar novamente
+            conn.rollback()
+            return None
+        return json.loads(row[0]), json.loads(row[1]), row[2]
+
+    def salvar(self, conn, hash_conteudo, tipo, analise, estimativa, versao_materiais):
+        """Grava a análise e a estimativa e aplica os limites do cache"""
+        analise = json.dumps(analise, separators=(',', ':'))
+        estimativa = json.dumps(estimativa, separators=(',', ':'))
+        agora = time.time()
+        try:
+            conn.execute('''
+            INSERT OR REPLACE INTO analises_documentos
+            (hash, tipo, versao_analisador, analise, estimativa, versao_materiais, tamanho, criada_em, acessada_em)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (hash_conteudo, tipo, VERSAO_ANALISADOR, analise, estimativa, versao_materiais,
+                  len(analise) + len(estimativa), agora, agora))
+            self._aplicar_limites(conn, agora)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+
+    def atualizar_estimativa(self, conn, hash_conteudo, tipo, estimativa, versao_materiais):
+        """Substitui a estimativa de uma análise salva (após mudança de preços)"""
+        estimativa = json.dumps(estimativa, separators=(',', ':'))
+        try:
+            conn.execute('''
+            UPDATE analises_documentos
+            SET estimativa = ?, versao_materiais = ?, tamanho = length(analise) + ?
+            WHERE hash = ? AND tipo = ? AND versao_analisador = ?
+            ''', (estimativa, versao_materiais, len(estimativa), hash_conteudo, tipo, VERSAO_ANALISADOR))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+
+    def _aplicar_limites(self, conn, agora):
+        """Remove análises expiradas e as menos acessadas além do tamanho máximo"""
+        conn.execute(
+            'DELETE FROM analises_documentos WHERE criada_em < ? OR versao_analisador != ?',
+            (agora - self.idade_maxima, VERSAO_ANALISADOR)
+        )
+        conn.execute('''
+        DELETE FROM analises_documentos WHERE rowid IN (
+            SELECT rowid FROM (
+                SELECT rowid, SUM(tamanho) OVER (ORDER BY acessada_em DESC, rowid DESC) AS acumulado
+                FROM analises_documentos
+            ) WHERE acumulado > ?
+        )
+        ''', (self.tamanho_maximo,))
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Versão do layout dos PDFs; alterar ao mudar gerar_pdf_orcamento para
+# invalidar os arquivos já gerados
+VERSAO_LAYOUT_PDF = 1
+
+def chave_conteudo(*partes):
+    """
+    Calcula a chave (SHA-256) de um conteúdo a partir de sua representação
+    JSON canônica. Conteúdos iguais sempre geram a mesma chave.
+    """
+    serializado = json.dumps(partes, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(serializado.encode('utf-8')).hexdigest()
+
+class CachePDF:
+    """
+    Cache em disco de PDFs endereçado pelo conteúdo (nome do arquivo = chave).
+    O tamanho total é limitado; ao ultrapassá-lo, os arquivos acessados há
+    mais tempo são removidos (LRU pelo horário de acesso).
+    """
+
+    def __init__(self, diretorio, tamanho_maximo):
+        self.diretorio = diretorio
+        self.tamanho_maximo = tamanho_maximo
+        self._lock = threading.Lock()
+        os.makedirs(self.diretorio, exist_ok=True)
+
+    def caminho(self, chave):
+        return os.path.join(self.diretorio, f'{chave}.pdf')
+
+    def obter(self, chave):
+        """Retorna o caminho do PDF em cache, ou None se não existir"""
+        caminho = self.caminho(chave)
+        try:
+            # Atualiza apenas o horário de acesso (o de modificação é o Last-Modified)
+            os.utime(caminho, (time.time(), os.path.getmtime(caminho)))
+        except OSError:
+            return None
+        return caminho
+
+    def salvar(self, chave, conteudo):
+        """Grava o PDF de forma atômica e aplica o limite de tamanho do cache"""
+        caminho = self.caminho(chave)
+        fd, temporario = tempfile.mkstemp(dir=self.diretorio, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as arquivo:
+                arquivo.write(conteudo)
+            os.replace(temporario, caminho)
+        except BaseException:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+        self._aplicar_limite(manter=caminho)
+        return caminho
+
+    def _aplicar_limite(self, manter=None):
+        """Remove os PDFs menos acessados até o cache caber no tamanho máximo"""
+        with self._lock:
+            arquivos = []
+            total = 0
+            with os.scandir(self.diretorio) as entradas:
+                for entrada in entradas:
+                    if not entrada.name.endswith('.pdf'):
+                        continue
+                    try:
+                        info = entrada.stat()
+                    except OSError:
+                        continue
+                    arquivos.append((info.st_atime, info.st_size, entrada.path))
+                    total += info.st_size
+
+            for _, tamanho, caminho in sorted(arquivos):
+                if total <= self.tamanho_maximo:
+                    break
+                if caminho == manter:
+                    continue
+                try:
+                    os.remove(caminho)
+                    total -= tamanho
+                except OSError:
+                    pass
@@ -0,0 +1,297 @@
+import os
+import numpy as np
+
+# Dados do módulo de espaçamento do navegador (static/js/calculo_espacamento.js).
+# material/preco_padrao: material do catálogo usado no custo da telha (R$/m²)
+TIPOS_TELHA = {
+    'trapezoidal-40': {'nome': 'Telha Trapezoidal TP40', 'peso': 5.2, 'vaoRecomendado': 1.8,
+                       'inclinacaoMinima': 5, 'material': 'Telha Trapezoidal', 'preco_padrao': 45.0},
+    'trapezoidal-25': {'nome': 'Telha Trapezoidal TP25', 'peso': 4.3, 'vaoRecomendado': 1.6,
+                       'inclinacaoMinima': 7, 'material': 'Telha Trapezoidal', 'preco_padrao': 45.0},
+    'ondulada': {'nome': 'Telha Ondulada', 'peso': 4.8, 'vaoRecomendado': 1.5,
+                 'inclinacaoMinima': 10, 'material': 'Telha Ondulada', 'preco_padrao': 38.0},
+    'termoacustica': {'nome': 'Telha Termoacústica', 'peso': 10.5, 'vaoRecomendado': 1.8,
+                      'inclinacaoMinima': 5, 'material': 'Telha Termoacústica', 'preco_padrao': 120.0},
+    'zipada': {'nome': 'Telha Zipada', 'peso': 6.2, 'vaoRecomendado': 2.0,
+               'inclinacaoMinima': 1, 'material': 'Telha Zipada', 'preco_padrao': 95.0}
+}
+
+# Alturas (mm), peso (kg/m) e inércia (cm⁴) dos perfis de terça, espessura 2.65 mm
+ALTURAS_PERFIL = (100, 150, 200, 250, 300)
+TIPOS_PERFIL = {
+    'u-simples': {'nome': 'Perfil U Simples', 'peso': (2.71, 3.97, 5.36, 7.14, 9.09),
+                  'inercia': (83.6, 291.5, 683.8, 1345.6, 2315.3)},
+    'u-enrijecido': {'nome': 'Perfil U Enrijecido', 'peso': (3.06, 4.43, 5.94, 7.84, 9.89),
+                     'inercia': (106.2, 358.4, 831.6, 1624.8, 2776.4)},
+    'z-simples': {'nome': 'Perfil Z Simples', 'peso': (2.83, 4.13, 5.57, 7.39, 9.39),
+                  'inercia': (89.8, 312.4, 732.7, 1440.2, 2477.9)},
+    'z-enrijecido': {'nome': 'Perfil Z Enrijecido', 'peso': (3.18, 4.59, 6.15, 8.10, 10.21),
+                     'inercia': (113.6, 383.5, 889.8, 1738.5, 2970.8)}
+}
+
+# Tensão de escoamento e módulo de elasticidade (MPa)
+MATERIAIS_ESTRUTURA = {
+    'aco-astm-a36': {'nome': 'Aço ASTM A36', 'fy': 250, 'E': 200000},
+    'aco-astm-a572': {'nome': 'Aço ASTM A572', 'fy': 345, 'E': 200000},
+    'aco-sae-1020': {'nome': 'Aço SAE 1020', 'fy': 210, 'E': 200000}
+}
+
+# Velocidade básica do vento por região (m/s)
+VELOCIDADE_BASICA_VENTO = {'1': 30, '2': 35, '3': 40, '4': 45, '5': 50}
+
+# Constantes do cálculo do navegador
+PESO_PROPRIO_ESTRUTURA = 15  # kg/m²
+SOBRECARGA = 25  # kg/m² (manutenção)
+AFASTAMENTO_CUMEEIRA_TERCAS = 0.2  # m
+
+# Verificação das terças (biapoiadas entre tesouras): flecha limite L/180
+# e tensão de flexão até fy / 1.10
+FLECHA_LIMITE_TERCA = 180
+COEFICIENTE_RESISTENCIA = 1.10
+
+# Estimativas de custo: preço do aço (R$/kg) e peso da tesoura por metro de vão (kg/m)
+PRECO_ACO_KG = float(os.environ.get('PRECO_ACO_KG', 9.5))
+PESO_TESOURA_POR_METRO = float(os.environ.get('PESO_TESOURA_POR_METRO', 18))
+
+# Inclinações (%) avaliadas quando a requisição não informa nenhuma
+INCLINACOES_PADRAO = (5, 10, 15, 20, 25, 30)
+
+# Máximo de combinações avaliadas por varredura (incluindo as alturas de perfil)
+MAX_COMBINACOES_ESPACAMENTO = int(os.environ.get('MAX_COMBINACOES_ESPACAMENTO', 2000000))
+
+class EspacamentoInvalido(Exception):
+    """Parâmetros inválidos para a varredura de espaçamento"""
+
+def carga_vento(regiao_vento, inclinacao):
+    """
+    calcularCargaVento do navegador sobre arrays: velocidade básica da região
+    (m/s) e inclinação (%) -> carga de vento em kg/m²
+    """
+    vk = np.asarray(regiao_vento, dtype=float) * 0.95
+    q = 0.613 * vk ** 2 / 100
+    inclinacao = np.asarray(inclinacao, dtype=float)
+    cp = np.select(
+        [inclinacao <= 5, inclinacao <= 10, inclinacao <= 15, inclinacao <= 20],
+        [-0.8, -0.7, -0.5, -0.3],
+        -0.2
+    )
+    return np.abs(q * cp * 102)
+
+def espacamento_tesouras(vao_livre, comprimento_total, peso_telha, carga_adicional, carga_de_vento):
+    """
+    calcularEspacamentoTesouras do navegador sobre arrays. Retorna o
+    dicionário de arrays espacamento, numero, altura, cargaTotal e cargaTotalKN.
+    """
+    vao_livre = np.asarray(vao_livre, dtype=float)
+    carga_total = PESO_PROPRIO_ESTRUTURA + peso_telha + SOBRECARGA + carga_adicional + carga_de_vento
+    carga_total_kn = carga_total / 102
+
+    espacamento_maximo = np.select(
+        [carga_total_kn > 3.0, carga_total_kn > 2.5, carga_total_kn > 2.0, carga_total_kn > 1.5],
+        [3.5, 4.0, 4.5, 5.0],
+        6.0
+    )
+    limite_vao = np.select([vao_livre > 25, vao_livre > 20, vao_livre > 15], [3.0, 3.5, 4.0], np.inf)
+    espacamento_maximo = np.minimum(espacamento_maximo, limite_vao)
+
+    numero = np.ceil(comprimento_total / espacamento_maximo) + 1
+    return {
+        'espacamento': comprimento_total / (numero - 1),
+        'numero': numero,
+        'altura': np.round(vao_livre / 12 * 100) / 100,
+        'cargaTotal': carga_total,
+        'cargaTotalKN': carga_total_kn
+    }
+
+def espacamento_tercas(vao_livre, inclinacao, vao_recomendado):
+    """
+    calcularEspacamentoTercas do navegador sobre arrays. Retorna o
+    dicionário de arrays espacamento, numeroTotal, numeroPorAgua e comprimentoAgua.
+    """
+    meio_vao = np.asarray(vao_livre, dtype=float) / 2
+    comprimento_agua = np.hypot(meio_vao, meio_vao * (np.asarray(inclinacao, dtype=float) / 100))
+    comprimento_util = comprimento_agua - AFASTAMENTO_CUMEEIRA_TERCAS
+    numero_por_agua = np.ceil(comprimento_util / vao_recomendado) + 1
+    return {
+        'espacamento': comprimento_util / (numero_por_agua - 1),
+        'numeroTotal': numero_por_agua * 2 - 1,
+        'numeroPorAgua': numero_por_agua,
+        'comprimentoAgua': comprimento_agua
+    }
+
+def fronteira_pareto(custos, pecas):
+    """
+    Máscara das alternativas não dominadas (menor custo x menos peças) de
+    cada linha das matrizes (cenários x alternativas). Custos infinitos são
+    alternativas inviáveis e nunca entram na fronteira.
+    """
+    ordem = np.lexsort((pecas, custos), axis=-1)
+    custos_ordenados = np.take_along_axis(custos, ordem, axis=-1)
+    pecas_ordenadas = np.take_along_axis(pecas, ordem, axis=-1)
+    # Menor número de peças entre as alternativas mais baratas que cada uma
+    anteriores = np.minimum.accumulate(pecas_ordenadas, axis=-1)
+    anteriores = np.concatenate([np.full(anteriores.shape[:-1] + (1,), np.inf), anteriores[..., :-1]], axis=-1)
+    na_fronteira = (pecas_ordenadas < anteriores) & np.isfinite(custos_ordenados)
+
+    mascara = np.zeros(custos.shape, dtype=bool)
+    np.put_along_axis(mascara, ordem, na_fronteira, axis=-1)
+    return mascara
+
+def _lista(valor, padrao, campo):
+    if valor is None:
+        valor = list(padrao)
+    elif not isinstance(valor, list):
+        valor = [valor]
+    if not valor:
+        raise EspacamentoInvalido(f'{campo} é obrigatório')
+    return valor
+
+def _numeros(valor, padrao, campo, minimo):
+    valores = _lista(valor, padrao, campo)
+    for v in valores:
+        if isinstance(v, bool) or not isinstance(v, (int, float)) or not minimo <= v < float('inf'):
+            raise EspacamentoInvalido(f'{campo} deve conter números a partir de {minimo}')
+    # Manter a ordem de entrada sem repetições
+    return list(dict.fromkeys(valores))
+
+def _opcoes(valor, tabela, campo):
+    valores = list(dict.fromkeys(str(v) for v in _lista(valor, tabela, campo)))
+    invalidos = [v for v in valores if v not in tabela]
+    if invalidos:
+        raise EspacamentoInvalido(f'{campo} inválido: {", ".join(invalidos)}')
+    return valores
+
+def varrer_espacamentos(parametros, catalogo=None):
+    """
+    Avalia de uma vez todas as combinações de vão livre, inclinação, região
+    de vento, tipo de telha e perfil de terça com as fórmulas do navegador,
+    escolhendo para cada uma a menor altura de perfil que atende à flecha e
+    à tensão das terças.
+
+    Cada par (vão livre, região de vento) é um cenário; para cada cenário
+    retorna a combinação viável mais barata e as alternativas de Pareto
+    entre custo estimado e número de peças (tesouras + terças).
+
+    Parâmetros (dicionário, listas ou valores únicos):
+    - vao_livre (m) e comprimento_total (m): obrigatórios
+    - inclinacao (%), regiao_vento ('1' a '5'), tipo_telha, perfil_terca:
+      padrão INCLINACOES_PADRAO, região '1', todas as telhas e perfis
+    - material (padrão 'aco-astm-a36'), carga_adicional (kg/m²),
+      preco_aco_kg, peso_tesoura_metro
+    - catalogo: CatalogoMateriais para o preço das telhas
+
+    Levanta EspacamentoInvalido para parâmetros inválidos.
+    """
+    vaos = _numeros(parametros.get('vao_livre'), (), 'vao_livre', 1)
+    comprimento_total = _numeros(parametros.get('comprimento_total'), (), 'comprimento_total', 1)
+    if len(comprimento_total) != 1:
+        raise EspacamentoInvalido('comprimento_total deve ser um único número')
+    comprimento_total = float(comprimento_total[0])
+    inclinacoes = _numeros(parametros.get('inclinacao'), INCLINACOES_PADRAO, 'inclinacao', 0.1)
+    regioes = _opcoes(parametros.get('regiao_vento', '1'), VELOCIDADE_BASICA_VENTO, 'regiao_vento')
+    telhas = _opcoes(parametros.get('tipo_telha'), TIPOS_TELHA, 'tipo_telha')
+    perfis = _opcoes(parametros.get('perfil_terca'), TIPOS_PERFIL, 'perfil_terca')
+    material = _opcoes(parametros.get('material', 'aco-astm-a36'), MATERIAIS_ESTRUTURA, 'material')
+    if len(material) != 1:
+        raise EspacamentoInvalido('material deve ser um único valor')
+    nome_material = material[0]
+    material = MATERIAIS_ESTRUTURA[nome_material]
+    carga_adicional = _numeros(parametros.get('carga_adicional', 0), (), 'carga_adicional', 0)[0]
+    preco_aco = _numeros(parametros.get('preco_aco_kg', PRECO_ACO_KG), (), 'preco_aco_kg', 0)[0]
+    peso_tesoura = _numeros(parametros.get('peso_tesoura_metro', PESO_TESOURA_POR_METRO), (),
+                            'peso_tesoura_metro', 0)[0]
+
+    combinacoes = len(vaos) * len(inclinacoes) * len(regioes) * len(telhas) * len(perfis) * len(ALTURAS_PERFIL)
+    if combinacoes > MAX_COMBINACOES_ESPACAMENTO:
+        raise EspacamentoInvalido(f'Máximo de {MAX_COMBINACOES_ESPACAMENTO} combinações por varredura')
+
+    # Eixos da grade: (vão, inclinação, região, telha) e, nas terças, (perfil, altura)
+    vao = np.array(vaos, dtype=float)[:, None, None, None]
+    inclinacao = np.array(inclinacoes, dtype=float)[None, :, None, None]
+    velocidade = np.array([VELOCIDADE_BASICA_VENTO[r] for r in regioes], dtype=float)[None, None, :, None]
+    dados_telha = [TIPOS_TELHA[t] for t in telhas]
+    peso_telha = np.array([t['peso'] for t in dados_telha])
+    vao_recomendado = np.array([t['vaoRecomendado'] for t in dados_telha])
+    inclinacao_minima = np.array([t['inclinacaoMinima'] for t in dados_telha])
+    preco_telha = np.array([
+        catalogo.preco(t['material'], t['preco_padrao']) if catalogo is not None else t['preco_padrao']
+        for t in dados_telha
+    ])
+
+    tesouras = espacamento_tesouras(vao, comprimento_total, peso_telha, carga_adicional,
+                                    carga_vento(velocidade, inclinacao))
+    tercas = espacamento_tercas(vao, inclinacao, vao_recomendado)
+    forma_layout = np.broadcast_shapes(tesouras['numero'].shape, tercas['numeroTotal'].shape)
+    tesouras = {chave: np.broadcast_to(valor, forma_layout) for chave, valor in tesouras.items()}
+    tercas = {chave: np.broadcast_to(valor, forma_layout) for chave, valor in tercas.items()}
+
+    # Verificação das terças para cada perfil e altura: (..., perfil, altura)
+    peso_perfil = np.array([TIPOS_PERFIL[p]['peso'] for p in perfis])
+    inercia = np.array([TIPOS_PERFIL[p]['inercia'] for p in perfis]) * 1e4  # mm⁴
+    modulo_resistente = inercia / (np.array(ALTURAS_PERFIL, dtype=float) / 2)  # mm³
+    q = (tesouras['cargaTotalKN'] * tercas['espacamento'])[..., None, None]  # kN/m = N/mm
+    vao_terca = (tesouras['espacamento'] * 1000)[..., None, None]  # mm
+    flecha = 5 * q * vao_terca ** 4 / (384 * material['E'] * inercia)
+    tensao = q * vao_terca ** 2 / 8 / modulo_resistente
+    atende = (flecha <= vao_terca / FLECHA_LIMITE_TERCA) & (tensao <= material['fy'] / COEFICIENTE_RESISTENCIA)
+
+    # Menor altura que atende (o peso cresce com a altura)
+    indice_altura = np.argmax(atende, axis=-1)
+    viavel = atende.any(axis=-1) & (inclinacao >= inclinacao_minima)[..., None]
+    peso_terca = peso_perfil[np.arange(len(perfis)), indice_altura]
+
+    massa_tercas = tercas['numeroTotal'][..., None] * comprimento_total * peso_terca
+    massa_tesouras = tesouras['numero'] * vao * peso_tesoura
+    area_telhado = 2 * tercas['comprimentoAgua'] * comprimento_total
+    custo = massa_tercas * preco_aco + (massa_tesouras * preco_aco + area_telhado * preco_telha)[..., None]
+    custo = np.where(viavel, custo, np.inf)
+    pecas = np.broadcast_to((tesouras['numero'] + tercas['numeroTotal'])[..., None], custo.shape)
+
+    # Cenários (vão, região) x alternativas (inclinação, telha, perfil)
+    forma = (len(vaos), len(regioes), len(inclinacoes) * len(telhas) * len(perfis))
+    custos_cenario = np.moveaxis(custo, 2, 1).reshape(forma)
+    pareto = fronteira_pareto(custos_cenario, np.moveaxis(pecas, 2, 1).reshape(forma).astype(float))
+    melhores = np.argmin(custos_cenario, axis=-1)
+
+    def alternativa(i_vao, i_regiao, indice):
+        i_inclinacao, i_telha, i_perfil = np.unravel_index(indice, (len(inclinacoes), len(telhas), len(perfis)))
+        layout = (i_vao, i_inclinacao, i_regiao, i_telha)
+        posicao = layout + (i_perfil,)
+        i_altura = indice_altura[posicao]
+        return {
+            'inclinacao': inclinacoes[i_inclinacao],
+            'tipo_telha': telhas[i_telha],
+            'perfil_terca': perfis[i_perfil],
+            'altura_perfil': ALTURAS_PERFIL[i_altura],
+            'tesouras': {chave: float(valor[layout]) for chave, valor in tesouras.items()},
+            'tercas': dict({chave: float(valor[layout]) for chave, valor in tercas.items()},
+                           afastamentoCumeeira=AFASTAMENTO_CUMEEIRA_TERCAS),
+            'flecha_terca': float(flecha[posicao + (i_altura,)]),
+            'massa_tercas': float(massa_tercas[posicao]),
+            'massa_tesouras': float(massa_tesouras[layout]),
+            'area_telhado': float(area_telhado[layout]),
+            'custo': float(custo[posicao]),
+            'pecas': int(pecas[posicao])
+        }
+
+    cenarios = []
+    for i_vao, vao_livre in enumerate(vaos):
+        for i_regiao, regiao in enumerate(regioes):
+            custos_alternativas = custos_cenario[i_vao, i_regiao]
+            viaveis = int(np.isfinite(custos_alternativas).sum())
+            indices = np.flatnonzero(pareto[i_vao, i_regiao])
+            indices = indices[np.argsort(custos_alternativas[indices], kind='stable')]
+            cenarios.append({
+                'vao_livre': vao_livre,
+                'regiao_vento': regiao,
+                'combinacoes_viaveis': viaveis,
+                'melhor': alternativa(i_vao, i_regiao, melhores[i_vao, i_regiao]) if viaveis else None,
+                'pareto': [alternativa(i_vao, i_regiao, indice) for indice in indices]
+            })
+
+    return {
+        'comprimento_total': comprimento_total,
+        'material': nome_material,
+        'combinacoes_avaliadas': combinacoes,
+        'cenarios': cenarios
+    }
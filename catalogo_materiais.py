@@ -0,0 +1,74 @@
+import threading
+from banco_dados import get_db_connection
+
+class CatalogoMateriais:
+    """
+    Retrato imutável da tabela de materiais, indexado por id e por nome.
+    Cada alteração na tabela gera um novo catálogo com uma nova versão.
+    """
+
+    def __init__(self, versao, materiais):
+        self.versao = versao
+        self.materiais = materiais
+        self.por_id = {}
+        self.por_nome = {}
+        for material in materiais:
+            self.por_id[material['id']] = material
+            # Em nomes repetidos, vale o primeiro (mesmo critério da busca linear anterior)
+            self.por_nome.setdefault(material['nome'], material)
+
+    def preco(self, nome, padrao):
+        """Preço unitário do material pelo nome, ou o valor padrão se não existir"""
+        material = self.por_nome.get(nome)
+        return material['preco_unitario'] if material else padrao
+
+    def id(self, nome, padrao):
+        """ID do material pelo nome, ou o valor padrão se não existir"""
+        material = self.por_nome.get(nome)
+        return material['id'] if material else padrao
+
+_catalogo = None
+_catalogo_lock = threading.Lock()
+
+def _versao_tabela(conn):
+    """Lê o contador de alterações da tabela materiais (mantido por triggers)"""
+    row = conn.execute("SELECT versao FROM versao_tabelas WHERE tabela = 'materiais'").fetchone()
+    return row[0] if row else 0
+
+def obter_catalogo(conn=None):
+    """
+    Retorna o catálogo de materiais em memória, recarregando-o apenas
+    quando a tabela foi alterada.
+
+    A verificação usa PRAGMA data_version (alterações feitas por outras
+    conexões) e total_changes (alterações feitas pela própria conexão);
+    só quando um deles muda o contador de versão da tabela é consultado.
+    """
+    global _catalogo
+    if conn is None:
+        conn = get_db_connection()
+
+    marca = (conn.execute('PRAGMA data_version').fetchone()[0], conn.total_changes)
+    catalogo = _catalogo
+    if catalogo is not None and getattr(conn, '_marca_catalogo', None) == (catalogo.versao, marca):
+        return catalogo
+
+    with _catalogo_lock:
+        versao = _versao_tabela(conn)
+        if _catalogo is None or _catalogo.versao != versao:
+            # Repetir a leitura se a tabela mudar enquanto é carregada
+            while True:
+                materiais = [dict(row) for row in conn.execute('SELECT * FROM materiais')]
+                versao_final = _versao_tabela(conn)
+                if versao_final == versao:
+                    break
+                versao = versao_final
+            _catalogo = CatalogoMateriais(versao, materiais)
+        catalogo = _catalogo
+
+    try:
+        conn._marca_catalogo = (catalogo.versao, marca)
+    except AttributeError:
+        # Conexões sqlite3 comuns não aceitam atributos; apenas não memorizar
+        pass
+    return catalogo
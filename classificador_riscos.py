@@ -1,8 +1,18 @@
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
 import joblib
 import os
+import metricas
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from itertools import product
+from banco_dados import abrir_conexao
+from treinamento_riscos import (DIRETORIO_MODELOS, TREINO_N_JOBS, ler_manifesto, carregar_modelo,
+                                treinar_modelo, publicar_modelo, registrar_amostras, retreinar_modelo)
+
+# Acertos e falhas do cache de classificações, nas métricas da aplicação
+_cache_acerto = metricas.registro.contador('cache_consultas_total', cache='classificador', resultado='acerto')
+_cache_falha = metricas.registro.contador('cache_consultas_total', cache='classificador', resultado='falha')
 
 class ClassificadorRiscos:
     """
@@ -11,77 +21,173 @@ class ClassificadorRiscos:
     classificação mais precisa e adaptativa.
     """
     
-    def __init__(self):
+    # Valores possíveis das características categóricas (ver _converter_categorias)
+    VALORES_CATEGORIAS = (0.0, 0.5, 1.0)
+    
+    def __init__(self, modo_compilado=True, tamanho_cache=1024, diretorio_modelos=DIRETORIO_MODELOS):
         self.modelo_path = 'modelo_classificacao_riscos.joblib'
         self.scaler_path = 'scaler_classificacao_riscos.joblib'
-        
-        # Inicializar modelo e scaler
-        if os.path.exists(self.modelo_path) and os.path.exists(self.scaler_path):
+        self.diretorio_modelos = diretorio_modelos
+        self.modo_compilado = modo_compilado
+        self.tabela_compilada = None
+        
+        # Cache LRU das classificações, invalidado a cada nova versão do modelo
+        self.versao_modelo = 1
+        self.tamanho_cache = tamanho_cache
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
+        # Inicializar modelo e scaler: última versão publicada (ver
+        # treinamento_riscos.publicar_modelo) ou os arquivos originais
+        manifesto = ler_manifesto(self.diretorio_modelos)
+        if manifesto is not None:
+            self.modelo, self.scaler = carregar_modelo(manifesto, self.diretorio_modelos)
+            self.versao_modelo = manifesto['versao']
+            self.modelo_treinado = True
+        elif os.path.exists(self.modelo_path) and os.path.exists(self.scaler_path):
             self.modelo = joblib.load(self.modelo_path)
             self.scaler = joblib.load(self.scaler_path)
             self.modelo_treinado = True
         else:
-            self.modelo = RandomForestClassifier(n_estimators=100, random_state=42)
-            self.scaler = StandardScaler()
+            self.modelo = None
+            self.scaler = None
             self.modelo_treinado = False
             self._treinar_modelo_inicial()
+        
+        if self.modo_compilado:
+            self._compilar_modelo()
+    
+    def _compilar_modelo(self):
+        """
+        Compila o scaler e a floresta em uma tabela de decisão.
+        
+        Como complexidade e ambiente só assumem 3 valores cada, o modelo é uma
+        função em degraus da altura para cada um dos 9 pares de categorias.
+        Os limiares de altura de todas as árvores são reunidos e ordenados, e
+        cada intervalo entre limiares recebe a classe prevista pelo modelo.
+        A tabela só é ativada se reproduzir exatamente modelo.predict.
+        """
+        self.tabela_compilada = None
+        if not self.modelo_treinado:
+            return False
+        
+        # Limiares da altura (já normalizada) usados por todas as árvores
+        limites = np.unique(np.concatenate([
+            arvore.tree_.threshold[arvore.tree_.feature == 0]
+            for arvore in self.modelo.estimators_
+        ]))
+        
+        # As árvores comparam as entradas convertidas para float32, então cada
+        # intervalo (limite anterior, limite] é representado pelo maior float32
+        # que não ultrapassa o limite, e o último intervalo pelo menor float32
+        # acima do maior limite
+        limites32 = limites.astype(np.float32)
+        representantes = np.where(
+            limites32 > limites, np.nextafter(limites32, np.float32(-np.inf)), limites32
+        ).tolist()
+        ultimo = np.float32(limites[-1]) if len(limites) else np.float32(0)
+        if len(limites) and ultimo <= limites[-1]:
+            ultimo = np.nextafter(ultimo, np.float32(np.inf))
+        representantes.append(ultimo)
+        representantes = np.array(representantes, dtype=np.float32).astype(float)
+        
+        tabela = {}
+        for complexidade, ambiente in product(self.VALORES_CATEGORIAS, self.VALORES_CATEGORIAS):
+            _, complexidade_norm, ambiente_norm = self.scaler.transform([[0.0, complexidade, ambiente]])[0]
+            X_scaled = np.column_stack([
+                representantes,
+                np.full(len(representantes), complexidade_norm),
+                np.full(len(representantes), ambiente_norm)
+            ])
+            classes = self.modelo.predict(X_scaled)
+            
+            # Manter apenas os limiares onde a classe prevista muda
+            mudancas = np.flatnonzero(classes[:-1] != classes[1:])
+            tabela[(complexidade, ambiente)] = (
+                limites[mudancas].tolist(),
+                [int(classes[0])] + [int(c) for c in classes[mudancas + 1]]
+            )
+        
+        self._media_altura = float(self.scaler.mean_[0])
+        self._escala_altura = float(self.scaler.scale_[0])
+        
+        # Conferir a tabela contra o modelo nas fronteiras e em uma grade de alturas
+        fronteiras = limites * self._escala_altura + self._media_altura
+        alturas = np.concatenate([
+            fronteiras,
+            np.nextafter(fronteiras, -np.inf),
+            np.nextafter(fronteiras, np.inf),
+            np.linspace(-5.0, 50.0, 2201)
+        ])
+        for complexidade, ambiente in tabela:
+            X = np.column_stack([
+                alturas,
+                np.full(len(alturas), complexidade),
+                np.full(len(alturas), ambiente)
+            ])
+            esperado = self.modelo.predict(self.scaler.transform(X))
+            obtido = self._prever_pela_tabela(tabela, alturas, complexidade, ambiente)
+            if not np.array_equal(esperado, obtido):
+                return False
+        
+        self.tabela_compilada = tabela
+        return True
+    
+    def _prever_pela_tabela(self, tabela, alturas, complexidade, ambiente):
+        """
+        Consulta a tabela compilada para um vetor de alturas de um mesmo par
+        de categorias, reproduzindo a normalização e a conversão para float32
+        feitas pelo scaler e pelas árvores.
+        """
+        limites, classes = tabela[(complexidade, ambiente)]
+        alturas_norm = ((np.asarray(alturas, dtype=float) - self._media_altura) / self._escala_altura).astype(np.float32)
+        return np.asarray(classes)[np.searchsorted(limites, alturas_norm, side='left')]
+    
+    def _prever_indices(self, altura, complexidade, ambiente):
+        """
+        Retorna os índices de risco (0-3) previstos pelo modelo para vetores
+        de características, usando a tabela compilada quando disponível.
+        """
+        altura = np.asarray(altura, dtype=float)
+        complexidade = np.asarray(complexidade, dtype=float)
+        ambiente = np.asarray(ambiente, dtype=float)
+        
+        if self.tabela_compilada is not None:
+            indices = np.empty(len(altura), dtype=int)
+            pares = np.column_stack([complexidade, ambiente])
+            for par in {tuple(p) for p in pares.tolist()}:
+                if par not in self.tabela_compilada:
+                    break
+                mascara = (complexidade == par[0]) & (ambiente == par[1])
+                indices[mascara] = self._prever_pela_tabela(
+                    self.tabela_compilada, altura[mascara], par[0], par[1]
+                )
+            else:
+                return indices
+        
+        X_scaled = self.scaler.transform(np.column_stack([altura, complexidade, ambiente]))
+        return self.modelo.predict(X_scaled).astype(int)
     
     def _treinar_modelo_inicial(self):
         """
         Treina o modelo inicial com dados sintéticos baseados nas regras de negócio.
         Isso permite que o modelo funcione mesmo sem dados históricos reais.
         """
-        # Gerar dados sintéticos baseados nas regras de classificação
-        X = []
-        y = []
-        
-        # Gerar exemplos para cada nível de risco
-        # Risco Baixo
-        for _ in range(50):
-            altura = np.random.uniform(0, 0.5)
-            complexidade = np.random.uniform(0, 0.3)  # 0=baixa, 0.5=média, 1=alta
-            ambiente = np.random.uniform(0, 0.3)      # 0=controlado, 0.5=externo, 1=externo_adverso
-            X.append([altura, complexidade, ambiente])
-            y.append(0)  # 0 = baixo
-        
-        # Risco Médio
-        for _ in range(50):
-            altura = np.random.uniform(0.5, 2.0)
-            complexidade = np.random.uniform(0, 0.6)
-            ambiente = np.random.uniform(0, 0.6)
-            X.append([altura, complexidade, ambiente])
-            y.append(1)  # 1 = médio
-        
-        # Risco Alto
-        for _ in range(50):
-            altura = np.random.uniform(2.0, 6.0)
-            complexidade = np.random.uniform(0.3, 0.8)
-            ambiente = np.random.uniform(0.3, 0.8)
-            X.append([altura, complexidade, ambiente])
-            y.append(2)  # 2 = alto
-        
-        # Risco Muito Alto
-        for _ in range(50):
-            altura = np.random.uniform(6.0, 15.0)
-            complexidade = np.random.uniform(0.5, 1.0)
-            ambiente = np.random.uniform(0.5, 1.0)
-            X.append([altura, complexidade, ambiente])
-            y.append(3)  # 3 = muito alto
-        
-        # Converter para arrays numpy
-        X = np.array(X)
-        y = np.array(y)
-        
-        # Normalizar os dados
-        X_scaled = self.scaler.fit_transform(X)
-        
-        # Treinar o modelo
-        self.modelo.fit(X_scaled, y)
+        self.modelo, self.scaler = treinar_modelo([], [])
         self.modelo_treinado = True
         
-        # Salvar o modelo e o scaler
-        joblib.dump(self.modelo, self.modelo_path)
-        joblib.dump(self.scaler, self.scaler_path)
+        # Publicar como nova versão do modelo
+        self.versao_modelo = publicar_modelo(self.modelo, self.scaler, self.diretorio_modelos)['versao']
+    
+    def caracteristicas(self, projeto):
+        """
+        Características do projeto na forma usada pelo modelo:
+        [altura, complexidade, ambiente]
+        """
+        complexidade, ambiente = self._converter_categorias(projeto)
+        return [float(projeto.get('altura_maxima', 0)), complexidade, ambiente]
     
     def _converter_categorias(self, projeto):
         """
@@ -160,12 +266,16 @@ class ClassificadorRiscos:
         if not self.modelo_treinado:
             return None
         
-        # Preparar os dados para o modelo
-        X = np.array([[altura, complexidade, ambiente]])
-        X_scaled = self.scaler.transform(X)
-        
-        # Fazer a predição
-        nivel_risco_idx = self.modelo.predict(X_scaled)[0]
+        # Fazer a predição (consulta à tabela compilada quando disponível)
+        tabela = self.tabela_compilada
+        if tabela is not None and (complexidade, ambiente) in tabela:
+            limites, classes = tabela[(complexidade, ambiente)]
+            altura_norm = float(np.float32((altura - self._media_altura) / self._escala_altura))
+            nivel_risco_idx = classes[bisect_left(limites, altura_norm)]
+        else:
+            X = np.array([[altura, complexidade, ambiente]])
+            X_scaled = self.scaler.transform(X)
+            nivel_risco_idx = int(self.modelo.predict(X_scaled)[0])
         
         # Converter índice para nível de risco
         nivel_risco_map = {
@@ -230,41 +340,68 @@ class ClassificadorRiscos:
         
         return justificativa
     
-    def atualizar_modelo(self, novos_dados):
+    def atualizar_modelo(self, novos_dados, caminho_banco, n_jobs=TREINO_N_JOBS):
         """
-        Atualiza o modelo com novos dados de projetos classificados.
+        Registra novos projetos classificados como amostras rotuladas
+        (tabela amostras_risco) e retreina o modelo sobre todo o histórico,
+        publicando a nova versão (ver treinamento_riscos.retreinar_modelo).
+        Executa o treinamento na própria thread; para treinar em segundo
+        plano, use a rota /api/classificador/retreinar.
         
         Parâmetros:
         - novos_dados: lista de tuplas (características, classificação)
           onde características é uma lista [altura, complexidade, ambiente]
           e classificação é o nível de risco (0-3)
+        - caminho_banco: banco de dados com a tabela amostras_risco
         """
         if not novos_dados:
             return False
         
-        # Extrair características e classificações
-        X = []
-        y = []
-        
-        for dados, classificacao in novos_dados:
-            X.append(dados)
-            y.append(classificacao)
-        
-        X = np.array(X)
-        y = np.array(y)
-        
-        # Atualizar o scaler com os novos dados
-        X_scaled = self.scaler.transform(X)
+        conn = abrir_conexao(caminho_banco)
+        try:
+            registrar_amostras(conn, [(*dados, classificacao, None) for dados, classificacao in novos_dados])
+            conn.commit()
+        finally:
+            conn.fechar()
+        
+        # Publicação atômica: outros processos continuam lendo a versão
+        # anterior até a troca do manifesto
+        manifesto = retreinar_modelo(caminho_banco, self.diretorio_modelos, n_jobs)
+        self.modelo, self.scaler = carregar_modelo(manifesto, self.diretorio_modelos)
+        self.modelo_treinado = True
         
-        # Atualizar o modelo (treinamento incremental)
-        self.modelo.fit(X_scaled, y)
+        # Recompilar a tabela de decisão para o novo modelo
+        if self.modo_compilado:
+            self._compilar_modelo()
         
-        # Salvar o modelo e o scaler atualizados
-        joblib.dump(self.modelo, self.modelo_path)
-        joblib.dump(self.scaler, self.scaler_path)
+        # Nova versão do modelo: descartar as classificações em cache
+        self.versao_modelo = manifesto['versao']
+        self.limpar_cache()
         
         return True
     
+    def limpar_cache(self):
+        """
+        Descarta todas as classificações armazenadas em cache.
+        """
+        with self._cache_lock:
+            self._cache.clear()
+    
+    def estatisticas_cache(self):
+        """
+        Retorna os contadores do cache de classificações.
+        """
+        with self._cache_lock:
+            total = self.cache_hits + self.cache_misses
+            return {
+                'hits': self.cache_hits,
+                'misses': self.cache_misses,
+                'taxa_acerto': self.cache_hits / total if total else 0.0,
+                'tamanho': len(self._cache),
+                'tamanho_maximo': self.tamanho_cache,
+                'versao_modelo': self.versao_modelo
+            }
+    
     def classificar(self, projeto):
         """
         Classifica o nível de risco do projeto com base em suas características.
@@ -279,9 +416,39 @@ class ClassificadorRiscos:
         - justificativa: string explicando a classificação
         """
         # Extrair características do projeto
-        altura = projeto.get('altura_maxima', 0)
+        altura = float(projeto.get('altura_maxima', 0))
         complexidade_valor, ambiente_valor = self._converter_categorias(projeto)
         
+        # Consultar o cache (chave normalizada + versão do modelo)
+        chave = (altura, complexidade_valor, ambiente_valor, self.versao_modelo)
+        with self._cache_lock:
+            resultado = self._cache.get(chave)
+            if resultado is not None:
+                self._cache.move_to_end(chave)
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+        if resultado is not None:
+            _cache_acerto()
+            return dict(resultado)
+        _cache_falha()
+        
+        resultado = self._classificar_caracteristicas(altura, complexidade_valor, ambiente_valor)
+        
+        if self.tamanho_cache > 0:
+            with self._cache_lock:
+                self._cache[chave] = resultado
+                self._cache.move_to_end(chave)
+                while len(self._cache) > self.tamanho_cache:
+                    self._cache.popitem(last=False)
+        
+        return dict(resultado)
+    
+    def _classificar_caracteristicas(self, altura, complexidade_valor, ambiente_valor):
+        """
+        Classifica o risco a partir das características já convertidas,
+        sem passar pelo cache.
+        """
         # Classificação baseada em regras
         nivel_regras, fator_regras, justificativa_regras = self._classificar_por_regras(
             altura, complexidade_valor, ambiente_valor
@@ -335,6 +502,123 @@ class ClassificadorRiscos:
                 'justificativa': justificativa_regras
             }
 
+    def classificar_lote(self, projetos, ignorar_invalidos=False):
+        """
+        Classifica o nível de risco de vários projetos de uma só vez.
+        Aplica as regras, a normalização, a predição do modelo e a
+        combinação 70/30 como operações vetorizadas sobre todo o lote,
+        fazendo uma única chamada a scaler.transform e modelo.predict.
+        
+        Parâmetros:
+        - projetos: lista de dicionários com informações dos projetos
+        - ignorar_invalidos: se True, projetos com características inválidas
+          (ex.: altura_maxima nula ou não numérica) recebem None no
+          resultado; caso contrário a exceção de classificar() é levantada
+        
+        Retorna:
+        - lista de dicionários no mesmo formato de classificar(), na mesma ordem
+        """
+        if not projetos:
+            return []
+        
+        niveis = np.array(['baixo', 'medio', 'alto', 'muito_alto'])
+        fatores = np.array([1.0, 1.2, 1.4, 1.8])
+        
+        # Extrair características de todos os projetos, com a mesma
+        # conversão de classificar (None ou texto não viram NaN)
+        caracteristicas = []
+        invalidos = set()
+        for indice, projeto in enumerate(projetos):
+            try:
+                caracteristicas.append(self.caracteristicas(projeto))
+            except (TypeError, ValueError, AttributeError):
+                if not ignorar_invalidos:
+                    raise
+                invalidos.add(indice)
+        if not caracteristicas:
+            return [None] * len(projetos)
+        
+        dados = np.array(caracteristicas, dtype=float)
+        altura = dados[:, 0]
+        complexidade = dados[:, 1]
+        ambiente = dados[:, 2]
+        
+        complexidade_alta = complexidade > 0.7
+        ambiente_adverso = ambiente > 0.7
+        ajuste = 0.1 * complexidade_alta + 0.1 * ambiente_adverso
+        
+        # Classificação baseada em regras (limites de altura 0.5m, 2m e 6m)
+        nivel_regras_idx = np.searchsorted([0.5, 2.0, 6.0], altura, side='left')
+        fator_regras = np.minimum(fatores[nivel_regras_idx] + 0.1 * complexidade_alta + 0.1 * ambiente_adverso, 2.0)
+        justificativas_regras = [
+            self._gerar_justificativa_regras(nivel, alta, adverso)
+            for nivel, alta, adverso in zip(niveis[nivel_regras_idx], complexidade_alta, ambiente_adverso)
+        ]
+        
+        if not self.modelo_treinado:
+            return self._incluir_invalidos([
+                {
+                    'nivel_risco': str(nivel),
+                    'fator_multiplicador': float(fator),
+                    'justificativa': justificativa
+                }
+                for nivel, fator, justificativa in zip(niveis[nivel_regras_idx], fator_regras, justificativas_regras)
+            ], invalidos)
+        
+        # Classificação baseada no modelo (uma única predição para o lote)
+        nivel_modelo_idx = self._prever_indices(altura, complexidade, ambiente)
+        fator_modelo = np.minimum(fatores[nivel_modelo_idx] + ajuste, 2.0)
+        
+        # Combinar as duas abordagens (mesma ponderação de classificar)
+        peso_regras = 0.7
+        peso_modelo = 0.3
+        nivel_combinado_idx = np.rint(nivel_regras_idx * peso_regras + nivel_modelo_idx * peso_modelo).astype(int)
+        fator_combinado = np.minimum(fator_regras * peso_regras + fator_modelo * peso_modelo, 2.0)
+        
+        resultados = []
+        for i, justificativa_regras in enumerate(justificativas_regras):
+            justificativa_modelo = self._gerar_justificativa(
+                niveis[nivel_modelo_idx[i]], altura[i], complexidade[i], ambiente[i]
+            )
+            
+            # Usar a justificativa mais detalhada
+            justificativa = justificativa_modelo if len(justificativa_modelo) > len(justificativa_regras) else justificativa_regras
+            
+            resultados.append({
+                'nivel_risco': str(niveis[nivel_combinado_idx[i]]),
+                'fator_multiplicador': float(fator_combinado[i]),
+                'justificativa': justificativa
+            })
+        
+        return self._incluir_invalidos(resultados, invalidos)
+    
+    def _incluir_invalidos(self, resultados, invalidos):
+        """Resultados dos projetos válidos com None nas posições dos inválidos"""
+        if not invalidos:
+            return resultados
+        validos = iter(resultados)
+        return [None if indice in invalidos else next(validos)
+                for indice in range(len(resultados) + len(invalidos))]
+    
+    def _gerar_justificativa_regras(self, nivel_risco, complexidade_alta, ambiente_adverso):
+        """
+        Gera a justificativa textual da classificação baseada em regras.
+        """
+        justificativa = {
+            'baixo': "Trabalho ao nível do solo ou altura mínima.",
+            'medio': "Trabalho em baixa altura, abaixo do limite da NR-35.",
+            'alto': "Trabalho em altura conforme NR-35 (acima de 2m).",
+            'muito_alto': "Trabalho em grande altura (acima de 6m)."
+        }[nivel_risco]
+        
+        if complexidade_alta:
+            justificativa += " Complexidade alta aumenta o risco."
+        
+        if ambiente_adverso:
+            justificativa += " Condições ambientais adversas aumentam o risco."
+        
+        return justificativa
+
 # Função para calcular preço com risco
 def calcular_preco_com_risco(preco_base, nivel_risco):
     """
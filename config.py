@@ -20,6 +20,15 @@ class Config:
     # Configurações de upload de arquivos
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB limite para uploads
+    UPLOAD_LIMITE_MEMORIA = 2 * 1024 * 1024  # acima disso o upload vai para um arquivo temporário
+    
+    # Cache em disco dos PDFs de orçamentos
+    PDF_CACHE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache_pdf')
+    PDF_CACHE_MAX_BYTES = int(os.environ.get('PDF_CACHE_MAX_BYTES', 100 * 1024 * 1024))
+    
+    # Cache das análises de documentos (tabela analises_documentos)
+    ANALISES_CACHE_MAX_BYTES = int(os.environ.get('ANALISES_CACHE_MAX_BYTES', 50 * 1024 * 1024))
+    ANALISES_CACHE_MAX_IDADE = int(os.environ.get('ANALISES_CACHE_MAX_IDADE', 30 * 24 * 3600))  # 30 dias
     
     # Configurações de e-mail (para futuras implementações)
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
@@ -0,0 +1,131 @@
+import numpy as np
+
+# Grandezas do projeto que podem servir de base para o consumo de material
+BASES = ('area', 'perimetro', 'altura')
+
+# Tabela de regras de consumo de materiais.
+# Cada regra define a quantidade de um material por unidade da grandeza base
+# (ex.: 0.8 metro de metalon 40x40 por m² de área). Os modificadores são
+# multiplicadores opcionais aplicados conforme a complexidade do projeto ou o
+# nível de risco, ex.: {'complexidade': {'alta': 1.1}}.
+# Preço e ID padrão são usados quando o material não está cadastrado.
+REGRAS_CONSUMO = [
+    {
+        'material': 'Tubo Metalon 40x40',  # estrutura principal
+        'base': 'area',
+        'coeficiente': 0.8,
+        'unidade': 'metro',
+        'preco_padrao': 32.90,
+        'id_padrao': 3,
+        'modificadores': {}
+    },
+    {
+        'material': 'Tubo Metalon 20x20',  # detalhes
+        'base': 'area',
+        'coeficiente': 1.2,
+        'unidade': 'metro',
+        'preco_padrao': 15.50,
+        'id_padrao': 1,
+        'modificadores': {}
+    },
+    {
+        'material': 'Chapa Galvanizada #20',  # 70% da área total
+        'base': 'area',
+        'coeficiente': 0.7,
+        'unidade': 'm²',
+        'preco_padrao': 95.00,
+        'id_padrao': 6,
+        'modificadores': {}
+    },
+    {
+        'material': 'Parafuso Autobrocante',
+        'base': 'area',
+        'coeficiente': 15,
+        'unidade': 'unidade',
+        'preco_padrao': 0.35,
+        'id_padrao': 8,
+        'modificadores': {}
+    },
+    {
+        'material': 'Tinta Anticorrosiva',
+        'base': 'area',
+        'coeficiente': 0.1,
+        'unidade': 'litro',
+        'preco_padrao': 85.00,
+        'id_padrao': 11,
+        'modificadores': {}
+    }
+]
+
+def _matriz_coeficientes(regras):
+    """Monta a matriz (bases x regras) com os coeficientes de consumo"""
+    coeficientes = np.zeros((len(BASES), len(regras)))
+    for j, regra in enumerate(regras):
+        coeficientes[BASES.index(regra['base']), j] = regra['coeficiente']
+    return coeficientes
+
+def _matriz_modificadores(projetos, regras):
+    """Monta a matriz (projetos x regras) com os multiplicadores de cada regra"""
+    fatores = np.ones((len(projetos), len(regras)))
+    for j, regra in enumerate(regras):
+        for campo, valores in regra.get('modificadores', {}).items():
+            fatores[:, j] *= [valores.get(projeto.get(campo), 1.0) for projeto in projetos]
+    return fatores
+
+def estimar_materiais_lote(projetos, catalogo, regras=None):
+    """
+    Estima os materiais de vários projetos com um único produto de matrizes.
+
+    Parâmetros:
+    - projetos: lista de dicionários com 'area', 'perimetro', 'altura' e,
+      opcionalmente, 'complexidade' e 'nivel_risco' (usados pelos modificadores)
+    - catalogo: CatalogoMateriais com os preços e IDs atuais
+    - regras: tabela de regras de consumo (padrão: REGRAS_CONSUMO)
+
+    Retorna:
+    - lista de tuplas (materiais_estimados, valor_materiais), uma por projeto
+    """
+    regras = REGRAS_CONSUMO if regras is None else regras
+    if not projetos:
+        return []
+
+    # Grandezas de cada projeto (projetos x bases)
+    grandezas = np.array(
+        [[projeto.get(base) or 0 for base in BASES] for projeto in projetos],
+        dtype=float
+    )
+
+    # Vetor de preços e IDs dos materiais das regras, vindos do catálogo
+    precos = np.array([catalogo.preco(regra['material'], regra['preco_padrao']) for regra in regras], dtype=float)
+    ids = [catalogo.id(regra['material'], regra['id_padrao']) for regra in regras]
+
+    # Quantidades (projetos x regras), valores por item e total por projeto
+    quantidades = (grandezas @ _matriz_coeficientes(regras)) * _matriz_modificadores(projetos, regras)
+    quantidades = np.maximum(quantidades, 0)
+    valores = quantidades * precos
+    totais = quantidades @ precos
+
+    resultados = []
+    for i in range(len(projetos)):
+        materiais_estimados = [
+            {
+                'material_id': ids[j],
+                'nome': regra['material'],
+                'quantidade': float(quantidades[i, j]),
+                'unidade': regra['unidade'],
+                'valor_unitario': float(precos[j]),
+                'valor_total': float(valores[i, j])
+            }
+            for j, regra in enumerate(regras)
+            if quantidades[i, j] > 0
+        ]
+        resultados.append((materiais_estimados, float(totais[i]) if materiais_estimados else 0))
+
+    return resultados
+
+def estimar_materiais(projeto, catalogo, regras=None):
+    """
+    Estima os materiais de um único projeto.
+    Retorna a tupla (materiais_estimados, valor_materiais).
+    """
+    return estimar_materiais_lote([projeto], catalogo, regras)[0]
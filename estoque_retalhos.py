@@ -0,0 +1,82 @@
+import os
+from datetime import datetime
+
+# Sobras de corte a partir deste comprimento (mm) voltam ao estoque como retalhos
+RETALHO_COMPRIMENTO_MINIMO = float(os.environ.get('RETALHO_COMPRIMENTO_MINIMO', 300))
+
+class RetalhoIndisponivel(Exception):
+    """Um retalho do plano de corte já foi consumido por outro orçamento"""
+
+def buscar_retalhos(conn, material_id, comprimento_minimo=0):
+    """
+    Retalhos disponíveis do material com ao menos comprimento_minimo, como
+    lista de (comprimento, id) em ordem crescente de comprimento. A busca
+    usa o índice parcial idx_retalhos_disponiveis (material_id, comprimento).
+    """
+    cursor = conn.execute('''
+    SELECT comprimento, id FROM retalhos
+    WHERE material_id = ? AND comprimento >= ? AND orcamento_consumo_id IS NULL
+    ORDER BY comprimento, id
+    ''', (material_id, comprimento_minimo))
+    return [(row[0], row[1]) for row in cursor]
+
+def buscar_retalhos_candidatos(conn, material_id, demanda):
+    """
+    Retalhos disponíveis do material que um plano de corte pode usar, como
+    lista de (comprimento, id) em ordem crescente de comprimento.
+
+    demanda: {comprimento do corte: quantidade de peças}. Cada peça ocupa
+    no máximo um retalho novo, e as peças são encaixadas da maior para a
+    menor, então para cada comprimento bastam os N menores retalhos que o
+    comportam, sendo N o total de peças daquele comprimento ou maiores.
+    Cada comprimento é uma busca limitada no índice parcial
+    idx_retalhos_disponiveis; quando uma busca não atinge o limite, todos
+    os retalhos a partir dali já foram lidos e as demais são dispensadas.
+    """
+    pecas_restantes = sum(demanda.values())
+    candidatos = {}
+    for comprimento in sorted(demanda):
+        cursor = conn.execute('''
+        SELECT comprimento, id FROM retalhos
+        WHERE material_id = ? AND comprimento >= ? AND orcamento_consumo_id IS NULL
+        ORDER BY comprimento, id
+        LIMIT ?
+        ''', (material_id, comprimento, pecas_restantes))
+        linhas = cursor.fetchall()
+        candidatos.update((row[1], row[0]) for row in linhas)
+        if len(linhas) < pecas_restantes:
+            break
+        pecas_restantes -= demanda[comprimento]
+    return sorted((comprimento, retalho_id) for retalho_id, comprimento in candidatos.items())
+
+def inserir_retalhos(conn, material_id, comprimentos, orcamento_id=None):
+    """Insere retalhos no estoque (sem commit) e retorna a quantidade inserida"""
+    data = datetime.now().strftime('%Y-%m-%d')
+    conn.executemany('''
+    INSERT INTO retalhos (material_id, comprimento, data_criacao, orcamento_origem_id)
+    VALUES (?, ?, ?, ?)
+    ''', [(material_id, comprimento, data, orcamento_id) for comprimento in comprimentos])
+    return len(comprimentos)
+
+def registrar_cortes(conn, material_id, resultado, orcamento_id, comprimento_minimo=RETALHO_COMPRIMENTO_MINIMO):
+    """
+    Aplica ao estoque um plano de corte (resultado de OtimizadorCortes):
+    marca os retalhos usados como consumidos pelo orçamento e insere as
+    sobras com ao menos comprimento_minimo como novos retalhos. Não faz
+    commit; a transação é do chamador.
+
+    Levanta RetalhoIndisponivel se algum retalho já tiver sido consumido.
+    Retorna a lista de comprimentos dos novos retalhos.
+    """
+    usados = [barra['retalhoId'] for barra in resultado['barras'] if 'retalhoId' in barra]
+    cursor = conn.executemany(
+        'UPDATE retalhos SET orcamento_consumo_id = ? WHERE id = ? AND orcamento_consumo_id IS NULL',
+        [(orcamento_id, retalho_id) for retalho_id in usados]
+    )
+    if usados and cursor.rowcount != len(usados):
+        raise RetalhoIndisponivel('Retalho do plano de corte já consumido por outro orçamento')
+
+    novos = [barra['espacoRestante'] for barra in resultado['barras']
+             if barra['espacoRestante'] >= comprimento_minimo]
+    inserir_retalhos(conn, material_id, novos, orcamento_id)
+    return novos
@@ -0,0 +1,143 @@
+import os
+import io
+import tempfile
+import time
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+import metricas
+from perfilamento import perfil_ativo
+from tarefas import TarefaExpirada
+
+# Quantidade máxima de páginas lidas por documento
+MAX_PAGINAS_PDF = int(os.environ.get('PDF_MAX_PAGINAS', 200))
+
+# Tempo máximo (em segundos) gasto na extração de texto de um documento
+TEMPO_LIMITE_EXTRACAO = float(os.environ.get('PDF_TEMPO_LIMITE_EXTRACAO', 30))
+
+# Documento aberto em cada processo do pool de tarefas: (chave, leitor).
+# Cada processo lê o PDF uma vez por documento, na primeira página que
+# recebe dele
+_documento = (None, None)
+
+def _abrir_leitor(conteudo):
+    # Importado aqui para não pesar na inicialização dos workers
+    from PyPDF2 import PdfReader
+    return PdfReader(io.BytesIO(conteudo))
+
+def _extrair_pagina(caminho, chave, indice):
+    global _documento
+    if _documento[0] != chave:
+        with open(caminho, 'rb') as entrada:
+            _documento = (chave, _abrir_leitor(entrada.read()))
+    return _documento[1].pages[indice].extract_text()
+
+def _extrair_no_pool(mapear, caminho, a_ler, prazo, registrar):
+    """
+    Distribui as páginas no pool de tarefas (mapear, ver
+    tarefas.GerenciadorTarefas.mapear), que mantém uma janela limitada de
+    páginas em extração, para que a parada antecipada não desperdice a
+    extração do restante do documento. Retorna o motivo da interrupção
+    (ou None).
+    """
+    textos = mapear(
+        partial(_extrair_pagina, caminho, uuid.uuid4().hex), range(a_ler),
+        minimo_paralelo=1, tempo_limite=max(prazo - time.monotonic(), 0.001)
+    )
+    try:
+        for texto in textos:
+            motivo = registrar(texto)
+            if motivo:
+                return motivo
+    except TarefaExpirada:
+        return 'tempo_limite'
+    finally:
+        # Cancela as páginas ainda não iniciadas e libera a reserva da fila
+        textos.close()
+    return None
+
+def extrair_texto_pdf(arquivo, parar_quando=None, max_paginas=None, tempo_limite=None, mapear=None):
+    """
+    Extrai o texto de um PDF página a página e retorna a tupla (texto, info).
+
+    - arquivo: caminho ou arquivo binário aberto
+    - parar_quando: função chamada com o texto de cada página, na ordem;
+      quando retorna True a extração é encerrada após essa página
+    - max_paginas / tempo_limite: limites de páginas e de tempo por documento
+    - mapear: GerenciadorTarefas.mapear do pool de tarefas; com ele, as
+      páginas são extraídas em paralelo nos processos do pool (exceto sob
+      perfil), e sem ele, no próprio processo. Levanta FilaCheia se o pool
+      não tiver vagas.
+
+    info contém 'paginas_total', 'paginas_lidas' e 'interrompida' (None ou
+    o motivo: 'criterio_atingido', 'limite_paginas' ou 'tempo_limite').
+    """
+    max_paginas = MAX_PAGINAS_PDF if max_paginas is None else max_paginas
+    tempo_limite = TEMPO_LIMITE_EXTRACAO if tempo_limite is None else tempo_limite
+    inicio = time.perf_counter()
+    prazo = time.monotonic() + tempo_limite
+
+    if isinstance(arquivo, (str, os.PathLike)):
+        with open(arquivo, 'rb') as entrada:
+            conteudo = entrada.read()
+    else:
+        conteudo = arquivo.read()
+
+    leitor = _abrir_leitor(conteudo)
+    total = len(leitor.pages)
+    a_ler = min(total, max_paginas)
+
+    paginas = []
+    interrompida = 'limite_paginas' if a_ler < total else None
+
+    def registrar(texto):
+        """Guarda o texto da página; retorna o motivo da parada, se houver"""
+        paginas.append(texto)
+        if parar_quando is not None and parar_quando(texto):
+            return 'criterio_atingido'
+        if time.monotonic() > prazo and len(paginas) < a_ler:
+            return 'tempo_limite'
+        return None
+
+    paralelo = mapear is not None and a_ler > 0 and not perfil_ativo()
+    if paralelo:
+        # Os processos do pool leem o PDF do disco
+        temporario = None
+        if isinstance(arquivo, (str, os.PathLike)):
+            caminho = arquivo
+        else:
+            fd, temporario = tempfile.mkstemp(suffix='.pdf')
+            with os.fdopen(fd, 'wb') as saida:
+                saida.write(conteudo)
+            caminho = temporario
+        try:
+            interrompida = _extrair_no_pool(mapear, caminho, a_ler, prazo, registrar) or interrompida
+        except BrokenProcessPool:
+            # Pool encerrado pelo tempo limite de outra tarefa: ler as
+            # páginas restantes no próprio processo
+            paralelo = False
+        finally:
+            if temporario is not None:
+                os.remove(temporario)
+
+    if not paralelo:
+        for indice in range(len(paginas), a_ler):
+            motivo = registrar(leitor.pages[indice].extract_text())
+            if motivo:
+                interrompida = motivo
+                break
+
+    # Tempo médio por página lida (abertura do documento incluída)
+    if paginas:
+        metricas.observar(
+            'documento_pagina_duracao_segundos',
+            (time.perf_counter() - inicio) / len(paginas),
+            vezes=len(paginas)
+        )
+
+    info = {
+        'paginas_total': total,
+        'paginas_lidas': len(paginas),
+        'interrompida': interrompida
+    }
+    return ''.join(paginas), info
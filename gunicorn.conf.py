@@ -0,0 +1,29 @@
+import gc
+import os
+import tempfile
+
+# Configuração do gunicorn (lida automaticamente do diretório de trabalho).
+# Porta ($PORT) e número de workers ($WEB_CONCURRENCY) seguem os padrões do gunicorn.
+
+# Carregar a aplicação (e o modelo de classificação de riscos) uma única vez
+# no processo mestre: os workers criados por fork compartilham essas páginas
+# de memória (copy-on-write) em vez de cada um carregar sua cópia. Só a
+# versão carregada no mestre é compartilhada: uma versão publicada depois
+# (ver routes.main.verificar_modelo_publicado) é carregada por cada worker
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Diretório onde cada worker grava suas métricas, somadas em /metrics (ver
+# metricas.RegistroMetricas). Definido aqui, antes de a aplicação ser
+# importada, para que todos os workers usem o mesmo
+os.environ.setdefault('METRICAS_DIR', os.path.join(tempfile.gettempdir(), f'serralheria-metricas-{os.getuid()}'))
+
+def on_starting(server):
+    # Descartar os valores gravados pela execução anterior
+    from metricas import preparar_diretorio
+    preparar_diretorio(os.environ['METRICAS_DIR'])
+
+def when_ready(server):
+    # Mover os objetos já carregados para a geração permanente do coletor de
+    # lixo, que então não os percorre (e não suja as páginas compartilhadas)
+    # nos workers
+    gc.freeze()
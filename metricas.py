@@ -0,0 +1,295 @@
+import atexit
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Diretório compartilhado pelos processos da aplicação (workers do gunicorn e
+# processos do pool de tarefas), onde cada um grava seus valores; sem ele as
+# métricas expostas são apenas as do processo que atende a requisição
+DIRETORIO_METRICAS = os.environ.get('METRICAS_DIR') or None
+
+# Intervalo (em segundos) entre as gravações dos valores de cada processo
+INTERVALO_GRAVACAO = float(os.environ.get('METRICAS_INTERVALO_GRAVACAO', 5))
+
+# Prefixo dos nomes expostos
+PREFIXO = 'serralheria_'
+
+# Limites superiores dos buckets dos histogramas
+BUCKETS_DURACAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BUCKETS_RAPIDOS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+BUCKETS_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Métricas conhecidas: nome -> (tipo, descrição, buckets dos histogramas)
+METRICAS = {
+    'http_requisicao_duracao_segundos': (
+        'histogram', 'Duração das requisições por rota, método e status', BUCKETS_DURACAO
+    ),
+    'db_consultas_por_requisicao': (
+        'histogram', 'Comandos SQL executados por requisição', BUCKETS_CONSULTAS
+    ),
+    'db_tempo_por_requisicao_segundos': (
+        'histogram', 'Tempo gasto nos comandos SQL de cada requisição', BUCKETS_DURACAO
+    ),
+    'classificador_duracao_segundos': (
+        'histogram', 'Duração das chamadas ao classificador de riscos', BUCKETS_RAPIDOS
+    ),
+    'classificador_projetos_total': (
+        'counter', 'Projetos classificados pelo classificador de riscos', None
+    ),
+    'pdf_geracao_duracao_segundos': (
+        'histogram', 'Tempo de geração dos PDFs de orçamentos', BUCKETS_DURACAO
+    ),
+    'pdf_gerados_bytes_total': (
+        'counter', 'Bytes dos PDFs de orçamentos gerados', None
+    ),
+    'documento_pagina_duracao_segundos': (
+        'histogram', 'Tempo de extração de texto por página dos documentos PDF', BUCKETS_DURACAO
+    ),
+    'cache_consultas_total': (
+        'counter', 'Consultas aos caches por resultado (acerto ou falha)', None
+    ),
+}
+
+class RegistroMetricas:
+    """
+    Contadores e histogramas do processo atual, expostos no formato texto
+    do Prometheus.
+
+    Com um diretório compartilhado, cada processo grava periodicamente
+    (em segundo plano) seus valores em <diretorio>/<pid>.json, e exportar()
+    soma os arquivos de todos os processos aos valores atuais do próprio
+    processo. Os arquivos de processos encerrados são mantidos, para que os
+    contadores não diminuam quando um worker é substituído.
+    """
+
+    def __init__(self, diretorio=DIRETORIO_METRICAS, intervalo=INTERVALO_GRAVACAO, definicoes=METRICAS):
+        self.diretorio = diretorio
+        self.intervalo = intervalo
+        self.definicoes = definicoes
+        self._reiniciar()
+        # Os valores herdados pelo fork pertencem ao processo pai
+        os.register_at_fork(after_in_child=self._reiniciar)
+        atexit.register(self.gravar)
+
+    def _reiniciar(self):
+        self._lock = threading.Lock()
+        # (nome, rótulos) -> valor do contador, ou contagens por bucket
+        # (a última é a do bucket +Inf) seguidas da soma, nos histogramas
+        self._valores = {}
+        self._pid = os.getpid()
+        self._alterado = False
+        self._gravador = None
+
+    def incrementar(self, nome, valor=1, **rotulos):
+        """Soma valor ao contador com os rótulos informados"""
+        self._incrementar(_chave(nome, rotulos), valor)
+
+    def contador(self, nome, **rotulos):
+        """
+        Função que soma um valor (padrão 1) ao contador com os rótulos
+        informados, com a chave já montada (para caminhos muito frequentes)
+        """
+        chave = _chave(nome, rotulos)
+        return lambda valor=1: self._incrementar(chave, valor)
+
+    def _incrementar(self, chave, valor):
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+            self._marcar_alterado()
+
+    def observar(self, nome, valor, vezes=1, **rotulos):
+        """
+        Registra uma observação no histograma. Com vezes > 1, conta como
+        `vezes` observações de mesmo valor (ex.: tempo médio de várias páginas).
+        """
+        limites = self.definicoes[nome][2]
+        chave = _chave(nome, rotulos)
+        with self._lock:
+            dados = self._valores.get(chave)
+            if dados is None:
+                dados = self._valores[chave] = [0] * (len(limites) + 1) + [0.0]
+            dados[bisect_left(limites, valor)] += vezes
+            dados[-1] += valor * vezes
+            self._marcar_alterado()
+
+    def _marcar_alterado(self):
+        self._alterado = True
+        if self._gravador is None and self.diretorio:
+            self._gravador = threading.Thread(target=self._gravar_periodicamente, daemon=True)
+            self._gravador.start()
+
+    def _gravar_periodicamente(self):
+        while True:
+            time.sleep(self.intervalo)
+            self.gravar()
+
+    def _arquivo(self, pid):
+        return os.path.join(self.diretorio, f'{pid}.json')
+
+    def _serializar(self):
+        return [[nome, rotulos, valor] for (nome, rotulos), valor in self._valores.items()]
+
+    def gravar(self):
+        """Grava os valores do processo no diretório compartilhado, se houver alterações"""
+        if not self.diretorio or self._pid != os.getpid():
+            return
+        with self._lock:
+            if not self._alterado:
+                return
+            dados = json.dumps(self._serializar())
+            self._alterado = False
+
+        temporario = os.path.join(self.diretorio, f'.tmp-{uuid.uuid4().hex}')
+        try:
+            os.makedirs(self.diretorio, exist_ok=True)
+            with open(temporario, 'w', encoding='utf-8') as arquivo:
+                arquivo.write(dados)
+            os.replace(temporario, self._arquivo(self._pid))
+        except OSError:
+            # Tentar de novo na próxima gravação
+            self._alterado = True
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+    def exportar(self):
+        """Valores somados de todos os processos, no formato texto do Prometheus"""
+        totais = {}
+        if self.diretorio and os.path.isdir(self.diretorio):
+            proprio = f'{os.getpid()}.json'
+            for nome in os.listdir(self.diretorio):
+                if not nome.endswith('.json') or nome == proprio:
+                    continue
+                try:
+                    with open(os.path.join(self.diretorio, nome), encoding='utf-8') as arquivo:
+                        self._somar(totais, json.load(arquivo))
+                except (OSError, ValueError):
+                    continue
+        with self._lock:
+            self._somar(totais, self._serializar())
+        return self._formatar(totais)
+
+    def _somar(self, totais, series):
+        for nome, rotulos, valor in series:
+            if nome not in self.definicoes:
+                continue
+            chave = (nome, tuple(tuple(par) for par in rotulos))
+            atual = totais.get(chave)
+            if atual is None:
+                totais[chave] = list(valor) if isinstance(valor, list) else valor
+            elif isinstance(valor, list):
+                # Buckets alterados entre versões: manter a série já somada
+                if len(valor) == len(atual):
+                    totais[chave] = [a + b for a, b in zip(atual, valor)]
+            else:
+                totais[chave] = atual + valor
+
+    def _formatar(self, totais):
+        linhas = []
+        for nome, (tipo, descricao, limites) in self.definicoes.items():
+            completo = PREFIXO + nome
+            linhas.append(f'# HELP {completo} {_escapar_descricao(descricao)}')
+            linhas.append(f'# TYPE {completo} {tipo}')
+            series = sorted((rotulos, valor) for (serie, rotulos), valor in totais.items() if serie == nome)
+            for rotulos, valor in series:
+                if tipo != 'histogram':
+                    linhas.append(f'{completo}{_rotulos(rotulos)} {_numero(valor)}')
+                    continue
+                acumulado = 0
+                for limite, contagem in zip(limites + (math.inf,), valor):
+                    acumulado += contagem
+                    linhas.append(f'{completo}_bucket{_rotulos(rotulos + (("le", _numero(limite)),))} {acumulado}')
+                linhas.append(f'{completo}_sum{_rotulos(rotulos)} {_numero(valor[-1])}')
+                linhas.append(f'{completo}_count{_rotulos(rotulos)} {acumulado}')
+        return '\n'.join(linhas) + '\n'
+
+def _chave(nome, rotulos):
+    return (nome, tuple(sorted((rotulo, str(valor)) for rotulo, valor in rotulos.items())))
+
+def _escapar_descricao(texto):
+    return texto.replace('\\', r'\\').replace('\n', r'\n')
+
+def _escapar_rotulo(texto):
+    return _escapar_descricao(texto).replace('"', r'\"')
+
+def _rotulos(rotulos):
+    if not rotulos:
+        return ''
+    return '{' + ','.join(f'{rotulo}="{_escapar_rotulo(valor)}"' for rotulo, valor in rotulos) + '}'
+
+def _numero(valor):
+    if valor == math.inf:
+        return '+Inf'
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+def preparar_diretorio(diretorio):
+    """
+    Cria o diretório compartilhado e remove os valores de uma execução
+    anterior. Chamado pelo processo mestre antes de criar os workers.
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    for nome in os.listdir(diretorio):
+        if nome.endswith('.json') or nome.startswith('.tmp-'):
+            try:
+                os.remove(os.path.join(diretorio, nome))
+            except OSError:
+                pass
+
+# Registro do processo (os workers criados por fork começam com valores zerados)
+registro = RegistroMetricas()
+
+def incrementar(nome, valor=1, **rotulos):
+    registro.incrementar(nome, valor, **rotulos)
+
+def observar(nome, valor, vezes=1, **rotulos):
+    registro.observar(nome, valor, vezes, **rotulos)
+
+def registrar_cache(cache, acerto):
+    """Conta uma consulta ao cache informado como acerto ou falha"""
+    registro.incrementar('cache_consultas_total', cache=cache, resultado='acerto' if acerto else 'falha')
+
+@contextmanager
+def cronometrar(nome, **rotulos):
+    """Registra no histograma `nome` a duração do bloco, em segundos"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registro.observar(nome, time.perf_counter() - inicio, **rotulos)
+
+def init_app(app, blueprints=('main', 'api')):
+    """
+    Mede as requisições atendidas pelos blueprints informados: duração por
+    rota, método e status, e quantidade e tempo dos comandos SQL executados
+    """
+    # Importados aqui: o registro também é usado fora da aplicação (pool de tarefas)
+    from flask import g, request
+    import banco_dados
+
+    @app.before_request
+    def iniciar_medicao_requisicao():
+        if request.blueprint in blueprints:
+            g._inicio_metricas = time.perf_counter()
+            banco_dados.iniciar_medicao()
+
+    @app.after_request
+    def registrar_requisicao(resposta):
+        inicio = g.pop('_inicio_metricas', None)
+        if inicio is None:
+            return resposta
+        duracao = time.perf_counter() - inicio
+        consultas, tempo_consultas = banco_dados.encerrar_medicao()
+        rota = request.url_rule.rule
+        registro.observar(
+            'http_requisicao_duracao_segundos', duracao,
+            rota=rota, metodo=request.method, status=resposta.status_code
+        )
+        registro.observar('db_consultas_por_requisicao', consultas, rota=rota)
+        registro.observar('db_tempo_por_requisicao_segundos', tempo_consultas, rota=rota)
+        return resposta
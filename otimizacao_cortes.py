@@ -0,0 +1,423 @@
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict, defaultdict, deque
+from heapq import heappop, heappush
+from metricas import registrar_cache
+
+# Tamanho padrão das barras e tolerância (espessura do corte), em mm,
+# os mesmos do otimizador do navegador (static/js/otimizador_cortes.js)
+TAMANHO_BARRA_PADRAO = 6000
+TOLERANCIA_CORTE_PADRAO = 3
+
+# Quantidade máxima de peças (já multiplicadas pela quantidade) por otimização
+MAX_PECAS_CORTE = 100000
+
+# Modo exato: quantidade máxima de peças e tempo limite padrão (em segundos)
+MAX_PECAS_EXATO = 60
+TEMPO_LIMITE_EXATO = 2.0
+MAX_TEMPO_LIMITE_EXATO = 10.0
+
+# Nós da busca exata entre verificações do tempo limite
+_NOS_ENTRE_VERIFICACOES = 1024
+
+class CorteInvalido(Exception):
+    """Peças ou barras inválidas para a otimização de cortes"""
+
+class OtimizadorCortes:
+    """
+    Otimização de cortes de barras (perfis de alumínio, tubos de aço).
+
+    - modo 'rapido': best-fit decreasing; cada peça vai para a barra aberta
+      com a menor sobra suficiente, em O(log n) por peça (ver melhor_encaixe)
+    - modo 'exato': branch-and-bound para poucas peças, partindo da solução
+      rápida; ao fim do tempo limite retorna a melhor solução encontrada
+
+    Com vários tamanhos de barra, o objetivo é o menor comprimento total de
+    barras. A tolerância de corte é somada a cada peça, como no navegador.
+    Retalhos em estoque entram como barras já abertas e são consumidos
+    antes de qualquer barra nova.
+
+    Os planos de corte ficam em um cache LRU indexado pelo multiconjunto
+    de tamanhos das peças, de modo que a ordem e as descrições das peças
+    não afetam o reaproveitamento.
+    """
+
+    def __init__(self, tamanho_cache=256):
+        self.tamanho_cache = tamanho_cache
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def otimizar(self, pecas, barras=None, tolerancia=TOLERANCIA_CORTE_PADRAO, modo='rapido',
+                 tempo_limite=TEMPO_LIMITE_EXATO, retalhos=None):
+        """
+        Otimiza o corte das peças e retorna o resultado no formato do
+        otimizador do navegador (barras, totalBarras, desperdicio, eficiencia,
+        tamanhoBarraPadrao), acrescido de toleranciaCorte, modo e otimo.
+
+        - pecas: lista de {'tamanho', 'quantidade', 'descricao'}
+        - barras: lista de {'tamanho', 'quantidade'} (quantidade opcional,
+          None = ilimitada); padrão: barras de TAMANHO_BARRA_PADRAO
+        - retalhos: lista de (comprimento, id) dos retalhos em estoque,
+          usados antes de abrir barras novas
+
+        Levanta CorteInvalido para entradas inválidas ou barras insuficientes.
+        """
+        if modo not in ('rapido', 'exato'):
+            raise CorteInvalido("modo deve ser 'rapido' ou 'exato'")
+        estoque = _normalizar_barras(barras)
+        multiconjunto, pecas_por_tamanho = _normalizar_pecas(pecas, tolerancia)
+
+        total_pecas = sum(quantidade for _, quantidade in multiconjunto)
+        if modo == 'exato' and total_pecas > MAX_PECAS_EXATO:
+            modo = 'rapido'
+
+        # Retalhos menores que a menor peça nunca são usados
+        menor_peca = multiconjunto[-1][0]
+        retalhos = sorted(retalho for retalho in (retalhos or ()) if retalho[0] >= menor_peca)
+        comprimentos_retalhos = tuple(comprimento for comprimento, _ in retalhos)
+
+        chave = (multiconjunto, estoque, comprimentos_retalhos, modo, tempo_limite if modo == 'exato' else None)
+        with self._cache_lock:
+            plano = self._cache.get(chave)
+            if plano is not None:
+                self._cache.move_to_end(chave)
+        registrar_cache('cortes', plano is not None)
+
+        if plano is None:
+            tamanhos = [tamanho for tamanho, quantidade in multiconjunto for _ in range(quantidade)]
+            plano = melhor_encaixe(tamanhos, estoque, comprimentos_retalhos)
+            otimo = False
+            if modo == 'exato':
+                plano, otimo = busca_exata(tamanhos, estoque, plano, tempo_limite, comprimentos_retalhos)
+            plano = (plano, otimo)
+            if self.tamanho_cache > 0:
+                with self._cache_lock:
+                    self._cache[chave] = plano
+                    self._cache.move_to_end(chave)
+                    while len(self._cache) > self.tamanho_cache:
+                        self._cache.popitem(last=False)
+
+        plano, otimo = plano
+        resultado = _montar_resultado(plano, pecas_por_tamanho, max(tamanho for tamanho, _ in estoque), retalhos)
+        resultado['toleranciaCorte'] = tolerancia
+        resultado['modo'] = modo
+        resultado['otimo'] = otimo
+        return resultado
+
+def _numero(valor, campo):
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)) or valor != valor:
+        raise CorteInvalido(f'{campo} deve ser um número')
+    return int(valor) if float(valor).is_integer() else valor
+
+def _normalizar_barras(barras):
+    """Tamanhos de barra disponíveis como tupla ordenada de (tamanho, quantidade ou None)"""
+    if not barras:
+        return ((TAMANHO_BARRA_PADRAO, None),)
+    estoque = defaultdict(int)
+    ilimitadas = set()
+    for barra in barras:
+        if not isinstance(barra, dict):
+            raise CorteInvalido('barras deve ser uma lista de {tamanho, quantidade}')
+        tamanho = _numero(barra.get('tamanho'), 'tamanho da barra')
+        if tamanho <= 0:
+            raise CorteInvalido('tamanho da barra deve ser positivo')
+        quantidade = barra.get('quantidade')
+        if quantidade is None:
+            ilimitadas.add(tamanho)
+        else:
+            quantidade = _numero(quantidade, 'quantidade de barras')
+            if quantidade < 0 or not isinstance(quantidade, int):
+                raise CorteInvalido('quantidade de barras deve ser um inteiro não negativo')
+            estoque[tamanho] += quantidade
+    tamanhos = set(estoque) | ilimitadas
+    return tuple((tamanho, None if tamanho in ilimitadas else estoque[tamanho]) for tamanho in sorted(tamanhos))
+
+def _normalizar_pecas(pecas, tolerancia):
+    """
+    Retorna o multiconjunto canônico dos tamanhos (com a tolerância), como
+    tupla de (tamanho, quantidade) em ordem decrescente, e, para cada
+    tamanho, a fila das peças (descrição, id) na ordem de entrada.
+    """
+    if not isinstance(pecas, list) or not pecas:
+        raise CorteInvalido('Lista de peças vazia ou inválida')
+    tolerancia = _numero(tolerancia, 'toleranciaCorte')
+    if tolerancia < 0:
+        raise CorteInvalido('toleranciaCorte não pode ser negativa')
+
+    quantidades = defaultdict(int)
+    pecas_por_tamanho = defaultdict(deque)
+    total = 0
+    for peca in pecas:
+        if not isinstance(peca, dict):
+            raise CorteInvalido('Lista de peças vazia ou inválida')
+        tamanho = _numero(peca.get('tamanho'), 'tamanho da peça')
+        quantidade = _numero(peca.get('quantidade', 1), 'quantidade da peça')
+        if tamanho <= 0 or quantidade < 0 or not isinstance(quantidade, int):
+            raise CorteInvalido('tamanho e quantidade das peças devem ser positivos')
+        total += quantidade
+        if total > MAX_PECAS_CORTE:
+            raise CorteInvalido(f'Máximo de {MAX_PECAS_CORTE} peças por otimização')
+        descricao = peca.get('descricao', '')
+        tamanho_corte = tamanho + tolerancia
+        quantidades[tamanho_corte] += quantidade
+        pecas_por_tamanho[tamanho_corte].extend(
+            (descricao, f'{descricao}-{indice + 1}') for indice in range(quantidade)
+        )
+
+    if total == 0:
+        raise CorteInvalido('Lista de peças vazia ou inválida')
+    multiconjunto = tuple(sorted(((tamanho, quantidade) for tamanho, quantidade in quantidades.items() if quantidade),
+                                 reverse=True))
+    return multiconjunto, pecas_por_tamanho
+
+def melhor_encaixe(tamanhos, estoque, retalhos=()):
+    """
+    Best-fit decreasing. tamanhos em ordem decrescente; estoque como em
+    _normalizar_barras; retalhos: comprimentos dos retalhos disponíveis, em
+    ordem crescente. Retorna o plano: lista de (tamanho da barra, [peças],
+    índice do retalho ou None), apenas com os retalhos utilizados.
+
+    As sobras das barras abertas (incluindo os retalhos) ficam em baldes,
+    um por tamanho distinto de peça: o balde i guarda, em um heap de
+    (sobra, índice), as sobras entre o i-ésimo e o próximo tamanho. A
+    menor sobra que comporta uma peça é o topo do seu balde ou, se ele
+    estiver vazio, do primeiro balde ocupado acima, localizado por uma
+    árvore de Fenwick que marca os baldes não vazios; cada peça custa
+    O(log n). Sobras que não comportam a menor peça são descartadas.
+
+    Uma barra nova só é aberta quando nenhuma sobra (nem retalho) comporta
+    a peça: usa o maior tamanho disponível e, ao final, é trocada pelo
+    menor tamanho disponível que comporte seus cortes.
+    """
+    disponiveis = {tamanho: quantidade for tamanho, quantidade in estoque}
+    menor_peca = tamanhos[-1]
+    limites = sorted(set(tamanhos))
+    balde_da_peca = {tamanho: balde for balde, tamanho in enumerate(limites)}
+    baldes = [[] for _ in limites]
+    ocupados = _ArvoreFenwick(len(limites))
+
+    def guardar(sobra, indice):
+        if sobra >= menor_peca:
+            balde = bisect_right(limites, sobra) - 1
+            if not baldes[balde]:
+                ocupados.somar(balde, 1)
+            heappush(baldes[balde], (sobra, indice))
+
+    plano = [(comprimento, [], indice) for indice, comprimento in enumerate(retalhos)]
+    for indice, comprimento in enumerate(retalhos):
+        guardar(comprimento, indice)
+
+    for tamanho in tamanhos:
+        balde = balde_da_peca[tamanho]
+        if not baldes[balde]:
+            balde = ocupados.primeiro_ocupado(balde)
+        if balde is not None:
+            sobra, indice = heappop(baldes[balde])
+            if not baldes[balde]:
+                ocupados.somar(balde, -1)
+            plano[indice][1].append(tamanho)
+        else:
+            barra = _maior_barra(disponiveis, tamanho)
+            indice = len(plano)
+            plano.append((barra, [tamanho], None))
+            sobra = barra
+        guardar(sobra - tamanho, indice)
+
+    plano = [barra for barra in plano if barra[1]]
+    if len(estoque) > 1:
+        plano = _reduzir_barras(plano, estoque)
+    return plano
+
+class _ArvoreFenwick:
+    """Contagens por posição, com busca da primeira posição ocupada a partir de outra"""
+
+    def __init__(self, tamanho):
+        self.tamanho = tamanho
+        self._arvore = [0] * (tamanho + 1)
+        self._passo_inicial = 1 << max(tamanho.bit_length() - 1, 0)
+
+    def somar(self, posicao, valor):
+        posicao += 1
+        while posicao <= self.tamanho:
+            self._arvore[posicao] += valor
+            posicao += posicao & -posicao
+
+    def _prefixo(self, posicao):
+        """Soma das contagens das posições anteriores a `posicao`"""
+        total = 0
+        while posicao > 0:
+            total += self._arvore[posicao]
+            posicao -= posicao & -posicao
+        return total
+
+    def primeiro_ocupado(self, posicao):
+        """Menor posição >= `posicao` com contagem positiva, ou None"""
+        restante = self._prefixo(posicao)
+        atual = 0
+        passo = self._passo_inicial
+        while passo:
+            proxima = atual + passo
+            if proxima <= self.tamanho and self._arvore[proxima] <= restante:
+                atual = proxima
+                restante -= self._arvore[proxima]
+            passo >>= 1
+        return atual if atual < self.tamanho else None
+
+def _maior_barra(disponiveis, tamanho):
+    """Maior tamanho de barra ainda disponível que comporta a peça"""
+    for barra in sorted(disponiveis, reverse=True):
+        if barra < tamanho:
+            break
+        if disponiveis[barra] is None or disponiveis[barra] > 0:
+            if disponiveis[barra] is not None:
+                disponiveis[barra] -= 1
+            return barra
+    if tamanho > max(disponiveis):
+        raise CorteInvalido(f'Peça de {tamanho}mm (com tolerância) maior que a maior barra disponível')
+    raise CorteInvalido('Barras insuficientes para todas as peças')
+
+def _reduzir_barras(plano, estoque):
+    """
+    Troca cada barra nova pelo menor tamanho disponível que comporte seus
+    cortes, atendendo primeiro as barras mais ocupadas.
+    """
+    disponiveis = dict(estoque)
+    novas = [indice for indice, (_, _, retalho) in enumerate(plano) if retalho is None]
+    reduzido = list(plano)
+    for indice in sorted(novas, key=lambda indice: -sum(plano[indice][1])):
+        usado = sum(plano[indice][1])
+        for barra, _ in estoque:
+            if barra >= usado and (disponiveis[barra] is None or disponiveis[barra] > 0):
+                if disponiveis[barra] is not None:
+                    disponiveis[barra] -= 1
+                reduzido[indice] = (barra, plano[indice][1], None)
+                break
+    return reduzido
+
+def busca_exata(tamanhos, estoque, plano_inicial, tempo_limite, retalhos=()):
+    """
+    Branch-and-bound sobre as peças em ordem decrescente: cada peça vai para
+    uma barra aberta ou retalho (uma tentativa por valor de sobra) ou para
+    uma barra nova de cada tamanho. Minimiza o material das barras novas;
+    o limite inferior é o material já aberto mais o que falta das peças
+    restantes além das sobras.
+
+    Retorna (plano, otimo); otimo é False se o tempo limite foi atingido.
+    """
+    prazo = time.monotonic() + tempo_limite
+    restantes = [0] * (len(tamanhos) + 1)
+    for indice in range(len(tamanhos) - 1, -1, -1):
+        restantes[indice] = restantes[indice + 1] + tamanhos[indice]
+
+    melhor = {
+        'material': sum(barra for barra, _, retalho in plano_inicial if retalho is None),
+        'plano': plano_inicial
+    }
+    disponiveis = {tamanho: quantidade for tamanho, quantidade in estoque}
+    # [tamanho da barra, sobra, peças, índice do retalho ou None]
+    abertas = [[comprimento, comprimento, [], indice] for indice, comprimento in enumerate(retalhos)
+               if comprimento >= tamanhos[-1]]
+    estado = {'material': 0, 'livre': sum(aberta[1] for aberta in abertas), 'nos': 0, 'esgotado': False}
+
+    def buscar(indice):
+        estado['nos'] += 1
+        if estado['nos'] % _NOS_ENTRE_VERIFICACOES == 0 and time.monotonic() > prazo:
+            estado['esgotado'] = True
+        if estado['esgotado']:
+            return
+        if indice == len(tamanhos):
+            if estado['material'] < melhor['material']:
+                melhor['material'] = estado['material']
+                melhor['plano'] = [(barra, list(pecas), retalho) for barra, _, pecas, retalho in abertas if pecas]
+            return
+        if estado['material'] + max(0, restantes[indice] - estado['livre']) >= melhor['material']:
+            return
+
+        tamanho = tamanhos[indice]
+        tentadas = set()
+        for aberta in sorted(abertas, key=lambda barra: barra[1]):
+            sobra = aberta[1]
+            if sobra < tamanho or sobra in tentadas:
+                continue
+            tentadas.add(sobra)
+            aberta[1] -= tamanho
+            aberta[2].append(tamanho)
+            estado['livre'] -= tamanho
+            buscar(indice + 1)
+            estado['livre'] += tamanho
+            aberta[2].pop()
+            aberta[1] += tamanho
+
+        for barra, _ in estoque:
+            if barra < tamanho or disponiveis[barra] == 0:
+                continue
+            if disponiveis[barra] is not None:
+                disponiveis[barra] -= 1
+            abertas.append([barra, barra - tamanho, [tamanho], None])
+            estado['material'] += barra
+            estado['livre'] += barra - tamanho
+            buscar(indice + 1)
+            estado['livre'] -= barra - tamanho
+            estado['material'] -= barra
+            abertas.pop()
+            if disponiveis[barra] is not None:
+                disponiveis[barra] += 1
+
+    # Solução inicial já no limite inferior: ótima sem busca
+    if melhor['material'] > _limite_inferior(tamanhos, estoque, retalhos):
+        buscar(0)
+    return melhor['plano'], not estado['esgotado']
+
+def _limite_inferior(tamanhos, estoque, retalhos=()):
+    """
+    Limite inferior do material das barras novas: o que os retalhos não
+    comportam das peças (arredondado para barras inteiras, com um só tamanho)
+    """
+    total = max(0, sum(tamanhos) - sum(retalhos))
+    if len(estoque) == 1:
+        barra = estoque[0][0]
+        return -(-total // barra) * barra
+    return total
+
+def _montar_resultado(plano, pecas_por_tamanho, tamanho_padrao, retalhos=()):
+    """
+    Resultado no formato do otimizador do navegador, com as descrições das
+    peças. Barras cortadas de retalhos trazem o ID do retalho (retalhoId).
+    """
+    filas = {tamanho: deque(pecas) for tamanho, pecas in pecas_por_tamanho.items()}
+    barras = []
+    desperdicio = 0
+    material = 0
+    for numero, (tamanho_barra, cortes, retalho) in enumerate(plano, 1):
+        pecas = []
+        for tamanho in sorted(cortes, reverse=True):
+            descricao, identificador = filas[tamanho].popleft()
+            pecas.append({'tamanho': tamanho, 'descricao': descricao, 'id': identificador})
+        utilizado = sum(cortes)
+        sobra = tamanho_barra - utilizado
+        barra = {
+            'id': numero,
+            'tamanhoTotal': tamanho_barra,
+            'espacoRestante': sobra,
+            'espacoUtilizado': utilizado,
+            'pecas': pecas,
+            'desperdicio': sobra,
+            'eficiencia': utilizado / tamanho_barra * 100
+        }
+        if retalho is not None:
+            barra['retalhoId'] = retalhos[retalho][1]
+        barras.append(barra)
+        desperdicio += sobra
+        material += tamanho_barra
+
+    retalhos_utilizados = sum(1 for _, _, retalho in plano if retalho is not None)
+    return {
+        'barras': barras,
+        'totalBarras': len(barras),
+        'barrasNovas': len(barras) - retalhos_utilizados,
+        'retalhosUtilizados': retalhos_utilizados,
+        'desperdicio': desperdicio,
+        'eficiencia': (material - desperdicio) / material * 100,
+        'tamanhoBarraPadrao': tamanho_padrao
+    }
@@ -0,0 +1,255 @@
+import argparse
+import cProfile
+import hashlib
+import hmac
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+
+# Cabeçalho que pede o perfil de uma requisição: "<expira>:<assinatura>",
+# com a assinatura HMAC-SHA256 de "<expira>:<caminho>" (ver assinar_perfil)
+CABECALHO_PERFIL = 'X-Perfil'
+CHAVE_WSGI_PERFIL = 'HTTP_X_PERFIL'
+
+# Cabeçalho da resposta com o nome dos arquivos gravados
+CABECALHO_ARQUIVO = 'X-Perfil-Arquivo'
+
+# Validade padrão (em segundos) das assinaturas geradas
+VALIDADE_ASSINATURA = 300
+
+# Profundidade máxima das pilhas reconstruídas e fração mínima do tempo total
+# abaixo da qual uma função não é expandida (ver pilhas_colapsadas)
+PROFUNDIDADE_MAXIMA = 100
+FRACAO_MINIMA_PILHA = 0.0005
+
+# Indica se a requisição da thread atual está sob perfil (ver perfil_ativo)
+_local = threading.local()
+
+def perfil_ativo():
+    """
+    True se a thread atual está atendendo uma requisição sob perfil. Nesse
+    caso as tarefas do pool são executadas na própria thread (ver
+    tarefas.GerenciadorTarefas), para que entrem no perfil.
+    """
+    return getattr(_local, 'ativo', False)
+
+def _assinatura(chave, expira, caminho):
+    mensagem = f'{expira}:{caminho}'.encode('utf-8')
+    return hmac.new(chave.encode('utf-8'), mensagem, hashlib.sha256).hexdigest()
+
+def assinar_perfil(chave, caminho, validade=VALIDADE_ASSINATURA):
+    """Valor do cabeçalho X-Perfil que autoriza o perfil das requisições ao caminho"""
+    expira = int(time.time()) + validade
+    return f'{expira}:{_assinatura(chave, expira, caminho)}'
+
+def assinatura_valida(chave, valor, caminho):
+    """Verifica o valor do cabeçalho X-Perfil para o caminho (assinatura e validade)"""
+    expira, _, assinatura = valor.partition(':')
+    try:
+        expira = int(expira)
+    except ValueError:
+        return False
+    if expira < time.time():
+        return False
+    return hmac.compare_digest(assinatura, _assinatura(chave, expira, caminho))
+
+def _nome_funcao(funcao):
+    arquivo, linha, nome = funcao
+    if arquivo == '~':
+        # Funções embutidas: "<built-in method ...>"
+        return nome.replace(';', ',')
+    return f'{os.path.basename(arquivo)}:{linha}({nome})'.replace(';', ',')
+
+def pilhas_colapsadas(estatisticas):
+    """
+    Converte as estatísticas do cProfile em pilhas colapsadas ("a;b;c
+    microssegundos" por linha, o formato de entrada do flamegraph.pl e do
+    speedscope). O cProfile guarda apenas os pares chamador -> chamado, então
+    as pilhas são reconstruídas a partir das funções sem chamador, dividindo
+    o tempo de cada função entre as pilhas proporcionalmente às chamadas.
+    Funções com pouco tempo na pilha não são expandidas.
+    """
+    dados = estatisticas.stats
+    chamados = {}
+    for funcao, (_, _, _, _, chamadores) in dados.items():
+        for chamador in chamadores:
+            chamados.setdefault(chamador, []).append(funcao)
+
+    raizes = [funcao for funcao, (_, _, _, _, chamadores) in dados.items() if not chamadores]
+    total = sum(dados[funcao][3] for funcao in raizes) or 1.0
+    tempos = {}
+
+    def empilhar(funcao, pilha, na_pilha, fator):
+        _, _, tempo_proprio, tempo_total, _ = dados[funcao]
+        if tempo_total * fator < total * FRACAO_MINIMA_PILHA or len(pilha) >= PROFUNDIDADE_MAXIMA:
+            # Pilha truncada nesta função, com todo o seu tempo
+            tempos[pilha] = tempos.get(pilha, 0.0) + tempo_total * fator
+            return
+        tempos[pilha] = tempos.get(pilha, 0.0) + tempo_proprio * fator
+        for chamado in chamados.get(funcao, ()):
+            tempo_chamado = dados[chamado][3]
+            # Recursão: o tempo já está contado na primeira ocorrência
+            if chamado in na_pilha or tempo_chamado <= 0:
+                continue
+            # Fração do tempo do chamado que vem desta função, nesta pilha
+            tempo_aresta = dados[chamado][4][funcao][3]
+            empilhar(
+                chamado, pilha + (_nome_funcao(chamado),), na_pilha | {chamado},
+                fator * tempo_aresta / tempo_chamado
+            )
+
+    for raiz in raizes:
+        empilhar(raiz, (_nome_funcao(raiz),), {raiz}, 1.0)
+
+    return ''.join(
+        f'{";".join(pilha)} {round(tempo * 1e6)}\n'
+        for pilha, tempo in sorted(tempos.items())
+        if round(tempo * 1e6) > 0
+    )
+
+class MiddlewarePerfil:
+    """
+    Middleware WSGI que executa a requisição sob o cProfile quando ela traz
+    um cabeçalho X-Perfil com assinatura válida ou é sorteada pela taxa de
+    amostragem. Grava <nome>.prof (pstats) e <nome>.folded (pilhas
+    colapsadas, ver pilhas_colapsadas) no diretório, mantendo apenas os
+    max_arquivos perfis mais recentes.
+
+    O tempo de envio das respostas em streaming também entra no perfil, e
+    as tarefas do pool pedidas pela requisição são executadas na própria
+    thread (ver perfil_ativo). Um único perfil por processo é feito de cada
+    vez (o cProfile não suporta perfis simultâneos); enquanto isso, as
+    demais requisições seguem sem perfil.
+    """
+
+    def __init__(self, wsgi_app, diretorio, taxa_amostragem=0.0, chave=None, max_arquivos=40):
+        self.wsgi_app = wsgi_app
+        self.diretorio = diretorio
+        self.taxa_amostragem = taxa_amostragem
+        self.chave = chave
+        self.max_arquivos = max_arquivos
+        self._lock = threading.Lock()
+        os.makedirs(self.diretorio, exist_ok=True)
+
+    def _pedido(self, environ):
+        """True se a requisição deve ser perfilada"""
+        valor = environ.get(CHAVE_WSGI_PERFIL)
+        if valor and self.chave and assinatura_valida(self.chave, valor, environ.get('PATH_INFO', '')):
+            return True
+        return self.taxa_amostragem > 0 and random.random() < self.taxa_amostragem
+
+    def __call__(self, environ, start_response):
+        if not self._pedido(environ) or not self._lock.acquire(blocking=False):
+            return self.wsgi_app(environ, start_response)
+
+        caminho = environ.get('PATH_INFO', '')
+        nome = '{}-{}-{}-{}'.format(
+            time.strftime('%Y%m%d-%H%M%S'),
+            os.getpid(),
+            uuid.uuid4().hex[:8],
+            re.sub(r'[^A-Za-z0-9]+', '_', f"{environ.get('REQUEST_METHOD', '')} {caminho}").strip('_')[:80]
+        )
+
+        def iniciar_resposta(status, cabecalhos, exc_info=None):
+            return start_response(status, cabecalhos + [(CABECALHO_ARQUIVO, nome)], exc_info)
+
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            # Outra ferramenta de perfil já está ativa no processo
+            self._lock.release()
+            return self.wsgi_app(environ, start_response)
+        _local.ativo = True
+        try:
+            resposta = self.wsgi_app(environ, iniciar_resposta)
+        except BaseException:
+            self._concluir(perfil, nome)
+            raise
+        return _RespostaPerfilada(resposta, lambda: self._concluir(perfil, nome))
+
+    def _concluir(self, perfil, nome):
+        """Encerra o perfil, grava os arquivos e aplica o limite do diretório"""
+        _local.ativo = False
+        try:
+            perfil.disable()
+            estatisticas = pstats.Stats(perfil)
+            base = os.path.join(self.diretorio, nome)
+            try:
+                estatisticas.dump_stats(f'{base}.prof')
+                with open(f'{base}.folded', 'w', encoding='utf-8') as arquivo:
+                    arquivo.write(pilhas_colapsadas(estatisticas))
+                self._aplicar_limite()
+            except OSError:
+                # Falha ao gravar (ex.: disco cheio): a requisição não é afetada
+                pass
+        finally:
+            self._lock.release()
+
+    def _aplicar_limite(self):
+        perfis = []
+        for nome in os.listdir(self.diretorio):
+            if nome.endswith('.prof'):
+                try:
+                    perfis.append((os.path.getmtime(os.path.join(self.diretorio, nome)), nome[:-len('.prof')]))
+                except OSError:
+                    pass
+        perfis.sort()
+        for _, antigo in perfis[:max(len(perfis) - self.max_arquivos, 0)]:
+            for extensao in ('.prof', '.folded'):
+                try:
+                    os.remove(os.path.join(self.diretorio, antigo + extensao))
+                except OSError:
+                    pass
+
+class _RespostaPerfilada:
+    """Corpo da resposta que encerra o perfil quando o servidor termina de enviá-lo"""
+
+    def __init__(self, resposta, concluir):
+        self._resposta = resposta
+        self._concluir = concluir
+
+    def __iter__(self):
+        return iter(self._resposta)
+
+    def close(self):
+        try:
+            if hasattr(self._resposta, 'close'):
+                self._resposta.close()
+        finally:
+            self._concluir()
+
+def init_app(app):
+    """
+    Instala o middleware de perfil se houver taxa de amostragem ou chave de
+    assinatura configurada; caso contrário a aplicação não é alterada
+    """
+    taxa = app.config.get('PERFIL_AMOSTRAGEM', 0.0)
+    chave = app.config.get('PERFIL_CHAVE')
+    if taxa <= 0 and not chave:
+        return
+    app.wsgi_app = MiddlewarePerfil(
+        app.wsgi_app,
+        app.config.get('PERFIL_DIR', 'perfis'),
+        taxa_amostragem=taxa,
+        chave=chave,
+        max_arquivos=app.config.get('PERFIL_MAX_ARQUIVOS', 40)
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera o cabeçalho X-Perfil para perfilar requisições a um caminho')
+    parser.add_argument('caminho', help='caminho da requisição, ex.: /api/analisar-documento')
+    parser.add_argument('--validade', type=int, default=VALIDADE_ASSINATURA, help='validade em segundos')
+    args = parser.parse_args()
+
+    chave = os.environ.get('PERFIL_CHAVE')
+    if not chave:
+        parser.error('defina a variável de ambiente PERFIL_CHAVE')
+    print(f'{CABECALHO_PERFIL}: {assinar_perfil(chave, args.caminho, args.validade)}')
+
+if __name__ == '__main__':
+    main()
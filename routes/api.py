@@ -1,12 +1,30 @@
-from flask import Blueprint, request, jsonify, send_file
-from routes.main import get_db_connection, classificar_risco, calcular_preco_com_risco, calcular_impostos, gerar_pdf_orcamento
+from flask import Blueprint, request, jsonify, send_file, Response, stream_with_context, current_app
+from routes.main import get_classificador, recarregar_classificador, classificar_risco, classificar_riscos_lote, calcular_preco_com_risco, calcular_impostos, gerar_pdf_orcamento_bytes
+from catalogo_materiais import obter_catalogo
+from estimativa_materiais import estimar_materiais, estimar_materiais_lote
+from cache_pdf import CachePDF, chave_conteudo, VERSAO_LAYOUT_PDF
+from cache_analises import CacheAnalises, CAMPOS_ESTIMATIVA
+from tarefas import GerenciadorTarefas, FilaCheia, TarefaExpirada
+from treinamento_riscos import (NIVEIS_RISCO, DIRETORIO_MODELOS, TREINO_N_JOBS, TEMPO_LIMITE_TREINO,
+                                registrar_amostras, retreinar_modelo, ler_manifesto)
+from banco_dados import get_db_connection, caminho_banco
+from extracao_pdf import extrair_texto_pdf
+from analise_imagem import analisar_imagem, ImagemMuitoGrande
+from otimizacao_cortes import (OtimizadorCortes, CorteInvalido, TOLERANCIA_CORTE_PADRAO,
+                               TEMPO_LIMITE_EXATO, MAX_TEMPO_LIMITE_EXATO)
+from calculo_espacamento import varrer_espacamentos, EspacamentoInvalido
+from estoque_retalhos import (buscar_retalhos, buscar_retalhos_candidatos, inserir_retalhos, registrar_cortes,
+                              RetalhoIndisponivel)
+from varredura_texto import varrer_texto, buscar_dimensoes
+from metricas import registrar_cache
 from datetime import datetime
 import sqlite3
 import os
-from werkzeug.utils import secure_filename
-import PyPDF2
-from PIL import Image
-import re
+import io
+import json
+import hashlib
+import tempfile
+import zipfile
 
 api_bp = Blueprint('api', __name__)
 
@@ -15,16 +33,50 @@ UPLOAD_FOLDER = 'uploads'
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
+# Colunas de cada tabela (projeção de campos e separação dos resultados com JOIN)
+COLUNAS_MATERIAL = ('id', 'nome', 'tipo', 'preco_unitario', 'unidade', 'fornecedor', 'ultima_atualizacao')
+COLUNAS_PROJETO = ('id', 'nome', 'cliente', 'data_criacao', 'altura_maxima', 'complexidade',
+                   'ambiente', 'nivel_risco', 'fator_risco', 'descricao')
+COLUNAS_ITEM = ('id', 'orcamento_id', 'material_id', 'quantidade', 'valor_unitario', 'valor_total')
+
+# Limite de parâmetros por consulta (SQLITE_MAX_VARIABLE_NUMBER em versões antigas)
+MAX_PARAMETROS_SQL = 500
+
+# Tamanho máximo de página nas listagens paginadas
+MAX_LIMITE_PAGINA = 1000
+
+# Máximo de amostras rotuladas por requisição
+MAX_AMOSTRAS_RISCO = 10000
+
+# Quantidade máxima de orçamentos em uma exportação em lote
+MAX_ORCAMENTOS_EXPORTACAO = 500
+
+# Tamanho dos blocos lidos ao gravar um upload grande em disco
+TAMANHO_BLOCO_UPLOAD = 64 * 1024
+
+# Escala dos desenhos enviados como imagem (1:N), usada com a resolução
+# (DPI) do arquivo para converter pixels em metros. As análises salvas não
+# dependem dela: ao alterá-la, incrementar cache_analises.VERSAO_ANALISADOR
+ESCALA_DESENHO_IMAGEM = float(os.environ.get('IMAGEM_ESCALA_DESENHO', 100))
+
+# Dimensões que, uma vez encontradas, encerram a leitura de um PDF
+DIMENSOES_NECESSARIAS = {'comprimento', 'largura', 'altura'}
+
+# Parâmetros que ativam a listagem paginada/filtrada em vez da lista completa
+PARAMETROS_LISTAGEM = ('limit', 'after', 'campos', 'formato', 'cliente', 'nivel_risco', 'data_inicio', 'data_fim')
+
 @api_bp.route('/materiais', methods=['GET'])
 def get_materiais():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM materiais')
-    materiais = [dict(row) for row in cursor.fetchall()]
+    if not any(parametro in request.args for parametro in PARAMETROS_LISTAGEM):
+        return jsonify(obter_catalogo().materiais)
     
-    conn.close()
-    return jsonify(materiais)
+    return listar_tabela('materiais', COLUNAS_MATERIAL, [], [])
+
+@api_bp.route('/materiais/versao', methods=['GET'])
+def get_versao_materiais():
+    """Retorna a versão do catálogo de materiais em memória (diagnóstico)"""
+    catalogo = obter_catalogo()
+    return jsonify({'versao': catalogo.versao, 'total': len(catalogo.materiais)})
 
 @api_bp.route('/projetos', methods=['GET', 'POST'])
 def projetos():
@@ -64,11 +116,23 @@ def projetos():
         return jsonify(projeto), 201
     
     else:  # GET
-        cursor.execute('SELECT * FROM projetos')
-        projetos = [dict(row) for row in cursor.fetchall()]
+        # Filtros opcionais
+        condicoes = []
+        parametros = []
+        if 'cliente' in request.args:
+            condicoes.append('cliente = ?')
+            parametros.append(request.args['cliente'])
+        if 'nivel_risco' in request.args:
+            condicoes.append('nivel_risco = ?')
+            parametros.append(request.args['nivel_risco'])
+        if 'data_inicio' in request.args:
+            condicoes.append('data_criacao >= ?')
+            parametros.append(request.args['data_inicio'])
+        if 'data_fim' in request.args:
+            condicoes.append('data_criacao <= ?')
+            parametros.append(request.args['data_fim'])
         
-        conn.close()
-        return jsonify(projetos)
+        return listar_tabela('projetos', COLUNAS_PROJETO, condicoes, parametros)
 
 @api_bp.route('/projetos/<int:projeto_id>', methods=['GET'])
 def get_projeto(projeto_id):
@@ -106,93 +170,167 @@ def analisar_projeto():
     # Classificar o risco do projeto
     risco = classificar_risco(data)
     
-    # Calcular área se não fornecida
-    area = data.get('area', 0)
-    if area == 0 and data.get('comprimento', 0) > 0 and data.get('largura', 0) > 0:
-        area = data['comprimento'] * data['largura']
-    
     # Estimar materiais necessários
+    grandezas = grandezas_projeto(data, risco)
+    estimativa = estimar_materiais(grandezas, obter_catalogo())
+    
+    return jsonify(analisar_dados_projeto(data, risco, grandezas, estimativa))
+
+@api_bp.route('/analisar-projeto/lote', methods=['POST'])
+def analisar_projetos_lote():
+    """
+    Rota para analisar vários projetos de uma vez sem salvá-los.
+    A classificação de risco do lote inteiro é feita com uma única
+    predição do modelo, e os materiais de todos os projetos são estimados
+    com um único produto de matrizes.
+    
+    Projetos inválidos (ex.: altura_maxima nula ou não numérica) não
+    interrompem o lote: no lugar da análise, o resultado traz {error}.
+    """
+    data = request.json
+    projetos = data.get('projetos', []) if isinstance(data, dict) else data
+    
+    if not isinstance(projetos, list) or not projetos:
+        return jsonify({'error': 'Nenhum projeto enviado'}), 400
+    
+    # Classificar o risco de todos os projetos em uma única passada
+    riscos = classificar_riscos_lote(projetos, ignorar_invalidos=True)
+    validos = [(projeto, risco) for projeto, risco in zip(projetos, riscos) if risco is not None]
+    
+    # Estimar os materiais de todos os projetos com um único produto de matrizes
+    grandezas = [grandezas_projeto(projeto, risco) for projeto, risco in validos]
+    estimativas = iter(estimar_materiais_lote(grandezas, obter_catalogo()))
+    analises = iter(zip(validos, grandezas))
+    
+    resultados = []
+    for indice, risco in enumerate(riscos):
+        if risco is None:
+            resultados.append({'error': f'Projeto {indice}: altura_maxima, complexidade ou ambiente inválidos'})
+            continue
+        (projeto, risco), grandezas_item = next(analises)
+        resultados.append(analisar_dados_projeto(projeto, risco, grandezas_item, next(estimativas)))
+    
+    return jsonify({
+        'total': len(resultados),
+        'erros': len(projetos) - len(validos),
+        'resultados': resultados
+    })
+
+@api_bp.route('/classificador/cache', methods=['GET'])
+def get_cache_classificador():
+    """Retorna os contadores de acerto/erro do cache de classificações"""
+    return jsonify(get_classificador().estatisticas_cache())
+
+@api_bp.route('/classificador/amostras', methods=['POST'])
+def adicionar_amostras_risco():
+    """
+    Registra amostras rotuladas para o treinamento do classificador.
+    
+    Corpo JSON: {amostras: [{altura_maxima, complexidade, ambiente,
+    nivel_risco, projeto_id}]}, com nivel_risco entre 'baixo', 'medio',
+    'alto' e 'muito_alto' (ou o índice 0-3).
+    """
+    data = request.json
+    amostras = data.get('amostras') if isinstance(data, dict) else data
+    if not isinstance(amostras, list) or not amostras:
+        return jsonify({'error': 'Nenhuma amostra enviada'}), 400
+    if len(amostras) > MAX_AMOSTRAS_RISCO:
+        return jsonify({'error': f'Máximo de {MAX_AMOSTRAS_RISCO} amostras por requisição'}), 400
+    
+    classificador = get_classificador()
+    linhas = []
+    for indice, amostra in enumerate(amostras):
+        if not isinstance(amostra, dict):
+            return jsonify({'error': f'Amostra {indice} inválida'}), 400
+        nivel = amostra.get('nivel_risco')
+        if nivel in NIVEIS_RISCO:
+            nivel = NIVEIS_RISCO.index(nivel)
+        if isinstance(nivel, bool) or nivel not in range(len(NIVEIS_RISCO)):
+            return jsonify({'error': f'Amostra {indice}: nivel_risco inválido'}), 400
+        try:
+            caracteristicas = classificador.caracteristicas(amostra)
+        except (TypeError, ValueError, AttributeError):
+            return jsonify({'error': f'Amostra {indice}: características inválidas'}), 400
+        linhas.append((*caracteristicas, nivel, amostra.get('projeto_id')))
+    
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM materiais')
-    materiais = [dict(row) for row in cursor.fetchall()]
+    registrar_amostras(conn, linhas)
+    conn.commit()
+    total = conn.execute('SELECT COUNT(*) FROM amostras_risco').fetchone()[0]
     conn.close()
     
-    # Lógica para estimar materiais
-    materiais_estimados = []
-    valor_materiais = 0
+    return jsonify({'inseridas': len(linhas), 'total': total}), 201
+
+@api_bp.route('/classificador/retreinar', methods=['POST'])
+def retreinar_classificador():
+    """
+    Enfileira o retreino do classificador sobre todas as amostras rotuladas.
+    O treinamento roda no pool de tarefas e publica uma nova versão do
+    modelo; as classificações seguem usando a versão atual até a troca.
+    Se já houver um retreino em andamento neste processo, retorna a mesma tarefa.
+    """
+    tarefas = get_tarefas()
+    tarefa_id = current_app.extensions.get('retreino_classificador')
+    if tarefa_id is not None:
+        tarefa = tarefas.consultar(tarefa_id)
+        if tarefa is not None and tarefa['status'] in ('pendente', 'executando'):
+            return resposta_tarefa_enviada(tarefa_id)
+    
+    def trocar_modelo(manifesto):
+        manifesto['versao_em_uso'] = recarregar_classificador(manifesto['versao'])
+        return manifesto
+    
+    try:
+        tarefa_id = tarefas.enviar(
+            retreinar_modelo, caminho_banco(current_app.config.get('DATABASE')),
+            DIRETORIO_MODELOS, TREINO_N_JOBS,
+            pos_processamento=trocar_modelo,
+            tempo_limite=TEMPO_LIMITE_TREINO
+        )
+    except FilaCheia as e:
+        return resposta_fila_cheia(e)
+    
+    current_app.extensions['retreino_classificador'] = tarefa_id
+    return resposta_tarefa_enviada(tarefa_id)
+
+@api_bp.route('/classificador/modelo', methods=['GET'])
+def get_modelo_classificador():
+    """Versão do modelo em uso neste processo e a última versão publicada"""
+    manifesto = ler_manifesto(DIRETORIO_MODELOS)
+    return jsonify({
+        'versao_em_uso': get_classificador().versao_modelo,
+        'versao_publicada': manifesto['versao'] if manifesto else None,
+        'amostras': manifesto.get('amostras') if manifesto else None,
+        'publicado_em': manifesto.get('publicado_em') if manifesto else None
+    })
+
+def grandezas_projeto(data, risco):
+    """
+    Extrai do projeto as grandezas usadas pelas regras de consumo de materiais.
+    """
+    comprimento = data.get('comprimento', 0)
+    largura = data.get('largura', 0)
     
-    # Estrutura (tubos metalon)
-    if area > 0:
-        # Metalon 40x40 para estrutura principal
-        qtd_metalon_40 = area * 0.8  # 0.8 metros por m²
-        valor_metalon_40 = next((m['preco_unitario'] for m in materiais if m['nome'] == 'Tubo Metalon 40x40'), 32.90)
-        valor_total_metalon_40 = qtd_metalon_40 * valor_metalon_40
-        materiais_estimados.append({
-            'material_id': next((m['id'] for m in materiais if m['nome'] == 'Tubo Metalon 40x40'), 3),
-            'nome': 'Tubo Metalon 40x40',
-            'quantidade': qtd_metalon_40,
-            'unidade': 'metro',
-            'valor_unitario': valor_metalon_40,
-            'valor_total': valor_total_metalon_40
-        })
-        valor_materiais += valor_total_metalon_40
-        
-        # Metalon 20x20 para detalhes
-        qtd_metalon_20 = area * 1.2  # 1.2 metros por m²
-        valor_metalon_20 = next((m['preco_unitario'] for m in materiais if m['nome'] == 'Tubo Metalon 20x20'), 15.50)
-        valor_total_metalon_20 = qtd_metalon_20 * valor_metalon_20
-        materiais_estimados.append({
-            'material_id': next((m['id'] for m in materiais if m['nome'] == 'Tubo Metalon 20x20'), 1),
-            'nome': 'Tubo Metalon 20x20',
-            'quantidade': qtd_metalon_20,
-            'unidade': 'metro',
-            'valor_unitario': valor_metalon_20,
-            'valor_total': valor_total_metalon_20
-        })
-        valor_materiais += valor_total_metalon_20
-        
-        # Chapa galvanizada
-        qtd_chapa = area * 0.7  # 70% da área total
-        valor_chapa = next((m['preco_unitario'] for m in materiais if m['nome'] == 'Chapa Galvanizada #20'), 95.00)
-        valor_total_chapa = qtd_chapa * valor_chapa
-        materiais_estimados.append({
-            'material_id': next((m['id'] for m in materiais if m['nome'] == 'Chapa Galvanizada #20'), 6),
-            'nome': 'Chapa Galvanizada #20',
-            'quantidade': qtd_chapa,
-            'unidade': 'm²',
-            'valor_unitario': valor_chapa,
-            'valor_total': valor_total_chapa
-        })
-        valor_materiais += valor_total_chapa
-        
-        # Parafusos
-        qtd_parafusos = area * 15  # 15 parafusos por m²
-        valor_parafuso = next((m['preco_unitario'] for m in materiais if m['nome'] == 'Parafuso Autobrocante'), 0.35)
-        valor_total_parafusos = qtd_parafusos * valor_parafuso
-        materiais_estimados.append({
-            'material_id': next((m['id'] for m in materiais if m['nome'] == 'Parafuso Autobrocante'), 8),
-            'nome': 'Parafuso Autobrocante',
-            'quantidade': qtd_parafusos,
-            'unidade': 'unidade',
-            'valor_unitario': valor_parafuso,
-            'valor_total': valor_total_parafusos
-        })
-        valor_materiais += valor_total_parafusos
-        
-        # Tinta
-        qtd_tinta = area * 0.1  # 0.1 litros por m²
-        valor_tinta = next((m['preco_unitario'] for m in materiais if m['nome'] == 'Tinta Anticorrosiva'), 85.00)
-        valor_total_tinta = qtd_tinta * valor_tinta
-        materiais_estimados.append({
-            'material_id': next((m['id'] for m in materiais if m['nome'] == 'Tinta Anticorrosiva'), 11),
-            'nome': 'Tinta Anticorrosiva',
-            'quantidade': qtd_tinta,
-            'unidade': 'litro',
-            'valor_unitario': valor_tinta,
-            'valor_total': valor_total_tinta
-        })
-        valor_materiais += valor_total_tinta
+    # Calcular área se não fornecida
+    area = data.get('area', 0)
+    if area == 0 and comprimento > 0 and largura > 0:
+        area = comprimento * largura
+    
+    return {
+        'area': area,
+        'perimetro': 2 * (comprimento + largura) if comprimento > 0 and largura > 0 else 0,
+        'altura': data.get('altura_maxima', 0),
+        'complexidade': data.get('complexidade', 'baixa'),
+        'nivel_risco': risco['nivel_risco']
+    }
+
+def analisar_dados_projeto(data, risco, grandezas, estimativa):
+    """
+    Monta a análise de um projeto (estimativa de materiais e valores)
+    a partir do risco já classificado e da estimativa de materiais.
+    """
+    area = grandezas['area']
+    materiais_estimados, valor_materiais = estimativa
     
     # Calcular valor da mão de obra
     percentual_mao_obra = data.get('custo_mao_obra_percentual', 40) / 100
@@ -238,7 +376,7 @@ def analisar_projeto():
         'valor_total': valor_total
     }
     
-    return jsonify(resultado)
+    return resultado
 
 @api_bp.route('/orcamentos', methods=['POST'])
 def criar_orcamento():
@@ -260,21 +398,21 @@ def criar_orcamento():
     
     projeto = dict(projeto)
     
+    # Buscar os materiais de todos os itens em uma única consulta
+    materiais = buscar_materiais_por_ids(cursor, [item['material_id'] for item in itens])
+    
     # Calcular valor total dos materiais
     valor_materiais = 0
     for item in itens:
         material_id = item['material_id']
         quantidade = item['quantidade']
         
-        # Buscar preço do material
-        cursor.execute('SELECT * FROM materiais WHERE id = ?', (material_id,))
-        material = cursor.fetchone()
+        material = materiais.get(material_id)
         
         if not material:
             conn.close()
             return jsonify({'error': f'Material com ID {material_id} não encontrado'}), 404
         
-        material = dict(material)
         valor_unitario = material['preco_unitario']
         valor_total_item = valor_unitario * quantidade
         
@@ -319,18 +457,20 @@ def criar_orcamento():
     
     orcamento_id = cursor.lastrowid
     
-    # Inserir itens do orçamento
-    for item in itens:
-        cursor.execute('''
-        INSERT INTO itens_orcamento (orcamento_id, material_id, quantidade, valor_unitario, valor_total)
-        VALUES (?, ?, ?, ?, ?)
-        ''', (
+    # Inserir itens do orçamento (na mesma transação do orçamento)
+    cursor.executemany('''
+    INSERT INTO itens_orcamento (orcamento_id, material_id, quantidade, valor_unitario, valor_total)
+    VALUES (?, ?, ?, ?, ?)
+    ''', [
+        (
             orcamento_id,
             item['material_id'],
             item['quantidade'],
             item['valor_unitario'],
             item['valor_total']
-        ))
+        )
+        for item in itens
+    ])
     
     conn.commit()
     
@@ -355,53 +495,188 @@ def get_orcamento_pdf(orcamento_id):
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    # Buscar informações do orçamento
-    cursor.execute('SELECT * FROM orcamentos WHERE id = ?', (orcamento_id,))
-    orcamento = cursor.fetchone()
+    # Buscar orçamento, projeto e itens em uma única consulta
+    orcamento, projeto, itens = carregar_orcamento_completo(cursor, orcamento_id)
+    conn.close()
     
     if not orcamento:
-        conn.close()
         return jsonify({'error': 'Orçamento não encontrado'}), 404
     
-    orcamento = dict(orcamento)
-    
-    # Buscar informações do projeto
-    cursor.execute('SELECT * FROM projetos WHERE id = ?', (orcamento['projeto_id'],))
-    projeto = cursor.fetchone()
-    
     if not projeto:
-        conn.close()
         return jsonify({'error': 'Projeto não encontrado'}), 404
     
-    projeto = dict(projeto)
+    # Chave do PDF: conteúdo do orçamento + versão do layout + versão do
+    # modelo de risco (que define a justificativa impressa)
+    chave = chave_conteudo(
+        VERSAO_LAYOUT_PDF, get_classificador().versao_modelo, orcamento, projeto, itens
+    )
     
-    # Adicionar justificativa de risco
-    projeto['justificativa'] = classificar_risco({
-        'altura_maxima': projeto['altura_maxima'],
-        'complexidade': projeto['complexidade'],
-        'ambiente': projeto['ambiente']
-    })['justificativa']
+    # O cliente já tem esta versão do PDF
+    if chave in request.if_none_match:
+        resposta = Response(status=304)
+        resposta.set_etag(chave)
+        return resposta
+    
+    cache = get_cache_pdf()
+    caminho = cache.obter(chave)
+    registrar_cache('pdf', caminho is not None)
+    
+    if caminho is None:
+        # Adicionar justificativa de risco
+        projeto['justificativa'] = classificar_risco({
+            'altura_maxima': projeto['altura_maxima'],
+            'complexidade': projeto['complexidade'],
+            'ambiente': projeto['ambiente']
+        })['justificativa']
+        
+        # Preparar dados para o PDF
+        orcamento_data = dados_pdf_orcamento(orcamento, projeto, itens)
+        
+        # Gerar o PDF no pool de tarefas e guardá-lo no cache
+        tarefas = get_tarefas()
+        try:
+            if modo_assincrono():
+                tarefa_id = tarefas.enviar(
+                    gerar_pdf_orcamento_bytes, orcamento_data,
+                    pos_processamento=lambda conteudo: {
+                        'caminho': cache.salvar(chave, conteudo),
+                        'download_name': f'orcamento_{orcamento_id}.pdf',
+                        'mimetype': 'application/pdf'
+                    },
+                    formato='arquivo'
+                )
+                return resposta_tarefa_enviada(tarefa_id)
+            
+            caminho = cache.salvar(chave, tarefas.executar(gerar_pdf_orcamento_bytes, orcamento_data))
+        except FilaCheia as e:
+            return resposta_fila_cheia(e)
+        except TarefaExpirada as e:
+            return jsonify({'error': str(e)}), 504
+    
+    # Retornar o PDF (com suporte a If-None-Match / If-Modified-Since)
+    return send_file(
+        caminho,
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=f'orcamento_{orcamento_id}.pdf',
+        etag=chave,
+        conditional=True
+    )
+
+@api_bp.route('/orcamentos/exportar', methods=['POST'])
+def exportar_orcamentos():
+    """
+    Exporta vários orçamentos de uma vez, como um ZIP com um PDF por
+    orçamento (padrão) ou como um único PDF com todos eles.
     
-    # Buscar itens do orçamento
-    cursor.execute('SELECT * FROM itens_orcamento WHERE orcamento_id = ?', (orcamento_id,))
-    itens_orcamento = [dict(row) for row in cursor.fetchall()]
+    Corpo JSON:
+    - ids: lista de IDs de orçamentos, ou
+    - data_inicio / data_fim: período de criação (AAAA-MM-DD, inclusivo)
+    - formato: 'zip' ou 'pdf'
     
-    # Buscar informações dos materiais
-    itens = []
-    for item in itens_orcamento:
-        cursor.execute('SELECT * FROM materiais WHERE id = ?', (item['material_id'],))
-        material = cursor.fetchone()
-        
-        if material:
-            material = dict(material)
-            item['nome'] = material['nome']
-            item['unidade'] = material['unidade']
-            itens.append(item)
+    Os PDFs já gerados são lidos do cache; os demais são gerados no pool
+    de processos e a resposta é enviada à medida que ficam prontos.
+    """
+    data = request.json or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Corpo JSON deve ser um objeto'}), 400
+    formato = data.get('formato', 'zip')
+    if formato not in ('zip', 'pdf'):
+        return jsonify({'error': "Formato deve ser 'zip' ou 'pdf'"}), 400
     
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    if 'ids' in data:
+        ids = data['ids']
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            return jsonify({'error': 'ids deve ser uma lista de números inteiros'}), 400
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > MAX_ORCAMENTOS_EXPORTACAO:
+            return jsonify({'error': f'Máximo de {MAX_ORCAMENTOS_EXPORTACAO} orçamentos por exportação'}), 400
+        
+        # Uma consulta a cada MAX_PARAMETROS_SQL IDs
+        orcamentos = []
+        for inicio in range(0, len(ids), MAX_PARAMETROS_SQL):
+            lote = ids[inicio:inicio + MAX_PARAMETROS_SQL]
+            orcamentos.extend(carregar_orcamentos_completos(
+                cursor, f'o.id IN ({", ".join("?" * len(lote))})', lote
+            ))
+        
+        encontrados = {orcamento['id'] for orcamento, _, _ in orcamentos}
+        faltantes = [i for i in ids if i not in encontrados]
+        if faltantes:
+            conn.close()
+            return jsonify({'error': f'Orçamentos não encontrados: {faltantes}'}), 404
+        
+        # Manter a ordem pedida
+        posicao = {orcamento_id: i for i, orcamento_id in enumerate(ids)}
+        orcamentos.sort(key=lambda orcamento: posicao[orcamento[0]['id']])
+    elif 'data_inicio' in data or 'data_fim' in data:
+        # Buscar um orçamento além do máximo apenas para detectar o excesso
+        orcamentos = carregar_orcamentos_completos(cursor, '''
+        o.id IN (SELECT id FROM orcamentos WHERE data_criacao >= ? AND data_criacao <= ?
+                 ORDER BY data_criacao, id LIMIT ?)
+        ''', (data.get('data_inicio', ''), data.get('data_fim', '9999-12-31'), MAX_ORCAMENTOS_EXPORTACAO + 1))
+        if len(orcamentos) > MAX_ORCAMENTOS_EXPORTACAO:
+            conn.close()
+            return jsonify({'error': f'Máximo de {MAX_ORCAMENTOS_EXPORTACAO} orçamentos por exportação; reduza o período'}), 400
+    else:
+        conn.close()
+        return jsonify({'error': 'Informe ids ou data_inicio/data_fim'}), 400
     conn.close()
     
-    # Preparar dados para o PDF
-    orcamento_data = {
+    if not orcamentos:
+        return jsonify({'error': 'Nenhum orçamento encontrado'}), 404
+    
+    sem_projeto = [orcamento['id'] for orcamento, projeto, _ in orcamentos if not projeto]
+    if sem_projeto:
+        return jsonify({'error': f'Projeto não encontrado para os orçamentos: {sem_projeto}'}), 404
+    
+    # Mesma chave do PDF individual (calculada antes da justificativa)
+    versao_modelo = get_classificador().versao_modelo
+    chaves = [
+        chave_conteudo(VERSAO_LAYOUT_PDF, versao_modelo, orcamento, projeto, itens)
+        for orcamento, projeto, itens in orcamentos
+    ]
+    
+    # Justificativas de risco com uma única predição para todos os projetos
+    riscos = classificar_riscos_lote([
+        {
+            'altura_maxima': projeto['altura_maxima'],
+            'complexidade': projeto['complexidade'],
+            'ambiente': projeto['ambiente']
+        }
+        for _, projeto, _ in orcamentos
+    ])
+    for (_, projeto, _), risco in zip(orcamentos, riscos):
+        projeto['justificativa'] = risco['justificativa']
+    
+    try:
+        pdfs = gerar_pdfs_exportacao(
+            [(orcamento['id'], chave, dados_pdf_orcamento(orcamento, projeto, itens))
+             for (orcamento, projeto, itens), chave in zip(orcamentos, chaves)],
+            get_cache_pdf(),
+            get_tarefas()
+        )
+    except FilaCheia as e:
+        return resposta_fila_cheia(e)
+    
+    if formato == 'pdf':
+        return Response(
+            stream_with_context(gerar_pdf_unico(pdfs)),
+            mimetype='application/pdf',
+            headers={'Content-Disposition': 'attachment; filename=orcamentos.pdf'}
+        )
+    return Response(
+        stream_with_context(gerar_zip(pdfs)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': 'attachment; filename=orcamentos.zip'}
+    )
+
+def dados_pdf_orcamento(orcamento, projeto, itens):
+    """Monta o dicionário usado por gerar_pdf_orcamento"""
+    return {
         'id': orcamento['id'],
         'data_criacao': orcamento['data_criacao'],
         'valor_materiais': orcamento['valor_materiais'],
@@ -412,17 +687,329 @@ def get_orcamento_pdf(orcamento_id):
         'projeto': projeto,
         'itens': itens
     }
+
+def gerar_pdfs_exportacao(entradas, cache, tarefas):
+    """
+    Retorna um gerador de (nome_arquivo, conteudo) para cada entrada (id,
+    chave, orcamento_data), na ordem recebida. Os PDFs em cache são lidos do
+    disco; os demais são gerados no pool (com poucos PDFs, na própria
+    thread) e salvos no cache. As vagas do pool são reservadas já nesta
+    chamada: FilaCheia é levantada antes de a resposta começar a ser enviada.
+    """
+    em_cache = [cache.obter(chave) is not None for _, chave, _ in entradas]
+    for hit in em_cache:
+        registrar_cache('pdf', hit)
+    gerados = tarefas.mapear(
+        gerar_pdf_orcamento_bytes,
+        [orcamento_data for (_, _, orcamento_data), hit in zip(entradas, em_cache) if not hit]
+    )
+    return _pdfs_exportacao(entradas, em_cache, gerados, cache)
+
+def _pdfs_exportacao(entradas, em_cache, gerados, cache):
+    for (orcamento_id, chave, orcamento_data), hit in zip(entradas, em_cache):
+        if not hit:
+            try:
+                conteudo = next(gerados)
+            except TarefaExpirada:
+                # A resposta já começou a ser enviada: não há como informar
+                # o erro pelo status; o download é interrompido
+                current_app.logger.error('Exportação interrompida: PDF do orçamento %s excedeu o tempo limite', orcamento_id)
+                raise
+            cache.salvar(chave, conteudo)
+        else:
+            try:
+                with open(cache.caminho(chave), 'rb') as arquivo:
+                    conteudo = arquivo.read()
+            except OSError:
+                # Removido do cache depois da verificação: gerar novamente
+                conteudo = gerar_pdf_orcamento_bytes(orcamento_data)
+        yield f'orcamento_{orcamento_id}.pdf', conteudo
+
+class SaidaStreaming(io.RawIOBase):
+    """
+    Arquivo somente de escrita que acumula os dados até serem drenados.
+    Não permite seek, por isso o zipfile grava o ZIP sequencialmente.
+    """
+
+    def __init__(self):
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def drenar(self):
+        dados = b''.join(self._partes)
+        self._partes.clear()
+        return dados
+
+def gerar_zip(pdfs):
+    """Envia um ZIP com os PDFs, um arquivo por vez"""
+    saida = SaidaStreaming()
+    # Os PDFs do reportlab já são comprimidos; não há ganho em recomprimir
+    with zipfile.ZipFile(saida, 'w', compression=zipfile.ZIP_STORED) as arquivo_zip:
+        for nome, conteudo in pdfs:
+            arquivo_zip.writestr(nome, conteudo)
+            yield saida.drenar()
+    yield saida.drenar()
+
+def gerar_pdf_unico(pdfs, tamanho_bloco=64 * 1024):
+    """
+    Junta os PDFs em um único documento. O resultado é montado em um
+    arquivo temporário (em disco acima de 10 MB) e enviado em blocos.
+    """
+    from PyPDF2 import PdfReader, PdfWriter
+    
+    writer = PdfWriter()
+    for _, conteudo in pdfs:
+        writer.append(PdfReader(io.BytesIO(conteudo)))
+    
+    with tempfile.SpooledTemporaryFile(max_size=10 * 1024 * 1024) as temporario:
+        writer.write(temporario)
+        writer.close()
+        temporario.seek(0)
+        while True:
+            bloco = temporario.read(tamanho_bloco)
+            if not bloco:
+                break
+            yield bloco
+
+def get_tarefas():
+    """Retorna o gerenciador de tarefas da aplicação atual, criando-o na primeira chamada"""
+    tarefas = current_app.extensions.get('tarefas')
+    if tarefas is None:
+        tarefas = GerenciadorTarefas(
+            max_processos=current_app.config.get('TAREFAS_MAX_PROCESSOS', 2),
+            max_fila=current_app.config.get('TAREFAS_MAX_FILA', 16),
+            tempo_limite=current_app.config.get('TAREFAS_TEMPO_LIMITE', 120)
+        )
+        current_app.extensions['tarefas'] = tarefas
+    return tarefas
+
+def modo_assincrono():
+    """Indica se o cliente pediu execução em segundo plano (?assincrono=1)"""
+    return request.args.get('assincrono', '').lower() in ('1', 'true', 'sim')
+
+def resposta_tarefa_enviada(tarefa_id):
+    """Resposta 202 com o ID e a URL de consulta da tarefa enfileirada"""
+    url = f'/api/tarefas/{tarefa_id}'
+    resposta = jsonify({'tarefa_id': tarefa_id, 'status': 'pendente', 'url': url})
+    resposta.status_code = 202
+    resposta.headers['Location'] = url
+    return resposta
+
+def resposta_fila_cheia(erro):
+    """Resposta 503 quando a fila de tarefas está saturada"""
+    resposta = jsonify({'error': str(erro)})
+    resposta.status_code = 503
+    resposta.headers['Retry-After'] = '5'
+    return resposta
+
+@api_bp.route('/tarefas/<tarefa_id>', methods=['GET'])
+def get_tarefa(tarefa_id):
+    """Consulta o status de uma tarefa em segundo plano"""
+    tarefa = get_tarefas().consultar(tarefa_id)
+    if tarefa is None:
+        return jsonify({'error': 'Tarefa não encontrada'}), 404
+    
+    resposta = {
+        'tarefa_id': tarefa['id'],
+        'status': tarefa['status'],
+        'criada_em': tarefa['criada_em'],
+        'concluida_em': tarefa['concluida_em']
+    }
+    if tarefa['status'] == 'concluida':
+        if tarefa['formato'] == 'arquivo':
+            resposta['resultado_url'] = f'/api/tarefas/{tarefa_id}/resultado'
+        else:
+            resposta['resultado'] = tarefa['resultado']
+    elif tarefa['erro'] is not None:
+        resposta['error'] = str(tarefa['erro'])
+    
+    return jsonify(resposta)
+
+@api_bp.route('/tarefas/<tarefa_id>/resultado', methods=['GET'])
+def get_resultado_tarefa(tarefa_id):
+    """Retorna o resultado de uma tarefa concluída (JSON ou arquivo)"""
+    tarefa = get_tarefas().consultar(tarefa_id)
+    if tarefa is None:
+        return jsonify({'error': 'Tarefa não encontrada'}), 404
+    
+    if tarefa['status'] in ('pendente', 'executando'):
+        return jsonify({'tarefa_id': tarefa_id, 'status': tarefa['status']}), 202
+    if tarefa['status'] == 'expirada':
+        return jsonify({'error': str(tarefa['erro'])}), 504
+    if tarefa['status'] == 'erro':
+        return jsonify({'error': str(tarefa['erro'])}), 500
+    
+    if tarefa['formato'] == 'arquivo':
+        arquivo = tarefa['resultado']
+        return send_file(
+            arquivo['caminho'],
+            mimetype=arquivo['mimetype'],
+            as_attachment=True,
+            download_name=arquivo['download_name']
+        )
+    return jsonify(tarefa['resultado'])
+
+def get_cache_pdf():
+    """Retorna o cache de PDFs da aplicação atual, criando-o na primeira chamada"""
+    cache = current_app.extensions.get('cache_pdf')
+    if cache is None:
+        cache = CachePDF(
+            current_app.config.get('PDF_CACHE_FOLDER', 'cache_pdf'),
+            current_app.config.get('PDF_CACHE_MAX_BYTES', 100 * 1024 * 1024)
+        )
+        current_app.extensions['cache_pdf'] = cache
+    return cache
+
+def listar_tabela(tabela, colunas, condicoes, parametros):
+    """
+    Lista os registros de uma tabela com paginação por cursor (keyset no id),
+    projeção de campos e filtros, sem montar a lista inteira em memória.
     
-    # Gerar PDF
-    pdf_buffer = gerar_pdf_orcamento(orcamento_data)
+    Parâmetros da requisição:
+    - limit: tamanho da página (até MAX_LIMITE_PAGINA); sem ele, lista tudo
+    - after: retorna apenas registros com id maior que este (cursor)
+    - campos: lista separada por vírgulas das colunas desejadas
+    - formato=ndjson: um registro JSON por linha
     
-    # Retornar o PDF
-    return send_file(
-        pdf_buffer,
-        mimetype='application/pdf',
-        as_attachment=True,
-        download_name=f'orcamento_{orcamento_id}.pdf'
-    )
+    Com limit, a resposta é {'itens': [...], 'proximo': cursor ou null}; sem
+    limit, é uma lista JSON (ou NDJSON) gerada em streaming a partir do cursor.
+    """
+    campos = colunas
+    if request.args.get('campos'):
+        campos = tuple(campo.strip() for campo in request.args['campos'].split(','))
+        invalidos = [campo for campo in campos if campo not in colunas]
+        if invalidos:
+            return jsonify({'error': f'Campos inválidos: {", ".join(invalidos)}'}), 400
+    
+    try:
+        limite = int(request.args['limit']) if 'limit' in request.args else None
+        apos = int(request.args['after']) if 'after' in request.args else None
+    except ValueError:
+        return jsonify({'error': 'Parâmetros limit e after devem ser inteiros'}), 400
+    
+    if limite is not None and not 1 <= limite <= MAX_LIMITE_PAGINA:
+        return jsonify({'error': f'limit deve estar entre 1 e {MAX_LIMITE_PAGINA}'}), 400
+    
+    condicoes = list(condicoes)
+    parametros = list(parametros)
+    if apos is not None:
+        condicoes.append('id > ?')
+        parametros.append(apos)
+    
+    # O id é sempre selecionado para servir de cursor, mesmo fora da projeção
+    sql = f'SELECT id AS _cursor, {", ".join(campos)} FROM {tabela}'
+    if condicoes:
+        sql += ' WHERE ' + ' AND '.join(condicoes)
+    sql += ' ORDER BY id'
+    if limite is not None:
+        # Um registro a mais indica se existe uma próxima página
+        sql += ' LIMIT ?'
+        parametros.append(limite + 1)
+    
+    ndjson = request.args.get('formato') == 'ndjson'
+    
+    if limite is not None and not ndjson:
+        conn = get_db_connection()
+        rows = conn.execute(sql, parametros).fetchall()
+        itens = [{campo: row[campo] for campo in campos} for row in rows[:limite]]
+        proximo = rows[limite - 1]['_cursor'] if len(rows) > limite else None
+        return jsonify({'itens': itens, 'proximo': proximo})
+    
+    def gerar():
+        conn = get_db_connection()
+        cursor = conn.execute(sql, parametros)
+        if not ndjson:
+            yield '['
+        for indice, row in enumerate(cursor):
+            if limite is not None and indice >= limite:
+                break
+            registro = json.dumps({campo: row[campo] for campo in campos}, ensure_ascii=False)
+            if ndjson:
+                yield registro + '\n'
+            else:
+                yield registro if indice == 0 else ',' + registro
+        if not ndjson:
+            yield ']'
+    
+    mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+    return Response(stream_with_context(gerar()), mimetype=mimetype)
+
+def buscar_materiais_por_ids(cursor, ids):
+    """
+    Busca vários materiais com consultas IN (uma a cada MAX_PARAMETROS_SQL IDs).
+    Retorna um dicionário {id: material}.
+    """
+    ids = list(dict.fromkeys(ids))
+    materiais = {}
+    for inicio in range(0, len(ids), MAX_PARAMETROS_SQL):
+        lote = ids[inicio:inicio + MAX_PARAMETROS_SQL]
+        cursor.execute(
+            f'SELECT * FROM materiais WHERE id IN ({", ".join("?" * len(lote))})',
+            lote
+        )
+        materiais.update((row['id'], dict(row)) for row in cursor.fetchall())
+    return materiais
+
+def carregar_orcamento_completo(cursor, orcamento_id):
+    """
+    Carrega um orçamento com seu projeto e itens (com nome e unidade do
+    material) em uma única consulta com JOIN.
+    
+    Retorna a tupla (orcamento, projeto, itens); orcamento é None se não
+    existir e projeto é None se o projeto do orçamento não existir.
+    Itens cujo material não existe mais são ignorados.
+    """
+    orcamentos = carregar_orcamentos_completos(cursor, 'o.id = ?', (orcamento_id,))
+    return orcamentos[0] if orcamentos else (None, None, [])
+
+def carregar_orcamentos_completos(cursor, condicao, parametros):
+    """
+    Carrega vários orçamentos (filtrados por uma condição SQL sobre o
+    alias o de orcamentos) com projetos e itens em uma única consulta.
+    Retorna uma lista de tuplas (orcamento, projeto, itens) ordenada por id.
+    """
+    cursor.execute(f'''
+    SELECT o.*,
+           {", ".join(f"p.{coluna} AS p_{coluna}" for coluna in COLUNAS_PROJETO)},
+           {", ".join(f"i.{coluna} AS i_{coluna}" for coluna in COLUNAS_ITEM)},
+           m.nome AS m_nome,
+           m.unidade AS m_unidade
+    FROM orcamentos o
+    LEFT JOIN projetos p ON p.id = o.projeto_id
+    LEFT JOIN itens_orcamento i ON i.orcamento_id = o.id
+    LEFT JOIN materiais m ON m.id = i.material_id
+    WHERE {condicao}
+    ORDER BY o.id, i.id
+    ''', parametros)
+    
+    orcamentos = []
+    for row in cursor:
+        if not orcamentos or orcamentos[-1][0]['id'] != row['id']:
+            orcamento = {coluna: row[coluna] for coluna in row.keys()
+                         if not coluna.startswith(('p_', 'i_', 'm_'))}
+            
+            projeto = None
+            if row['p_id'] is not None:
+                projeto = {coluna: row[f'p_{coluna}'] for coluna in COLUNAS_PROJETO}
+                # O PDF usa o fator de risco salvo no projeto
+                projeto['fator_multiplicador'] = projeto['fator_risco']
+            
+            orcamentos.append((orcamento, projeto, []))
+        
+        if row['i_id'] is None or row['m_nome'] is None:
+            continue
+        item = {coluna: row[f'i_{coluna}'] for coluna in COLUNAS_ITEM}
+        item['nome'] = row['m_nome']
+        item['unidade'] = row['m_unidade']
+        orcamentos[-1][2].append(item)
+    
+    return orcamentos
 
 @api_bp.route('/analisar-documento', methods=['POST'])
 def analisar_documento():
@@ -444,47 +1031,167 @@ def analisar_documento():
     if not allowed_file(arquivo.filename):
         return jsonify({'error': 'Tipo de arquivo não permitido'}), 400
     
-    # Salvar o arquivo temporariamente
-    filename = secure_filename(arquivo.filename)
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
+    # Ler o arquivo para a memória ou, se for grande, para um arquivo
+    # temporário, calculando o hash do conteúdo durante a leitura
+    file_extension = arquivo.filename.rsplit('.', 1)[1].lower()
+    documento, hash_conteudo = ler_upload(
+        arquivo, file_extension,
+        current_app.config.get('UPLOAD_LIMITE_MEMORIA', 2 * 1024 * 1024)
+    )
     
-    # Criar diretório de uploads se não existir
-    if not os.path.exists(UPLOAD_FOLDER):
-        os.makedirs(UPLOAD_FOLDER)
+    # Documento já analisado: retornar a análise salva
+    resultados = analise_em_cache(hash_conteudo, file_extension)
+    if resultados is not None:
+        if isinstance(documento, str) and os.path.exists(documento):
+            os.remove(documento)
+        return jsonify(resultados)
     
-    arquivo.save(filepath)
+    tarefas = get_tarefas()
     
     try:
-        # Processar o arquivo de acordo com seu tipo
-        file_extension = filename.rsplit('.', 1)[1].lower()
+        # Processar o arquivo no pool de tarefas (a tarefa remove o arquivo temporário)
+        if modo_assincrono():
+            tarefa_id = tarefas.enviar(
+                analisar_arquivo, documento, file_extension,
+                pos_processamento=lambda analise: concluir_analise(analise, hash_conteudo, file_extension)
+            )
+            return resposta_tarefa_enviada(tarefa_id)
         
-        if file_extension == 'pdf':
-            resultados = processar_pdf(filepath)
-        else:  # Imagem
-            resultados = processar_imagem(filepath)
+        if file_extension == 'pdf' and tarefas.max_processos > 0:
+            # PDF: a estrutura do documento é lida aqui e as páginas são
+            # extraídas em paralelo nos processos do pool (ver extrair_texto_pdf)
+            analise = analisar_arquivo(documento, file_extension, mapear=tarefas.mapear)
+        else:
+            analise = tarefas.executar(analisar_arquivo, documento, file_extension)
         
-        # Adicionar estimativa de materiais
-        resultados = estimar_materiais_do_documento(resultados)
-        
-        # Remover o arquivo temporário
-        os.remove(filepath)
+        # Adicionar estimativa de materiais e salvar no cache
+        resultados = concluir_analise(analise, hash_conteudo, file_extension)
         
         return jsonify(resultados)
     
+    except FilaCheia as e:
+        if isinstance(documento, str) and os.path.exists(documento):
+            os.remove(documento)
+        return resposta_fila_cheia(e)
+    
+    except TarefaExpirada as e:
+        if isinstance(documento, str) and os.path.exists(documento):
+            os.remove(documento)
+        return jsonify({'error': str(e)}), 504
+    
+    except ImagemMuitoGrande as e:
+        return jsonify({'error': str(e)}), 413
+    
     except Exception as e:
-        # Remover o arquivo temporário em caso de erro
-        if os.path.exists(filepath):
-            os.remove(filepath)
-        
         return jsonify({'error': str(e)}), 500
 
+def get_cache_analises():
+    """Retorna o cache de análises de documentos da aplicação atual, criando-o na primeira chamada"""
+    cache = current_app.extensions.get('cache_analises')
+    if cache is None:
+        cache = CacheAnalises(
+            current_app.config.get('ANALISES_CACHE_MAX_BYTES', 50 * 1024 * 1024),
+            current_app.config.get('ANALISES_CACHE_MAX_IDADE', 30 * 24 * 3600)
+        )
+        current_app.extensions['cache_analises'] = cache
+    return cache
+
+def analise_em_cache(hash_conteudo, file_extension):
+    """
+    Retorna o resultado salvo para o documento, ou None. Se os preços dos
+    materiais mudaram desde a análise, apenas a estimativa é recalculada.
+    """
+    conn = get_db_connection()
+    cache = get_cache_analises()
+    salvo = cache.obter(conn, hash_conteudo, file_extension)
+    registrar_cache('analises', salvo is not None)
+    if salvo is None:
+        return None
+    
+    analise, estimativa, versao_materiais = salvo
+    catalogo = obter_catalogo(conn)
+    if versao_materiais != catalogo.versao:
+        estimativa = estimativa_documento(analise, catalogo)
+        cache.atualizar_estimativa(conn, hash_conteudo, file_extension, estimativa, catalogo.versao)
+    
+    analise.update(estimativa)
+    return analise
+
+def concluir_analise(analise, hash_conteudo, file_extension):
+    """
+    Adiciona a estimativa de materiais à análise do documento e salva ambas
+    no cache. Análises interrompidas pelo tempo limite não são salvas.
+    """
+    conn = get_db_connection()
+    catalogo = obter_catalogo(conn)
+    estimativa = estimativa_documento(analise, catalogo)
+    if analise.get('extracao', {}).get('interrompida') != 'tempo_limite':
+        get_cache_analises().salvar(conn, hash_conteudo, file_extension, analise, estimativa, catalogo.versao)
+    
+    return dict(analise, **estimativa)
+
+def estimativa_documento(analise, catalogo):
+    """Parte do resultado da análise que depende dos preços (ver CAMPOS_ESTIMATIVA)"""
+    resultados = estimar_materiais_do_documento(dict(analise), catalogo)
+    return {campo: resultados[campo] for campo in CAMPOS_ESTIMATIVA}
+
+def ler_upload(arquivo, extensao, limite_memoria):
+    """
+    Lê o arquivo enviado e retorna a tupla (documento, hash SHA-256 do
+    conteúdo). Até limite_memoria bytes o documento fica em memória (bytes);
+    acima disso é gravado em um arquivo temporário de nome único em
+    UPLOAD_FOLDER, e o documento é o caminho desse arquivo.
+    """
+    hash_conteudo = hashlib.sha256()
+    inicio = arquivo.stream.read(limite_memoria + 1)
+    hash_conteudo.update(inicio)
+    if len(inicio) <= limite_memoria:
+        return inicio, hash_conteudo.hexdigest()
+    
+    fd, caminho = tempfile.mkstemp(dir=UPLOAD_FOLDER, suffix=f'.{extensao}')
+    try:
+        with os.fdopen(fd, 'wb') as destino:
+            destino.write(inicio)
+            while True:
+                bloco = arquivo.stream.read(TAMANHO_BLOCO_UPLOAD)
+                if not bloco:
+                    break
+                hash_conteudo.update(bloco)
+                destino.write(bloco)
+    except BaseException:
+        os.remove(caminho)
+        raise
+    return caminho, hash_conteudo.hexdigest()
+
+def analisar_arquivo(documento, file_extension, mapear=None):
+    """
+    Processa o documento (bytes ou caminho de arquivo temporário, ver
+    ler_upload) de acordo com seu tipo e remove o arquivo temporário ao final.
+    Executada no pool de tarefas ou, para PDFs, no processo web com as
+    páginas distribuídas no pool por mapear (ver processar_pdf).
+    """
+    try:
+        arquivo = io.BytesIO(documento) if isinstance(documento, bytes) else documento
+        if file_extension == 'pdf':
+            return processar_pdf(arquivo, mapear)
+        else:  # Imagem
+            return processar_imagem(arquivo)
+    finally:
+        # Remover o arquivo temporário
+        if isinstance(documento, str) and os.path.exists(documento):
+            os.remove(documento)
+
 def allowed_file(filename):
     """Verifica se o arquivo tem uma extensão permitida"""
     ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'tif', 'tiff', 'bmp'}
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def processar_pdf(filepath):
-    """Processa um arquivo PDF para extrair informações relevantes"""
+def processar_pdf(arquivo, mapear=None):
+    """
+    Processa um arquivo PDF (caminho ou arquivo binário aberto) para extrair
+    informações relevantes. Com mapear (GerenciadorTarefas.mapear), as
+    páginas são extraídas em paralelo no pool de tarefas.
+    """
     resultados = {
         'dimensoes': {},
         'elementos': [],
@@ -494,37 +1201,44 @@ def processar_pdf(filepath):
     }
     
     try:
-        # Abrir o PDF
-        with open(filepath, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            
-            # Extrair texto de todas as páginas
-            texto_completo = ""
-            for page in reader.pages:
-                texto_completo += page.extract_text()
-            
-            # Extrair dimensões usando expressões regulares
-            dimensoes = extrair_dimensoes(texto_completo)
-            resultados['dimensoes'] = dimensoes
-            
-            # Calcular área e perímetro se possível
-            if 'comprimento' in dimensoes and 'largura' in dimensoes:
-                resultados['area'] = dimensoes['comprimento'] * dimensoes['largura']
-                resultados['perimetro'] = 2 * (dimensoes['comprimento'] + dimensoes['largura'])
-            
-            # Identificar elementos estruturais
-            resultados['elementos'] = identificar_elementos(texto_completo)
-            
-            # Identificar materiais mencionados
-            resultados['materiais'] = identificar_materiais(texto_completo)
-            
-            return resultados
-    
+        # Extrair o texto das páginas, parando quando as dimensões forem encontradas
+        encontradas = set()
+        def dimensoes_completas(texto_pagina):
+            encontradas.update(buscar_dimensoes(texto_pagina))
+            return DIMENSOES_NECESSARIAS <= encontradas
+        
+        texto_completo, resultados['extracao'] = extrair_texto_pdf(
+            arquivo, parar_quando=dimensoes_completas, mapear=mapear
+        )
+        
+        # Identificar dimensões, elementos e materiais em uma única varredura
+        varredura = varrer_texto(texto_completo)
+        
+        # Dimensões (com valores padrão para as não encontradas)
+        dimensoes = completar_dimensoes(varredura['dimensoes'])
+        resultados['dimensoes'] = dimensoes
+        
+        # Calcular área e perímetro se possível
+        if 'comprimento' in dimensoes and 'largura' in dimensoes:
+            resultados['area'] = dimensoes['comprimento'] * dimensoes['largura']
+            resultados['perimetro'] = 2 * (dimensoes['comprimento'] + dimensoes['largura'])
+        
+        # Elementos estruturais e materiais mencionados
+        resultados['elementos'] = varredura['elementos']
+        resultados['materiais'] = varredura['materiais']
+        
+        return resultados
+
+    except FilaCheia:
+        raise
     except Exception as e:
         raise Exception(f"Erro ao processar PDF: {str(e)}")
 
-def processar_imagem(filepath):
-    """Processa uma imagem para extrair informações relevantes"""
+def processar_imagem(arquivo):
+    """
+    Processa uma imagem (caminho ou arquivo binário aberto) para extrair
+    informações relevantes
+    """
     resultados = {
         'dimensoes': {},
         'elementos': [],
@@ -534,31 +1248,47 @@ def processar_imagem(filepath):
     }
     
     try:
-        # Abrir a imagem
-        imagem = Image.open(filepath)
-        
-        # Extrair dimensões da imagem (estimativa baseada no tamanho)
-        largura_px, altura_px = imagem.size
+        # Analisar a imagem quadro a quadro (reduzida, com memória limitada)
+        cabecalho, quadros = analisar_imagem(arquivo)
         
-        # Estimativa simples: assumindo que 100px = 1m (apenas para demonstração)
-        escala = 100  # pixels por metro
+        # Quadro principal: o de maior desenho encontrado (moldura ou contorno dos traços)
+        principal = max(
+            quadros,
+            key=lambda quadro: (quadro['fonte'] != 'imagem', quadro['moldura_px']['largura'] * quadro['moldura_px']['altura'])
+        )
+        moldura = principal['moldura_px']
         
-        # Estimar dimensões reais
-        largura_m = largura_px / escala
-        altura_m = altura_px / escala
-        
-        resultados['dimensoes'] = {
-            'comprimento': largura_m,
-            'largura': altura_m,
-            'altura': 2.8  # Altura padrão estimada
-        }
+        resultados['dimensoes_px'] = {'largura': moldura['largura'], 'altura': moldura['altura']}
         
-        # Calcular área e perímetro
-        resultados['area'] = largura_m * altura_m
-        resultados['perimetro'] = 2 * (largura_m + altura_m)
+        # Converter a moldura para metros pela resolução do arquivo: cada
+        # polegada (0,0254 m) do papel vale ESCALA_DESENHO_IMAGEM na obra.
+        # Sem resolução no cabeçalho não há escala, e a imagem fica apenas
+        # com as dimensões em pixels (sem área e sem estimativa de elementos)
+        dpi = cabecalho.get('dpi')
+        if dpi:
+            metros_por_px = [0.0254 / valor * ESCALA_DESENHO_IMAGEM for valor in dpi]
+            largura_m = round(moldura['largura'] * metros_por_px[0], 3)
+            altura_m = round(moldura['altura'] * metros_por_px[1], 3)
+            
+            resultados['escala'] = {
+                'dpi': dpi,
+                'escala_desenho': f'1:{ESCALA_DESENHO_IMAGEM:g}',
+                'metros_por_px': metros_por_px
+            }
+            resultados['dimensoes'] = {
+                'comprimento': largura_m,
+                'largura': altura_m,
+                'altura': 2.8  # Altura padrão estimada
+            }
+            
+            # Calcular área e perímetro
+            resultados['area'] = largura_m * altura_m
+            resultados['perimetro'] = 2 * (largura_m + altura_m)
+        else:
+            resultados['escala'] = None
         
-        # Para uma análise mais precisa, seria necessário usar algoritmos de visão computacional
-        # Aqui estamos usando estimativas simplificadas
+        # Cabeçalho da imagem, moldura e membros dominantes de cada quadro
+        resultados['imagem'] = dict(cabecalho, quadro_principal=principal['quadro'], quadros=quadros)
         
         # Estimar elementos estruturais com base no tamanho
         area = resultados['area']
@@ -597,55 +1327,17 @@ def processar_imagem(filepath):
         
         return resultados
     
+    except ImagemMuitoGrande:
+        raise
     except Exception as e:
         raise Exception(f"Erro ao processar imagem: {str(e)}")
 
 def extrair_dimensoes(texto):
     """Extrai dimensões de um texto usando expressões regulares"""
-    dimensoes = {}
-    
-    # Padrões para buscar dimensões
-    padroes = {
-        'comprimento': r'comprimento[:\s]*(\d+[.,]?\d*)[\s]*m',
-        'largura': r'largura[:\s]*(\d+[.,]?\d*)[\s]*m',
-        'altura': r'altura[:\s]*(\d+[.,]?\d*)[\s]*m',
-        'profundidade': r'profundidade[:\s]*(\d+[.,]?\d*)[\s]*m'
-    }
-    
-    # Padrões alternativos
-    padroes_alt = {
-        'comprimento': [r'(\d+[.,]?\d*)[\s]*m[\s]*[x×]', r'c\s*=\s*(\d+[.,]?\d*)[\s]*m'],
-        'largura': [r'[x×][\s]*(\d+[.,]?\d*)[\s]*m', r'l\s*=\s*(\d+[.,]?\d*)[\s]*m'],
-        'altura': [r'h\s*=\s*(\d+[.,]?\d*)[\s]*m', r'alt[:\s]*(\d+[.,]?\d*)[\s]*m']
-    }
-    
-    # Buscar dimensões usando os padrões principais
-    for dim, padrao in padroes.items():
-        match = re.search(padrao, texto, re.IGNORECASE)
-        if match:
-            valor = match.group(1).replace(',', '.')
-            dimensoes[dim] = float(valor)
-    
-    # Se não encontrou com os padrões principais, tentar padrões alternativos
-    for dim, padroes_lista in padroes_alt.items():
-        if dim not in dimensoes:
-            for padrao in padroes_lista:
-                match = re.search(padrao, texto, re.IGNORECASE)
-                if match:
-                    valor = match.group(1).replace(',', '.')
-                    dimensoes[dim] = float(valor)
-                    break
-    
-    # Se ainda não encontrou comprimento e largura, buscar por padrão "LxC"
-    if 'comprimento' not in dimensoes or 'largura' not in dimensoes:
-        match = re.search(r'(\d+[.,]?\d*)[\s]*[x×][\s]*(\d+[.,]?\d*)', texto)
-        if match:
-            largura = float(match.group(1).replace(',', '.'))
-            comprimento = float(match.group(2).replace(',', '.'))
-            dimensoes['largura'] = largura
-            dimensoes['comprimento'] = comprimento
-    
-    # Valores padrão se não encontrar
+    return completar_dimensoes(buscar_dimensoes(texto))
+
+def completar_dimensoes(dimensoes):
+    """Preenche com valores padrão as dimensões não encontradas"""
     if 'comprimento' not in dimensoes:
         dimensoes['comprimento'] = 5.0  # valor padrão
     if 'largura' not in dimensoes:
@@ -657,195 +1349,20 @@ def extrair_dimensoes(texto):
 
 def identificar_elementos(texto):
     """Identifica elementos estruturais mencionados no texto"""
-    elementos = []
-    
-    # Dicionário de elementos a procurar e seus padrões
-    elementos_dict = {
-        'viga': r'viga[s]?',
-        'coluna': r'coluna[s]?',
-        'pilar': r'pilar(es)?',
-        'treliça': r'treliça[s]?',
-        'perfil': r'perfil(is)?',
-        'metalon': r'metalon',
-        'chapa': r'chapa[s]?',
-        'telha': r'telha[s]?',
-        'grade': r'grade[s]?',
-        'tela': r'tela[s]?',
-        'vidro': r'vidro[s]?'
-    }
-    
-    # Buscar elementos no texto
-    for elemento, padrao in elementos_dict.items():
-        matches = re.finditer(padrao, texto, re.IGNORECASE)
-        for match in matches:
-            # Buscar quantidade próxima
-            contexto = texto[max(0, match.start() - 50):min(len(texto), match.end() + 50)]
-            qtd_match = re.search(r'(\d+)[\s]*' + padrao, contexto, re.IGNORECASE)
-            
-            quantidade = 1
-            if qtd_match:
-                quantidade = int(qtd_match.group(1))
-            
-            # Buscar dimensões próximas
-            dim_match = re.search(r'(\d+)[x×](\d+)', contexto)
-            dimensoes = ""
-            if dim_match:
-                dimensoes = f"{dim_match.group(1)}x{dim_match.group(2)}"
-            
-            # Verificar se este elemento já foi adicionado
-            elemento_existente = next((e for e in elementos if e['tipo'] == elemento), None)
-            
-            if elemento_existente:
-                elemento_existente['quantidade'] += quantidade
-            else:
-                elementos.append({
-                    'tipo': elemento,
-                    'quantidade': quantidade,
-                    'dimensoes': dimensoes
-                })
-    
-    # Se não encontrou elementos, estimar com base na área
-    if not elementos and 'area' in locals():
-        area = locals()['area']
-        if area > 0:
-            # Estimar número de pilares (1 a cada 3m²)
-            num_pilares = max(4, int(area / 3))
-            elementos.append({
-                'tipo': 'pilar',
-                'quantidade': num_pilares,
-                'dimensoes': '40x40'
-            })
-            
-            # Estimar comprimento de metalon para estrutura
-            comprimento_metalon = area * 2  # 2m por m²
-            elementos.append({
-                'tipo': 'metalon',
-                'quantidade': int(comprimento_metalon),
-                'dimensoes': '40x40'
-            })
-            
-            # Estimar comprimento de metalon para detalhes
-            comprimento_metalon_detalhes = area * 3  # 3m por m²
-            elementos.append({
-                'tipo': 'metalon',
-                'quantidade': int(comprimento_metalon_detalhes),
-                'dimensoes': '20x20'
-            })
-    
-    return elementos
+    return varrer_texto(texto)['elementos']
 
 def identificar_materiais(texto):
     """Identifica materiais mencionados no texto"""
-    materiais = []
-    
-    # Lista de materiais comuns em serralheria
-    materiais_dict = {
-        'Tubo Metalon 20x20': r'metalon[\s]*20[\s]*x[\s]*20',
-        'Tubo Metalon 30x30': r'metalon[\s]*30[\s]*x[\s]*30',
-        'Tubo Metalon 40x40': r'metalon[\s]*40[\s]*x[\s]*40',
-        'Tubo Metalon 50x30': r'metalon[\s]*50[\s]*x[\s]*30',
-        'Chapa Galvanizada #18': r'chapa[\s]*galvanizada[\s]*#?18',
-        'Chapa Galvanizada #20': r'chapa[\s]*galvanizada[\s]*#?20',
-        'Telha Trapezoidal': r'telha[\s]*trapezoidal',
-        'Parafuso Autobrocante': r'parafuso[\s]*autobrocante',
-        'Eletrodo 6013': r'eletrodo[\s]*6013',
-        'Disco de Corte': r'disco[\s]*de[\s]*corte',
-        'Tinta Anticorrosiva': r'tinta[\s]*anticorrosiva'
-    }
-    
-    # Buscar materiais no texto
-    for material, padrao in materiais_dict.items():
-        if re.search(padrao, texto, re.IGNORECASE):
-            materiais.append(material)
-    
-    return materiais
+    return varrer_texto(texto)['materiais']
 
-def estimar_materiais_do_documento(resultados):
+def estimar_materiais_do_documento(resultados, catalogo=None):
     """Estima materiais necessários com base nos resultados da análise do documento"""
-    # Obter materiais do banco de dados
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM materiais')
-    materiais_db = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    
-    # Inicializar lista de materiais estimados
-    materiais_estimados = []
-    valor_materiais = 0
-    
-    # Calcular área
-    area = resultados['area']
-    
-    if area > 0:
-        # Metalon 40x40 para estrutura principal
-        qtd_metalon_40 = area * 0.8  # 0.8 metros por m²
-        valor_metalon_40 = next((m['preco_unitario'] for m in materiais_db if m['nome'] == 'Tubo Metalon 40x40'), 32.90)
-        valor_total_metalon_40 = qtd_metalon_40 * valor_metalon_40
-        materiais_estimados.append({
-            'material_id': next((m['id'] for m in materiais_db if m['nome'] == 'Tubo Metalon 40x40'), 3),
-            'nome': 'Tubo Metalon 40x40',
-            'quantidade': qtd_metalon_40,
-            'unidade': 'metro',
-            'valor_unitario': valor_metalon_40,
-            'valor_total': valor_total_metalon_40
-        })
-        valor_materiais += valor_total_metalon_40
-        
-        # Metalon 20x20 para detalhes
-        qtd_metalon_20 = area * 1.2  # 1.2 metros por m²
-        valor_metalon_20 = next((m['preco_unitario'] for m in materiais_db if m['nome'] == 'Tubo Metalon 20x20'), 15.50)
-        valor_total_metalon_20 = qtd_metalon_20 * valor_metalon_20
-        materiais_estimados.append({
-            'material_id': next((m['id'] for m in materiais_db if m['nome'] == 'Tubo Metalon 20x20'), 1),
-            'nome': 'Tubo Metalon 20x20',
-            'quantidade': qtd_metalon_20,
-            'unidade': 'metro',
-            'valor_unitario': valor_metalon_20,
-            'valor_total': valor_total_metalon_20
-        })
-        valor_materiais += valor_total_metalon_20
-        
-        # Chapa galvanizada
-        qtd_chapa = area * 0.7  # 70% da área total
-        valor_chapa = next((m['preco_unitario'] for m in materiais_db if m['nome'] == 'Chapa Galvanizada #20'), 95.00)
-        valor_total_chapa = qtd_chapa * valor_chapa
-        materiais_estimados.append({
-            'material_id': next((m['id'] for m in materiais_db if m['nome'] == 'Chapa Galvanizada #20'), 6),
-            'nome': 'Chapa Galvanizada #20',
-            'quantidade': qtd_chapa,
-            'unidade': 'm²',
-            'valor_unitario': valor_chapa,
-            'valor_total': valor_total_chapa
-        })
-        valor_materiais += valor_total_chapa
-        
-        # Parafusos
-        qtd_parafusos = area * 15  # 15 parafusos por m²
-        valor_parafuso = next((m['preco_unitario'] for m in materiais_db if m['nome'] == 'Parafuso Autobrocante'), 0.35)
-        valor_total_parafusos = qtd_parafusos * valor_parafuso
-        materiais_estimados.append({
-            'material_id': next((m['id'] for m in materiais_db if m['nome'] == 'Parafuso Autobrocante'), 8),
-            'nome': 'Parafuso Autobrocante',
-            'quantidade': qtd_parafusos,
-            'unidade': 'unidade',
-            'valor_unitario': valor_parafuso,
-            'valor_total': valor_total_parafusos
-        })
-        valor_materiais += valor_total_parafusos
-        
-        # Tinta
-        qtd_tinta = area * 0.1  # 0.1 litros por m²
-        valor_tinta = next((m['preco_unitario'] for m in materiais_db if m['nome'] == 'Tinta Anticorrosiva'), 85.00)
-        valor_total_tinta = qtd_tinta * valor_tinta
-        materiais_estimados.append({
-            'material_id': next((m['id'] for m in materiais_db if m['nome'] == 'Tinta Anticorrosiva'), 11),
-            'nome': 'Tinta Anticorrosiva',
-            'quantidade': qtd_tinta,
-            'unidade': 'litro',
-            'valor_unitario': valor_tinta,
-            'valor_total': valor_total_tinta
-        })
-        valor_materiais += valor_total_tinta
+    # Estimar materiais pelas regras de consumo
+    materiais_estimados, valor_materiais = estimar_materiais({
+        'area': resultados['area'],
+        'perimetro': resultados['perimetro'],
+        'altura': resultados['dimensoes'].get('altura', 0)
+    }, catalogo or obter_catalogo())
     
     # Adicionar estimativas ao resultado
     resultados['materiais_estimados'] = materiais_estimados
@@ -858,3 +1375,237 @@ def estimar_materiais_do_documento(resultados):
     resultados['valor_total'] = valor_materiais + resultados['valor_mao_obra']
     
     return resultados
+
+@api_bp.route('/otimizar-cortes', methods=['POST'])
+def otimizar_cortes():
+    """
+    Otimiza o corte de barras para minimizar o desperdício.
+    
+    Corpo JSON:
+    - pecas: lista de {tamanho, quantidade, descricao} (mm)
+    - tamanho_barra (padrão 6000) ou barras: lista de {tamanho, quantidade}
+      com os tamanhos disponíveis (quantidade omitida = ilimitada)
+    - tolerancia_corte: espessura do corte somada a cada peça (padrão 3)
+    - modo: 'rapido' (padrão) ou 'exato' (para poucas peças)
+    - tempo_limite: segundos do modo exato
+    - material_id: usa primeiro os retalhos do material em estoque
+      (usar_retalhos=false para ignorá-los); o estoque não é alterado
+    
+    A resposta segue o formato de static/js/otimizador_cortes.js.
+    """
+    data = request.json or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Corpo JSON deve ser um objeto'}), 400
+    
+    material_id = data.get('material_id')
+    if material_id is not None:
+        if not isinstance(material_id, int) or isinstance(material_id, bool):
+            return jsonify({'error': 'material_id deve ser um número inteiro'}), 400
+        if material_id not in obter_catalogo().por_id:
+            return jsonify({'error': f'Material com ID {material_id} não encontrado'}), 404
+    
+    try:
+        parametros = parametros_corte(data)
+        if material_id is not None and data.get('usar_retalhos', True):
+            conn = get_db_connection()
+            parametros['retalhos'] = buscar_retalhos_candidatos(conn, material_id, demanda_cortes(parametros))
+            conn.close()
+        resultado = get_otimizador_cortes().otimizar(**parametros)
+    except CorteInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(resultado)
+
+def parametros_corte(data):
+    """Converte o JSON de uma otimização de cortes nos argumentos de OtimizadorCortes.otimizar"""
+    barras = data.get('barras')
+    if barras is None and data.get('tamanho_barra') is not None:
+        barras = [{'tamanho': data['tamanho_barra']}]
+    if barras is not None and not isinstance(barras, list):
+        raise CorteInvalido('barras deve ser uma lista')
+    
+    try:
+        tempo_limite = min(float(data.get('tempo_limite', TEMPO_LIMITE_EXATO)), MAX_TEMPO_LIMITE_EXATO)
+    except (TypeError, ValueError):
+        raise CorteInvalido('tempo_limite deve ser um número')
+    
+    return {
+        'pecas': data.get('pecas'),
+        'barras': barras,
+        'tolerancia': data.get('tolerancia_corte', TOLERANCIA_CORTE_PADRAO),
+        'modo': data.get('modo', 'rapido'),
+        'tempo_limite': tempo_limite
+    }
+
+def demanda_cortes(parametros):
+    """
+    Quantidade de peças por comprimento de corte (tamanho com a tolerância),
+    para a busca dos retalhos candidatos. Retorna {} se as peças forem
+    inválidas; a validação é feita pelo otimizador.
+    """
+    demanda = {}
+    try:
+        for peca in parametros['pecas']:
+            quantidade = peca.get('quantidade', 1)
+            if not isinstance(quantidade, int) or quantidade <= 0:
+                continue
+            comprimento = peca['tamanho'] + parametros['tolerancia']
+            demanda[comprimento] = demanda.get(comprimento, 0) + quantidade
+    except (TypeError, KeyError, AttributeError):
+        return {}
+    return demanda
+
+@api_bp.route('/retalhos', methods=['GET', 'POST'])
+def retalhos():
+    """
+    GET: retalhos disponíveis (?material_id=, ?comprimento_minimo=), do
+    menor para o maior. POST: entrada de retalhos no estoque
+    ({material_id, comprimento, quantidade}).
+    """
+    conn = get_db_connection()
+    
+    if request.method == 'POST':
+        data = request.json or {}
+        if not isinstance(data, dict):
+            conn.close()
+            return jsonify({'error': 'Corpo JSON deve ser um objeto'}), 400
+        material_id = data.get('material_id')
+        comprimento = data.get('comprimento')
+        quantidade = data.get('quantidade', 1)
+        if not isinstance(material_id, int) or isinstance(material_id, bool):
+            conn.close()
+            return jsonify({'error': 'material_id deve ser um número inteiro'}), 400
+        if material_id not in obter_catalogo(conn).por_id:
+            conn.close()
+            return jsonify({'error': f'Material com ID {material_id} não encontrado'}), 404
+        if (not isinstance(comprimento, (int, float)) or isinstance(comprimento, bool) or comprimento <= 0 or
+                not isinstance(quantidade, int) or isinstance(quantidade, bool) or not 0 < quantidade <= MAX_PARAMETROS_SQL):
+            conn.close()
+            return jsonify({'error': f'comprimento deve ser positivo e quantidade entre 1 e {MAX_PARAMETROS_SQL}'}), 400
+        
+        inserir_retalhos(conn, material_id, [comprimento] * quantidade)
+        conn.commit()
+        conn.close()
+        return jsonify({'material_id': material_id, 'comprimento': comprimento, 'quantidade': quantidade}), 201
+    
+    material_id = request.args.get('material_id', type=int)
+    if material_id is None:
+        conn.close()
+        return jsonify({'error': 'Informe material_id'}), 400
+    comprimento_minimo = request.args.get('comprimento_minimo', 0, type=float)
+    
+    disponiveis = buscar_retalhos(conn, material_id, comprimento_minimo)
+    conn.close()
+    return jsonify([
+        {'id': retalho_id, 'material_id': material_id, 'comprimento': comprimento}
+        for comprimento, retalho_id in disponiveis
+    ])
+
+@api_bp.route('/orcamentos/<int:orcamento_id>/aprovar', methods=['POST'])
+def aprovar_orcamento(orcamento_id):
+    """
+    Aprova o orçamento e aplica seus planos de corte ao estoque de retalhos.
+    
+    Corpo JSON: cortes, lista de otimizações (mesmos campos de
+    /otimizar-cortes, com material_id obrigatório). Cada plano é refeito
+    com os retalhos disponíveis no momento; os retalhos usados são
+    consumidos e as sobras a partir de RETALHO_COMPRIMENTO_MINIMO entram no
+    estoque, tudo na mesma transação da aprovação.
+    """
+    data = request.json or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Corpo JSON deve ser um objeto'}), 400
+    cortes = data.get('cortes', [])
+    if not isinstance(cortes, list) or not all(isinstance(corte, dict) for corte in cortes):
+        return jsonify({'error': 'cortes deve ser uma lista de otimizações'}), 400
+    for corte in cortes:
+        material_id = corte.get('material_id')
+        if not isinstance(material_id, int) or isinstance(material_id, bool):
+            return jsonify({'error': 'material_id de cada corte deve ser um número inteiro'}), 400
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT id FROM orcamentos WHERE id = ?', (orcamento_id,))
+    if cursor.fetchone() is None:
+        conn.close()
+        return jsonify({'error': 'Orçamento não encontrado'}), 404
+    
+    catalogo = obter_catalogo(conn)
+    for corte in cortes:
+        if corte.get('material_id') not in catalogo.por_id:
+            conn.close()
+            return jsonify({'error': f"Material com ID {corte.get('material_id')} não encontrado"}), 404
+    
+    data_aprovacao = datetime.now().strftime('%Y-%m-%d')
+    otimizador = get_otimizador_cortes()
+    resultados = []
+    try:
+        # Reservar a escrita antes de ler os retalhos, para que duas
+        # aprovações simultâneas não consumam o mesmo retalho
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute(
+            'INSERT INTO aprovacoes_orcamentos (orcamento_id, data_aprovacao) VALUES (?, ?)',
+            (orcamento_id, data_aprovacao)
+        )
+        for corte in cortes:
+            parametros = parametros_corte(corte)
+            parametros['retalhos'] = buscar_retalhos_candidatos(conn, corte['material_id'], demanda_cortes(parametros))
+            resultado = otimizador.otimizar(**parametros)
+            resultado['material_id'] = corte['material_id']
+            resultado['novosRetalhos'] = registrar_cortes(conn, corte['material_id'], resultado, orcamento_id)
+            resultados.append(resultado)
+        conn.commit()
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        conn.close()
+        return jsonify({'error': 'Orçamento já aprovado'}), 409
+    except CorteInvalido as e:
+        conn.rollback()
+        conn.close()
+        return jsonify({'error': str(e)}), 400
+    except RetalhoIndisponivel as e:
+        conn.rollback()
+        conn.close()
+        return jsonify({'error': str(e)}), 409
+    except Exception:
+        conn.rollback()
+        raise
+    
+    conn.close()
+    return jsonify({'orcamento_id': orcamento_id, 'data_aprovacao': data_aprovacao, 'cortes': resultados})
+
+@api_bp.route('/espacamento/varredura', methods=['POST'])
+def varredura_espacamento():
+    """
+    Varredura de espaçamento de tesouras e terças: avalia todas as
+    combinações de vão livre, inclinação, região de vento, tipo de telha e
+    perfil de terça (listas ou valores únicos) e retorna, para cada vão e
+    região, a opção viável mais barata e as alternativas de Pareto entre
+    custo e número de peças.
+    
+    Corpo JSON: vao_livre, comprimento_total (obrigatórios), inclinacao,
+    regiao_vento, tipo_telha, perfil_terca, material, carga_adicional,
+    preco_aco_kg, peso_tesoura_metro
+    
+    As fórmulas são as de static/js/calculo_espacamento.js.
+    """
+    data = request.json or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Corpo JSON deve ser um objeto'}), 400
+    
+    catalogo = obter_catalogo()
+    try:
+        resultado = varrer_espacamentos(data, catalogo)
+    except EspacamentoInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(resultado)
+
+def get_otimizador_cortes():
+    """Retorna o otimizador de cortes (com seu cache) da aplicação atual, criando-o na primeira chamada"""
+    otimizador = current_app.extensions.get('otimizador_cortes')
+    if otimizador is None:
+        otimizador = OtimizadorCortes()
+        current_app.extensions['otimizador_cortes'] = otimizador
+    return otimizador
@@ -1,31 +1,97 @@
-from flask import Blueprint, render_template, request, jsonify, send_file
+from flask import Blueprint, render_template, request, jsonify, send_file, current_app, Response
 from classificador_riscos import ClassificadorRiscos
+from treinamento_riscos import DIRETORIO_MODELOS, ler_manifesto, marca_publicacao
+from banco_dados import caminho_banco, CAMINHO_PADRAO
+import metricas
 import sqlite3
 import os
+import threading
+import time
 from datetime import datetime
 import io
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
 
 main_bp = Blueprint('main', __name__)
 
-# Instanciar o classificador de riscos
-classificador = ClassificadorRiscos()
+# O classificador de riscos é instanciado sob demanda (ou na inicialização
+# do app, ver create_app), para que importar este módulo não carregue o modelo
+classificador = None
+_classificador_lock = threading.Lock()
+
+# Verificação da versão publicada do modelo no caminho das requisições: no
+# máximo uma chamada a os.stat por intervalo; quando o manifesto muda, o
+# novo modelo é carregado por uma única thread enquanto as demais seguem
+# com o classificador atual
+INTERVALO_VERIFICACAO_MODELO = float(os.environ.get('CLASSIFICADOR_INTERVALO_VERIFICACAO', 2))
+_verificacao_modelo = {'proxima': 0.0, 'marca': None}
+_recarga_lock = threading.Lock()
+
+def _criar_classificador():
+    # Modo compilado: consultas por tabela de decisão, sem chamar o sklearn
+    return ClassificadorRiscos(
+        modo_compilado=os.environ.get('CLASSIFICADOR_COMPILADO', 'true').lower() == 'true'
+    )
+
+def get_classificador():
+    """
+    Retorna o classificador de riscos, carregando o modelo na primeira
+    chamada e trocando-o quando uma nova versão é publicada
+    """
+    global classificador
+    if classificador is None:
+        with _classificador_lock:
+            if classificador is None:
+                _verificacao_modelo['marca'] = marca_publicacao(DIRETORIO_MODELOS)
+                _verificacao_modelo['proxima'] = time.monotonic() + INTERVALO_VERIFICACAO_MODELO
+                classificador = _criar_classificador()
+    elif time.monotonic() >= _verificacao_modelo['proxima']:
+        verificar_modelo_publicado()
+    return classificador
+
+def verificar_modelo_publicado():
+    """
+    Recarrega o classificador se o manifesto do modelo publicado mudou
+    desde a última verificação. Retorna a versão em uso.
+    """
+    _verificacao_modelo['proxima'] = time.monotonic() + INTERVALO_VERIFICACAO_MODELO
+    marca = marca_publicacao(DIRETORIO_MODELOS)
+    if marca == _verificacao_modelo['marca'] or not _recarga_lock.acquire(blocking=False):
+        # Sem mudança, ou outra thread já está carregando o novo modelo
+        return classificador.versao_modelo
+    try:
+        manifesto = ler_manifesto(DIRETORIO_MODELOS)
+        versao = recarregar_classificador(manifesto['versao']) if manifesto else classificador.versao_modelo
+        _verificacao_modelo['marca'] = marca
+    except Exception:
+        # Versão publicada ilegível (ex.: removida durante a leitura):
+        # seguir com o modelo atual e tentar de novo no próximo intervalo
+        versao = classificador.versao_modelo
+    finally:
+        _recarga_lock.release()
+    return versao
+
+def recarregar_classificador(versao):
+    """
+    Troca o classificador pelo da versão publicada do modelo, se ela for
+    mais nova que `versao` em uso. O novo classificador é carregado (e
+    compilado) antes da troca; requisições em andamento terminam com o
+    anterior. O novo modelo é uma cópia própria do processo, não
+    compartilhada com os demais workers. Retorna a versão em uso após a
+    chamada.
+    """
+    global classificador
+    atual = classificador
+    if atual is not None and atual.versao_modelo >= versao:
+        return atual.versao_modelo
+    novo = _criar_classificador()
+    with _classificador_lock:
+        if classificador is None or classificador.versao_modelo < novo.versao_modelo:
+            classificador = novo
+        return classificador.versao_modelo
 
 # Funções auxiliares
-def get_db_connection():
-    """Retorna uma conexão com o banco de dados"""
-    DATABASE = 'serralheria.db'
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def init_db():
+def init_db(caminho=CAMINHO_PADRAO):
     """Inicializa o banco de dados com as tabelas necessárias"""
-    conn = sqlite3.connect('serralheria.db')
+    conn = sqlite3.connect(caminho)
     cursor = conn.cursor()
     
     # Tabela de materiais
@@ -109,16 +175,129 @@ def init_db():
     conn.commit()
     conn.close()
 
-# Inicializar o banco de dados se não existir
-if not os.path.exists('serralheria.db'):
-    init_db()
+def atualizar_esquema(caminho=CAMINHO_PADRAO):
+    """
+    Cria as tabelas e triggers auxiliares que faltarem em um banco existente.
+    Todos os comandos são idempotentes.
+    """
+    conn = sqlite3.connect(caminho)
+    cursor = conn.cursor()
+    
+    # Contador de alterações por tabela (usado pelo catálogo de materiais em memória)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS versao_tabelas (
+        tabela TEXT PRIMARY KEY,
+        versao INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO versao_tabelas (tabela, versao) VALUES ('materiais', 0)")
+    for evento in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS materiais_versao_{evento.lower()} AFTER {evento} ON materiais
+        BEGIN
+            UPDATE versao_tabelas SET versao = versao + 1 WHERE tabela = 'materiais';
+        END
+        ''')
+    
+    # Índices para carregar orçamentos com seus itens e por período
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_itens_orcamento_orcamento ON itens_orcamento (orcamento_id, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_orcamentos_data_criacao ON orcamentos (data_criacao, id)')
+    
+    # Índices para os filtros da listagem de projetos (paginação por id)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_projetos_cliente ON projetos (cliente, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_projetos_nivel_risco ON projetos (nivel_risco, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_projetos_data_criacao ON projetos (data_criacao, id)')
+    
+    # Cache das análises de documentos (ver cache_analises.py)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS analises_documentos (
+        hash TEXT NOT NULL,
+        tipo TEXT NOT NULL,
+        versao_analisador INTEGER NOT NULL,
+        analise TEXT NOT NULL,
+        estimativa TEXT NOT NULL,
+        versao_materiais INTEGER NOT NULL,
+        tamanho INTEGER NOT NULL,
+        criada_em REAL NOT NULL,
+        acessada_em REAL NOT NULL,
+        PRIMARY KEY (hash, tipo, versao_analisador)
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_analises_documentos_acesso ON analises_documentos (acessada_em)')
+    
+    # Estoque de retalhos (sobras de barras) por material; o índice parcial
+    # cobre apenas os retalhos ainda disponíveis (ver estoque_retalhos.py)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS retalhos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        material_id INTEGER NOT NULL,
+        comprimento REAL NOT NULL,
+        data_criacao TEXT NOT NULL,
+        orcamento_origem_id INTEGER,
+        orcamento_consumo_id INTEGER,
+        FOREIGN KEY (material_id) REFERENCES materiais (id),
+        FOREIGN KEY (orcamento_origem_id) REFERENCES orcamentos (id),
+        FOREIGN KEY (orcamento_consumo_id) REFERENCES orcamentos (id)
+    )
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_retalhos_disponiveis ON retalhos (material_id, comprimento)
+    WHERE orcamento_consumo_id IS NULL
+    ''')
+    
+    # Orçamentos aprovados (a aprovação aplica os planos de corte ao estoque de retalhos)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS aprovacoes_orcamentos (
+        orcamento_id INTEGER PRIMARY KEY,
+        data_aprovacao TEXT NOT NULL,
+        FOREIGN KEY (orcamento_id) REFERENCES orcamentos (id)
+    )
+    ''')
+    
+    # Amostras rotuladas para o treinamento do classificador de riscos
+    # (características já convertidas, ver treinamento_riscos.py)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS amostras_risco (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        altura REAL NOT NULL,
+        complexidade REAL NOT NULL,
+        ambiente REAL NOT NULL,
+        nivel INTEGER NOT NULL CHECK (nivel BETWEEN 0 AND 3),
+        projeto_id INTEGER,
+        criada_em REAL NOT NULL,
+        FOREIGN KEY (projeto_id) REFERENCES projetos (id)
+    )
+    ''')
+    
+    conn.commit()
+    conn.close()
+
+def inicializar_banco(database=None):
+    """Inicializa o banco de dados se ele ainda não existir"""
+    caminho = caminho_banco(database)
+    if not os.path.exists(caminho):
+        init_db(caminho)
+    atualizar_esquema(caminho)
 
 def classificar_risco(projeto):
     """
     Classifica o nível de risco do projeto com base em suas características.
     Utiliza o classificador de IA para análise mais precisa.
     """
-    return classificador.classificar(projeto)
+    metricas.incrementar('classificador_projetos_total', tipo='individual')
+    with metricas.cronometrar('classificador_duracao_segundos', tipo='individual'):
+        return get_classificador().classificar(projeto)
+
+def classificar_riscos_lote(projetos, ignorar_invalidos=False):
+    """
+    Classifica o nível de risco de vários projetos em uma única passada.
+    Utiliza uma só predição do modelo para todo o lote. Com
+    ignorar_invalidos, projetos inválidos recebem None (ver
+    ClassificadorRiscos.classificar_lote).
+    """
+    metricas.incrementar('classificador_projetos_total', len(projetos), tipo='lote')
+    with metricas.cronometrar('classificador_duracao_segundos', tipo='lote'):
+        return get_classificador().classificar_lote(projetos, ignorar_invalidos)
 
 def calcular_preco_com_risco(preco_base, nivel_risco):
     """
@@ -142,18 +321,57 @@ def calcular_impostos(valor_total):
         'valor': valor_imposto
     }
 
+# Estilos do PDF de orçamento, criados uma única vez por processo (ver estilos_pdf)
+_estilos_pdf = None
+
+def estilos_pdf():
+    """
+    Retorna os estilos de parágrafo e de tabela do PDF de orçamento.
+    São criados na primeira chamada e compartilhados por todos os documentos.
+    """
+    global _estilos_pdf
+    if _estilos_pdf is None:
+        # Importado aqui para não pesar na inicialização dos workers
+        from reportlab.lib import colors
+        from reportlab.platypus import TableStyle
+        from reportlab.lib.styles import getSampleStyleSheet
+        
+        styles = getSampleStyleSheet()
+        _estilos_pdf = {
+            'titulo': styles['Heading1'],
+            'subtitulo': styles['Heading2'],
+            'normal': styles['Normal'],
+            'tabela': TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 12),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black),
+                ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+                ('FONTNAME', (0, -4), (-1, -1), 'Helvetica-Bold'),
+            ])
+        }
+    return _estilos_pdf
+
 def gerar_pdf_orcamento(orcamento_data):
     """
     Gera um PDF com o orçamento detalhado.
     """
+    # Importado aqui para não pesar na inicialização dos workers
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Table, Paragraph
+    
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter)
     elements = []
     
-    styles = getSampleStyleSheet()
-    title_style = styles['Heading1']
-    subtitle_style = styles['Heading2']
-    normal_style = styles['Normal']
+    estilos = estilos_pdf()
+    title_style = estilos['titulo']
+    subtitle_style = estilos['subtitulo']
+    normal_style = estilos['normal']
     
     # Título
     elements.append(Paragraph(f"Orçamento - {orcamento_data['projeto']['nome']}", title_style))
@@ -182,18 +400,7 @@ def gerar_pdf_orcamento(orcamento_data):
     data.append(['', '', '', 'TOTAL:', f"R$ {orcamento_data['valor_total']:.2f}"])
     
     table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (0, -4), (-1, -1), 'Helvetica-Bold'),
-    ]))
+    table.setStyle(estilos['tabela'])
     
     elements.append(table)
     
@@ -209,6 +416,16 @@ def gerar_pdf_orcamento(orcamento_data):
     buffer.seek(0)
     return buffer
 
+def gerar_pdf_orcamento_bytes(orcamento_data):
+    """
+    Gera o PDF do orçamento e retorna seu conteúdo em bytes
+    (formato adequado para execução em outro processo).
+    """
+    with metricas.cronometrar('pdf_geracao_duracao_segundos'):
+        conteudo = gerar_pdf_orcamento(orcamento_data).getvalue()
+    metricas.incrementar('pdf_gerados_bytes_total', len(conteudo))
+    return conteudo
+
 # Rotas
 @main_bp.route('/')
 def index():
@@ -217,3 +434,18 @@ def index():
 @main_bp.route('/upload-documento')
 def upload_documento():
     return render_template('upload_documento.html')
+
+@main_bp.route('/saude')
+def saude():
+    """Verificação leve de prontidão (não renderiza templates)"""
+    return jsonify({
+        'status': 'ok',
+        'modelo_carregado': classificador is not None,
+        'versao_modelo': classificador.versao_modelo if classificador is not None else None,
+        'inicializacao': current_app.config.get('TEMPOS_INICIALIZACAO', {})
+    })
+
+@main_bp.route('/metrics')
+def metrics():
+    """Métricas de todos os processos da aplicação, no formato texto do Prometheus"""
+    return Response(metricas.registro.exportar(), mimetype='text/plain; version=0.0.4')
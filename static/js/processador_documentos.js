@@ -296,7 +296,11 @@ document.addEventListener('DOMContentLoaded', function() {
         const dimensoesList = document.createElement('ul');
         dimensoesList.className = 'list-group';
         
-        for (const [key, value] of Object.entries(resultados.dimensoes)) {
+        // Imagem sem resolução (DPI): apenas as dimensões do desenho em pixels
+        const semEscala = resultados.escala === null && resultados.dimensoes_px;
+        const dimensoes = semEscala ? resultados.dimensoes_px : resultados.dimensoes;
+        
+        for (const [key, value] of Object.entries(dimensoes)) {
             const item = document.createElement('li');
             item.className = 'list-group-item d-flex justify-content-between align-items-center';
             
@@ -305,7 +309,7 @@ document.addEventListener('DOMContentLoaded', function() {
             
             const valueSpan = document.createElement('span');
             valueSpan.className = 'badge bg-primary rounded-pill';
-            valueSpan.textContent = `${value} ${key === 'area' ? 'm²' : 'm'}`;
+            valueSpan.textContent = `${value} ${semEscala ? 'px' : key === 'area' ? 'm²' : 'm'}`;
             
             item.appendChild(label);
             item.appendChild(valueSpan);
@@ -0,0 +1,339 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as TempoEsgotado, wait
+from concurrent.futures.process import BrokenProcessPool
+from perfilamento import perfil_ativo
+
+class FilaCheia(Exception):
+    """A fila de tarefas atingiu o limite configurado"""
+
+class TarefaExpirada(Exception):
+    """A tarefa ultrapassou o tempo limite"""
+
+class GerenciadorTarefas:
+    """
+    Executa tarefas pesadas (geração de PDF, análise de documentos) em um pool
+    limitado de processos, fora das threads que atendem as requisições.
+
+    Cada tarefa recebe um ID para consulta do status e do resultado. A fila é
+    limitada (FilaCheia quando cheia) e cada tarefa tem um tempo limite,
+    contado a partir do envio; tarefas expiradas têm o resultado descartado.
+    Uma tarefa ocupa sua vaga na fila até o processo terminá-la, mesmo depois
+    de expirada; quando uma tarefa expira, o pool é substituído e os
+    processos do anterior são encerrados assim que as demais tarefas dele
+    terminarem (ver _aposentar_pool).
+    Com max_processos=0 as tarefas são executadas na própria thread, assim
+    como as pedidas por requisições sob perfil (ver perfilamento).
+
+    As tarefas ficam registradas no processo que as recebeu (um por worker
+    do gunicorn).
+    """
+
+    def __init__(self, max_processos=2, max_fila=16, tempo_limite=120, retencao=600):
+        self.max_processos = max_processos
+        self.max_fila = max_fila
+        self.tempo_limite = tempo_limite
+        self.retencao = retencao
+        self._tarefas = {}
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+        # Vagas ocupadas da fila: futures ainda não concluídos -> (pool, prazo),
+        # e vagas reservadas pelas chamadas de mapear em andamento
+        self._ocupados = {}
+        self._reservas = 0
+        self._aposentados = set()
+
+    def _get_pool(self):
+        """Cria o pool de processos na primeira tarefa (e novamente após um fork)"""
+        if self._pool is None or self._pool_pid != os.getpid():
+            if self._pool_pid != os.getpid():
+                # Futures herdados do processo pai não pertencem a este processo
+                self._ocupados.clear()
+                self._aposentados.clear()
+            self._pool = ProcessPoolExecutor(max_workers=self.max_processos)
+            self._pool_pid = os.getpid()
+        return self._pool
+
+    def _submeter(self, funcao, args, tempo_limite):
+        """
+        Envia funcao(*args) ao pool e ocupa uma vaga da fila (chamar com o
+        lock; depois de soltá-lo, registrar _liberar com add_done_callback)
+        """
+        try:
+            pool = self._get_pool()
+            future = pool.submit(funcao, *args)
+        except BrokenProcessPool:
+            # Um processo do pool morreu: recriar o pool e tentar novamente
+            self._pool = None
+            pool = self._get_pool()
+            future = pool.submit(funcao, *args)
+        self._ocupados[future] = (pool, time.time() + tempo_limite)
+        return future
+
+    def _liberar(self, future):
+        """Libera a vaga da tarefa quando o processo a conclui (callback do future)"""
+        with self._lock:
+            self._ocupados.pop(future, None)
+
+    def _ocupacao(self):
+        """Vagas ocupadas da fila (chamar com o lock)"""
+        return len(self._ocupados) + self._reservas
+
+    def _verificar_expiradas(self):
+        """Aposenta os pools com tarefas além do prazo ainda em execução (chamar com o lock)"""
+        agora = time.time()
+        for future, (pool, prazo) in list(self._ocupados.items()):
+            if prazo < agora and not future.done():
+                self._aposentar_pool(pool)
+
+    def _aposentar_pool(self, pool):
+        """
+        Substitui o pool em que uma tarefa expirou (chamar com o lock): as
+        novas tarefas vão para um pool novo, e os processos do antigo são
+        encerrados quando as demais tarefas dele terminarem ou expirarem.
+        As tarefas expiradas terminam então com BrokenProcessPool, liberando
+        suas vagas.
+        """
+        if pool in self._aposentados:
+            return
+        self._aposentados.add(pool)
+        if pool is self._pool:
+            self._pool = None
+        agora = time.time()
+        outras = [(future, prazo) for future, (dono, prazo) in self._ocupados.items()
+                  if dono is pool and prazo >= agora]
+        espera = max((prazo for _, prazo in outras), default=agora) - agora
+        threading.Thread(
+            target=self._encerrar_pool,
+            args=(pool, [future for future, _ in outras], espera),
+            daemon=True
+        ).start()
+
+    def _encerrar_pool(self, pool, futures, espera):
+        wait(futures, timeout=espera)
+        # O ProcessPoolExecutor não tem como interromper uma tarefa em execução
+        for processo in list((pool._processes or {}).values()):
+            processo.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._aposentados.discard(pool)
+
+    def _atualizar_status(self, tarefa):
+        """Atualiza o status da tarefa a partir do future (chamar com o lock)"""
+        if tarefa['status'] not in ('pendente', 'executando'):
+            return
+        future = tarefa['future']
+        if future.done():
+            erro = future.exception()
+            if erro is None:
+                tarefa['status'] = 'concluida'
+                tarefa['resultado'] = future.result()
+            else:
+                tarefa['status'] = 'erro'
+                tarefa['erro'] = erro
+            tarefa['concluida_em'] = time.time()
+        elif time.time() > tarefa['prazo']:
+            # O resultado será descartado; o processo é encerrado com o pool
+            if not future.cancel() and future in self._ocupados:
+                self._aposentar_pool(self._ocupados[future][0])
+            tarefa['status'] = 'expirada'
+            tarefa['erro'] = TarefaExpirada(f"Tarefa excedeu o tempo limite de {tarefa['tempo_limite']}s")
+            tarefa['concluida_em'] = time.time()
+        elif future.running():
+            tarefa['status'] = 'executando'
+
+    def _limpar(self):
+        """Remove tarefas finalizadas há mais tempo que a retenção (chamar com o lock)"""
+        limite = time.time() - self.retencao
+        for tarefa_id in [tarefa_id for tarefa_id, tarefa in self._tarefas.items()
+                          if tarefa.get('concluida_em') and tarefa['concluida_em'] < limite]:
+            del self._tarefas[tarefa_id]
+
+    def em_andamento(self):
+        """
+        Vagas ocupadas da fila: tarefas ainda não concluídas pelo pool
+        (inclusive as expiradas) e vagas reservadas por mapear
+        """
+        with self._lock:
+            for tarefa in self._tarefas.values():
+                self._atualizar_status(tarefa)
+            self._verificar_expiradas()
+            return self._ocupacao()
+
+    def enviar(self, funcao, *args, pos_processamento=None, formato='json', tempo_limite=None):
+        """
+        Enfileira funcao(*args) e retorna o ID da tarefa.
+
+        - pos_processamento: função aplicada ao resultado no processo web,
+          uma única vez, quando o resultado é consultado
+        - formato: 'json' ou 'arquivo' (resultado é um caminho de arquivo)
+
+        Levanta FilaCheia se já houver max_fila tarefas em andamento.
+        """
+        tempo_limite = tempo_limite or self.tempo_limite
+        tarefa_id = uuid.uuid4().hex
+        tarefa = {
+            'id': tarefa_id,
+            'status': 'pendente',
+            'formato': formato,
+            'criada_em': time.time(),
+            'prazo': time.time() + tempo_limite,
+            'tempo_limite': tempo_limite,
+            'pos_processamento': pos_processamento,
+            'resultado': None,
+            'erro': None,
+            'concluida_em': None
+        }
+
+        if self.max_processos == 0 or perfil_ativo():
+            # Modo sem pool (ou requisição sob perfil): executar imediatamente na thread atual
+            try:
+                tarefa['resultado'] = funcao(*args)
+                tarefa['status'] = 'concluida'
+            except Exception as e:
+                tarefa['erro'] = e
+                tarefa['status'] = 'erro'
+            tarefa['concluida_em'] = time.time()
+            with self._lock:
+                self._limpar()
+                self._tarefas[tarefa_id] = tarefa
+            return tarefa_id
+
+        # Verificação da fila e envio atômicos entre as threads
+        with self._lock:
+            self._verificar_expiradas()
+            if self._ocupacao() >= self.max_fila:
+                raise FilaCheia(f'Limite de {self.max_fila} tarefas em andamento atingido')
+            tarefa['future'] = self._submeter(funcao, args, tempo_limite)
+            self._limpar()
+            self._tarefas[tarefa_id] = tarefa
+        tarefa['future'].add_done_callback(self._liberar)
+        return tarefa_id
+
+    def consultar(self, tarefa_id):
+        """
+        Retorna um resumo da tarefa (status, resultado ou erro), ou None se
+        o ID não existir. O pós-processamento é aplicado na primeira consulta
+        após a conclusão.
+        """
+        with self._lock:
+            tarefa = self._tarefas.get(tarefa_id)
+            if tarefa is None:
+                return None
+            self._atualizar_status(tarefa)
+            pos_processamento = None
+            if tarefa['status'] == 'concluida' and tarefa['pos_processamento']:
+                pos_processamento, tarefa['pos_processamento'] = tarefa['pos_processamento'], None
+
+        if pos_processamento:
+            try:
+                tarefa['resultado'] = pos_processamento(tarefa['resultado'])
+            except Exception as e:
+                tarefa['status'] = 'erro'
+                tarefa['erro'] = e
+
+        return {
+            'id': tarefa['id'],
+            'status': tarefa['status'],
+            'formato': tarefa['formato'],
+            'criada_em': tarefa['criada_em'],
+            'concluida_em': tarefa['concluida_em'],
+            'resultado': tarefa['resultado'],
+            'erro': tarefa['erro']
+        }
+
+    def mapear(self, funcao, argumentos, minimo_paralelo=4, tempo_limite=None):
+        """
+        Aplica funcao a cada item de argumentos e retorna um gerador dos
+        resultados, na ordem de entrada. Com menos de minimo_paralelo itens
+        (ou sem pool) a execução é feita na própria thread; caso contrário,
+        no pool, com no máximo 2 * max_processos itens em execução ao mesmo
+        tempo, para não acumular resultados na memória.
+
+        Essas vagas são reservadas na fila já na chamada (FilaCheia se não
+        houver vagas) e liberadas quando o gerador termina ou é descartado.
+        O gerador levanta TarefaExpirada se um item exceder o tempo limite
+        (tempo_limite, ou o do gerenciador).
+        """
+        tempo_limite = tempo_limite or self.tempo_limite
+        argumentos = list(argumentos)
+        if self.max_processos == 0 or len(argumentos) < minimo_paralelo or perfil_ativo():
+            return (funcao(argumento) for argumento in argumentos)
+
+        vagas = min(2 * self.max_processos, len(argumentos))
+        with self._lock:
+            self._verificar_expiradas()
+            if self._ocupacao() + vagas > self.max_fila:
+                raise FilaCheia(f'Limite de {self.max_fila} tarefas em andamento atingido')
+            self._reservas += vagas
+
+        resultados = self._mapear_no_pool(funcao, argumentos, vagas, tempo_limite)
+        # Iniciar o gerador, para que a reserva seja liberada (no finally)
+        # mesmo que ele seja descartado sem ser percorrido
+        next(resultados)
+        return resultados
+
+    def _mapear_no_pool(self, funcao, argumentos, vagas, tempo_limite):
+        reservadas = vagas
+        pendentes = []
+        proximo = 0
+        try:
+            yield
+            while proximo < len(argumentos) or pendentes:
+                while proximo < len(argumentos) and len(pendentes) < vagas:
+                    # A vaga reservada passa a ser ocupada pelo future
+                    with self._lock:
+                        future = self._submeter(funcao, (argumentos[proximo],), tempo_limite)
+                        self._reservas -= 1
+                    reservadas -= 1
+                    future.add_done_callback(self._liberar)
+                    pendentes.append(future)
+                    proximo += 1
+                future = pendentes.pop(0)
+                try:
+                    resultado = future.result(timeout=tempo_limite)
+                except TempoEsgotado:
+                    with self._lock:
+                        self._verificar_expiradas()
+                    raise TarefaExpirada(f'Tarefa excedeu o tempo limite de {tempo_limite}s')
+                # Concluído: a vaga volta a ser reservada para o próximo item.
+                # result() pode retornar antes do callback _liberar: a vaga do
+                # future é liberada aqui, para não ser contada duas vezes
+                with self._lock:
+                    self._ocupados.pop(future, None)
+                    self._reservas += 1
+                reservadas += 1
+                yield resultado
+        finally:
+            for future in pendentes:
+                future.cancel()
+            with self._lock:
+                self._reservas -= reservadas
+
+    def executar(self, funcao, *args, tempo_limite=None):
+        """
+        Modo síncrono: executa funcao(*args) no pool e aguarda o resultado.
+        Levanta FilaCheia, TarefaExpirada ou a exceção da própria tarefa.
+        """
+        tempo_limite = tempo_limite or self.tempo_limite
+        tarefa_id = self.enviar(funcao, *args, tempo_limite=tempo_limite)
+        future = self._tarefas[tarefa_id].get('future')
+        if future is not None:
+            try:
+                future.result(timeout=tempo_limite)
+            except Exception:
+                # Tempo esgotado ou erro da tarefa: tratados a partir do status abaixo
+                pass
+
+        tarefa = self.consultar(tarefa_id)
+        with self._lock:
+            self._tarefas.pop(tarefa_id, None)
+
+        if tarefa['status'] == 'concluida':
+            return tarefa['resultado']
+        if tarefa['status'] in ('pendente', 'executando'):
+            raise TarefaExpirada(f'Tarefa excedeu o tempo limite de {tempo_limite}s')
+        raise tarefa['erro']
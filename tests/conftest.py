@@ -0,0 +1,46 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# Banco, caches e modelos publicados isolados em um diretório temporário.
+# Definidos antes de importar a aplicação: vários módulos leem o ambiente
+# na importação (ex.: treinamento_riscos.DIRETORIO_MODELOS)
+DIRETORIO_TESTES = tempfile.mkdtemp(prefix='serralheria-testes-')
+os.environ['DATABASE_URL'] = os.path.join(DIRETORIO_TESTES, 'testes.db')
+os.environ['PDF_CACHE_FOLDER'] = os.path.join(DIRETORIO_TESTES, 'cache_pdf')
+os.environ['MODELOS_RISCO_DIR'] = os.path.join(DIRETORIO_TESTES, 'modelos_risco')
+os.environ['TAREFAS_MAX_PROCESSOS'] = '0'
+os.environ['PERFIL_AMOSTRAGEM'] = '0'
+os.environ['PERFIL_CHAVE'] = ''
+os.environ.pop('METRICAS_DIR', None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def pytest_unconfigure(config):
+    shutil.rmtree(DIRETORIO_TESTES, ignore_errors=True)
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+@pytest.fixture
+def cliente(app):
+    return app.test_client()
+
+@pytest.fixture
+def classificador(app):
+    from routes.main import get_classificador
+    return get_classificador()
+
+@pytest.fixture
+def conexao(app):
+    from banco_dados import abrir_conexao, caminho_banco
+    conn = abrir_conexao(caminho_banco(app.config['DATABASE']))
+    yield conn
+    conn.fechar()
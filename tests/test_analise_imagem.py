@@ -0,0 +1,62 @@
+import io
+import os
+
+import pytest
+from PIL import Image, ImageDraw
+
+import routes.api
+from analise_imagem import ler_cabecalho
+from routes.api import ESCALA_DESENHO_IMAGEM, get_tarefas, processar_imagem
+from tarefas import TarefaExpirada
+
+def _desenho(caminho, **parametros):
+    """Desenho de 1000x800 px com uma moldura de 800x600 px"""
+    imagem = Image.new('L', (1000, 800), 255)
+    ImageDraw.Draw(imagem).rectangle((100, 100, 899, 699), outline=0, width=4)
+    imagem.save(caminho, **parametros)
+    return str(caminho)
+
+def test_tiff_sem_resolucao_nao_tem_escala(tmp_path):
+    caminho = _desenho(tmp_path / 'sem_resolucao.tif')
+    with Image.open(caminho) as imagem:
+        assert ler_cabecalho(imagem)['dpi'] is None
+
+    resultados = processar_imagem(caminho)
+    assert resultados['escala'] is None
+    assert resultados['dimensoes'] == {}
+    assert resultados['area'] == 0
+    assert resultados['elementos'] == []
+    assert resultados['dimensoes_px'] == {'largura': 800, 'altura': 600}
+
+def test_resolucao_de_ate_1_dpi_e_ignorada(tmp_path):
+    caminho = _desenho(tmp_path / 'desenho.png', dpi=(1, 1))
+    resultados = processar_imagem(caminho)
+    assert resultados['escala'] is None
+    assert resultados['area'] == 0
+
+def test_tiff_com_resolucao_usa_a_escala(tmp_path):
+    caminho = _desenho(tmp_path / 'com_resolucao.tif', dpi=(200, 200))
+    resultados = processar_imagem(caminho)
+    metros_por_px = 0.0254 / 200 * ESCALA_DESENHO_IMAGEM
+    assert resultados['escala']['dpi'] == [200.0, 200.0]
+    assert resultados['dimensoes']['comprimento'] == pytest.approx(800 * metros_por_px, abs=0.001)
+    assert resultados['dimensoes']['largura'] == pytest.approx(600 * metros_por_px, abs=0.001)
+    assert resultados['area'] > 0
+
+def test_upload_em_disco_removido_quando_a_tarefa_expira(app, cliente, tmp_path, monkeypatch):
+    def expirar(*args, **kwargs):
+        raise TarefaExpirada('Tarefa excedeu o tempo limite de 1s')
+
+    with app.app_context():
+        monkeypatch.setattr(get_tarefas(), 'executar', expirar)
+    monkeypatch.setattr(routes.api, 'UPLOAD_FOLDER', str(tmp_path))
+    monkeypatch.setitem(app.config, 'UPLOAD_LIMITE_MEMORIA', 1024)
+
+    imagem = io.BytesIO()
+    _desenho(imagem, format='PNG')
+    conteudo = imagem.getvalue()
+    assert len(conteudo) > 1024
+
+    resposta = cliente.post('/api/analisar-documento', data={'arquivo': (io.BytesIO(conteudo), 'desenho.png')})
+    assert resposta.status_code == 504
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,70 @@
+import pytest
+
+@pytest.fixture
+def projeto_id(cliente):
+    resposta = cliente.post('/api/projetos', json={
+        'nome': 'Escada metálica',
+        'cliente': 'Cliente PDF',
+        'altura_maxima': 3,
+        'complexidade': 'alta',
+        'ambiente': 'controlado'
+    })
+    return resposta.get_json()['id']
+
+@pytest.fixture
+def orcamento_id(cliente, projeto_id):
+    resposta = cliente.post('/api/orcamentos', json={
+        'projeto_id': projeto_id,
+        'itens': [{'material_id': 1, 'quantidade': 12}, {'material_id': 3, 'quantidade': 4}]
+    })
+    assert resposta.status_code == 200
+    return resposta.get_json()['id']
+
+def test_pdf_com_etag_e_304(cliente, orcamento_id):
+    url = f'/api/orcamentos/{orcamento_id}/pdf'
+    resposta = cliente.get(url)
+    assert resposta.status_code == 200
+    assert resposta.mimetype == 'application/pdf'
+    assert resposta.data.startswith(b'%PDF')
+    etag = resposta.headers['ETag']
+
+    # A segunda geração vem do cache, com a mesma chave
+    repetida = cliente.get(url)
+    assert repetida.status_code == 200
+    assert repetida.headers['ETag'] == etag
+    assert repetida.data == resposta.data
+
+    nao_modificado = cliente.get(url, headers={'If-None-Match': etag})
+    assert nao_modificado.status_code == 304
+    assert nao_modificado.data == b''
+    assert nao_modificado.headers['ETag'] == etag
+
+    desatualizado = cliente.get(url, headers={'If-None-Match': '"versao-anterior"'})
+    assert desatualizado.status_code == 200
+    assert desatualizado.headers['ETag'] == etag
+
+def test_etag_muda_com_o_orcamento(cliente, projeto_id, orcamento_id):
+    outro_orcamento = cliente.post('/api/orcamentos', json={
+        'projeto_id': projeto_id,
+        'itens': [{'material_id': 1, 'quantidade': 13}]
+    }).get_json()['id']
+    primeira = cliente.get(f'/api/orcamentos/{orcamento_id}/pdf')
+    segunda = cliente.get(f'/api/orcamentos/{outro_orcamento}/pdf')
+    assert primeira.headers['ETag'] != segunda.headers['ETag']
+    resposta = cliente.get(f'/api/orcamentos/{outro_orcamento}/pdf', headers={'If-None-Match': primeira.headers['ETag']})
+    assert resposta.status_code == 200
+
+def test_pdf_de_orcamento_inexistente(cliente):
+    assert cliente.get('/api/orcamentos/999999/pdf').status_code == 404
+
+@pytest.mark.parametrize('corpo', [
+    [1, 2],
+    {'ids': [True]},
+    {'ids': [1, False]},
+    {'ids': ['1']},
+    {'ids': 1}
+])
+def test_exportacao_com_ids_invalidos(cliente, corpo):
+    resposta = cliente.post('/api/orcamentos/exportar', json=corpo)
+    assert resposta.status_code == 400
+    assert 'error' in resposta.get_json()
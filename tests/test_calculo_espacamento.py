@@ -0,0 +1,162 @@
+import itertools
+import math
+import random
+
+import numpy as np
+import pytest
+
+import calculo_espacamento
+from calculo_espacamento import (
+    EspacamentoInvalido, carga_vento, espacamento_tercas, espacamento_tesouras, fronteira_pareto, varrer_espacamentos
+)
+
+# Valores de calcularEspacamentoTesouras / calcularEspacamentoTercas
+# (static/js/calculo_espacamento.js), conferidos à mão
+CASOS_NAVEGADOR = [
+    # Região I (30 m/s), 10%, vão de 12 m, TP40: vento 0.613 * 28.5² / 100 * 0.7 * 102;
+    # carga acima de 3 kN/m² -> tesouras a no máximo 3.5 m
+    {'regiao': 30, 'inclinacao': 10, 'vao': 12, 'telha': 'trapezoidal-40',
+     'vento': 355.5072045, 'numero': 10, 'espacamento': 30 / 9, 'altura': 1.0,
+     'comprimento_agua': math.sqrt(36.36), 'por_agua': 5, 'total_tercas': 9},
+    # Região I, 25%, vão de 22 m, zipada: carga abaixo de 1.5 kN/m² (6 m),
+    # limitada a 3.5 m pelo vão acima de 20 m
+    {'regiao': 30, 'inclinacao': 25, 'vao': 22, 'telha': 'zipada',
+     'vento': 101.573487, 'numero': 10, 'espacamento': 30 / 9, 'altura': 1.83,
+     'comprimento_agua': math.sqrt(121 + 2.75 ** 2), 'por_agua': 7, 'total_tercas': 13},
+    # Região I, 25%, vão de 8 m, termoacústica: carga de 1.49 kN/m², tesouras a 6 m
+    {'regiao': 30, 'inclinacao': 25, 'vao': 8, 'telha': 'termoacustica',
+     'vento': 101.573487, 'numero': 6, 'espacamento': 6.0, 'altura': 0.67,
+     'comprimento_agua': math.sqrt(17), 'por_agua': 4, 'total_tercas': 7},
+    # Região V (50 m/s), 20%, vão de 8 m, termoacústica: vento 0.613 * 47.5² / 100 * 0.3 * 102
+    {'regiao': 50, 'inclinacao': 20, 'vao': 8, 'telha': 'termoacustica',
+     'vento': 423.2228625, 'numero': 10, 'espacamento': 30 / 9, 'altura': 0.67,
+     'comprimento_agua': math.sqrt(16 + 0.8 ** 2), 'por_agua': 4, 'total_tercas': 7}
+]
+
+@pytest.mark.parametrize('caso', CASOS_NAVEGADOR)
+def test_formulas_do_navegador(caso):
+    telha = calculo_espacamento.TIPOS_TELHA[caso['telha']]
+    vento = carga_vento(caso['regiao'], caso['inclinacao'])
+    assert float(vento) == pytest.approx(caso['vento'])
+
+    tesouras = espacamento_tesouras(caso['vao'], 30, telha['peso'], 0, vento)
+    assert tesouras['numero'] == caso['numero']
+    assert tesouras['espacamento'] == pytest.approx(caso['espacamento'])
+    assert tesouras['altura'] == pytest.approx(caso['altura'])
+    assert tesouras['cargaTotal'] == pytest.approx(15 + telha['peso'] + 25 + caso['vento'])
+
+    tercas = espacamento_tercas(caso['vao'], caso['inclinacao'], telha['vaoRecomendado'])
+    util = caso['comprimento_agua'] - 0.2
+    assert tercas['comprimentoAgua'] == pytest.approx(caso['comprimento_agua'])
+    assert tercas['numeroPorAgua'] == caso['por_agua']
+    assert tercas['numeroTotal'] == caso['total_tercas']
+    assert tercas['espacamento'] == pytest.approx(util / (caso['por_agua'] - 1))
+
+def test_varredura_de_uma_configuracao_usa_as_formulas_do_navegador():
+    caso = CASOS_NAVEGADOR[0]
+    resultado = varrer_espacamentos({
+        'vao_livre': 12, 'comprimento_total': 30, 'inclinacao': 10, 'regiao_vento': '1',
+        'tipo_telha': 'trapezoidal-40', 'perfil_terca': 'z-enrijecido'
+    })
+    assert resultado['combinacoes_avaliadas'] == len(calculo_espacamento.ALTURAS_PERFIL)
+    melhor = resultado['cenarios'][0]['melhor']
+    assert melhor['tesouras']['numero'] == caso['numero']
+    assert melhor['tesouras']['espacamento'] == pytest.approx(caso['espacamento'])
+    assert melhor['tercas']['numeroTotal'] == caso['total_tercas']
+    assert melhor['pecas'] == caso['numero'] + caso['total_tercas']
+    assert resultado['cenarios'][0]['pareto'] == [melhor]
+
+def _nao_dominados(pontos):
+    """Pontos (custo, peças) viáveis que nenhum outro ponto domina, por força bruta"""
+    viaveis = {ponto for ponto in pontos if math.isfinite(ponto[0])}
+    return {
+        (custo, pecas) for custo, pecas in viaveis
+        if not any(c <= custo and p <= pecas and (c, p) != (custo, pecas) for c, p in viaveis)
+    }
+
+@pytest.mark.parametrize('semente', range(10))
+def test_fronteira_pareto_contra_forca_bruta(semente):
+    sorteio = random.Random(semente)
+    # Poucos valores distintos, para que haja empates de custo e de peças
+    custos = np.array([[sorteio.choice([1.0, 2.0, 3.0, 4.0, np.inf]) for _ in range(12)] for _ in range(5)])
+    pecas = np.array([[float(sorteio.randint(1, 5)) for _ in range(12)] for _ in range(5)])
+    mascara = fronteira_pareto(custos, pecas)
+    for linha in range(custos.shape[0]):
+        pontos = list(zip(custos[linha].tolist(), pecas[linha].tolist()))
+        na_fronteira = [pontos[indice] for indice in np.flatnonzero(mascara[linha])]
+        # Uma alternativa por ponto não dominado
+        assert sorted(na_fronteira) == sorted(_nao_dominados(pontos))
+
+def test_pareto_da_varredura_contra_forca_bruta():
+    grade = {
+        'inclinacao': [5, 10, 20], 'tipo_telha': ['trapezoidal-40', 'ondulada', 'zipada'],
+        'perfil_terca': ['u-simples', 'z-enrijecido']
+    }
+    resultado = varrer_espacamentos(dict(grade, vao_livre=[10, 18], comprimento_total=24, regiao_vento=['1', '3']))
+    assert len(resultado['cenarios']) == 4
+
+    for cenario in resultado['cenarios']:
+        # Cada combinação avaliada isoladamente
+        pontos = []
+        for inclinacao, telha, perfil in itertools.product(*grade.values()):
+            sozinha = varrer_espacamentos({
+                'vao_livre': cenario['vao_livre'], 'comprimento_total': 24, 'regiao_vento': cenario['regiao_vento'],
+                'inclinacao': inclinacao, 'tipo_telha': telha, 'perfil_terca': perfil
+            })['cenarios'][0]['melhor']
+            pontos.append((sozinha['custo'], sozinha['pecas']) if sozinha else (math.inf, 0))
+
+        assert cenario['combinacoes_viaveis'] == sum(math.isfinite(custo) for custo, _ in pontos)
+        fronteira = [(alternativa['custo'], alternativa['pecas']) for alternativa in cenario['pareto']]
+        assert sorted(fronteira) == sorted(_nao_dominados(pontos))
+        assert fronteira == sorted(fronteira)
+        assert cenario['melhor']['custo'] == min(custo for custo, _ in pontos)
+        # Telha ondulada exige 10% de inclinação
+        assert all(alternativa['inclinacao'] >= 10 for alternativa in cenario['pareto']
+                   if alternativa['tipo_telha'] == 'ondulada')
+
+def test_limite_de_combinacoes(monkeypatch):
+    # 6 inclinações x 5 telhas x 4 perfis x 5 alturas
+    parametros = {'vao_livre': 12, 'comprimento_total': 30}
+    monkeypatch.setattr(calculo_espacamento, 'MAX_COMBINACOES_ESPACAMENTO', 600)
+    assert varrer_espacamentos(parametros)['combinacoes_avaliadas'] == 600
+    monkeypatch.setattr(calculo_espacamento, 'MAX_COMBINACOES_ESPACAMENTO', 599)
+    with pytest.raises(EspacamentoInvalido):
+        varrer_espacamentos(parametros)
+
+PARAMETROS_INVALIDOS = [
+    {'comprimento_total': 30},
+    {'vao_livre': 12},
+    {'vao_livre': [], 'comprimento_total': 30},
+    {'vao_livre': 0.5, 'comprimento_total': 30},
+    {'vao_livre': '12', 'comprimento_total': 30},
+    {'vao_livre': True, 'comprimento_total': 30},
+    {'vao_livre': 12, 'comprimento_total': [30, 40]},
+    {'vao_livre': 12, 'comprimento_total': 30, 'inclinacao': 0},
+    {'vao_livre': 12, 'comprimento_total': 30, 'regiao_vento': '6'},
+    {'vao_livre': 12, 'comprimento_total': 30, 'tipo_telha': 'colonial'},
+    {'vao_livre': 12, 'comprimento_total': 30, 'perfil_terca': ['u-simples', 'w']},
+    {'vao_livre': 12, 'comprimento_total': 30, 'material': ['aco-astm-a36', 'aco-sae-1020']},
+    {'vao_livre': 12, 'comprimento_total': 30, 'carga_adicional': -1}
+]
+
+@pytest.mark.parametrize('parametros', PARAMETROS_INVALIDOS)
+def test_parametros_invalidos(parametros):
+    with pytest.raises(EspacamentoInvalido):
+        varrer_espacamentos(parametros)
+
+@pytest.mark.parametrize('corpo', [[12, 30], PARAMETROS_INVALIDOS[3], PARAMETROS_INVALIDOS[8]])
+def test_rota_com_parametros_invalidos(cliente, corpo):
+    resposta = cliente.post('/api/espacamento/varredura', json=corpo)
+    assert resposta.status_code == 400
+    assert 'error' in resposta.get_json()
+
+def test_rota_de_varredura(cliente):
+    resposta = cliente.post('/api/espacamento/varredura', json={
+        'vao_livre': [10, 15], 'comprimento_total': 30, 'regiao_vento': ['1', '2']
+    })
+    assert resposta.status_code == 200
+    resultado = resposta.get_json()
+    assert [(cenario['vao_livre'], cenario['regiao_vento']) for cenario in resultado['cenarios']] == [
+        (10, '1'), (10, '2'), (15, '1'), (15, '2')
+    ]
+    assert all(cenario['melhor'] in cenario['pareto'] for cenario in resultado['cenarios'])
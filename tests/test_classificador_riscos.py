@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from classificador_riscos import ClassificadorRiscos
+
+ALTURAS = (0, 0.5, 0.50001, 1.9, 2, 2.1, 5.99, 6, 6.01, 12, 30)
+COMPLEXIDADES = ('baixa', 'media', 'alta')
+AMBIENTES = ('controlado', 'externo', 'externo_adverso')
+
+PROJETOS = [
+    {'altura_maxima': altura, 'complexidade': complexidade, 'ambiente': ambiente}
+    for altura in ALTURAS for complexidade in COMPLEXIDADES for ambiente in AMBIENTES
+]
+
+PROJETO_COMPLETO = {
+    'nome': 'Cobertura',
+    'altura_maxima': 5,
+    'complexidade': 'media',
+    'ambiente': 'externo',
+    'comprimento': 4,
+    'largura': 3
+}
+
+def test_lote_igual_a_classificacao_individual(classificador):
+    assert classificador.classificar_lote(PROJETOS) == [classificador.classificar(projeto) for projeto in PROJETOS]
+
+def test_lote_vazio(classificador):
+    assert classificador.classificar_lote([]) == []
+
+@pytest.mark.parametrize('altura', [None, 'alta', [1]])
+def test_altura_invalida_levanta_como_classificar(classificador, altura):
+    projeto = {'altura_maxima': altura}
+    with pytest.raises((TypeError, ValueError)):
+        classificador.classificar(projeto)
+    with pytest.raises((TypeError, ValueError)):
+        classificador.classificar_lote([PROJETOS[0], projeto])
+
+def test_lote_ignorando_invalidos(classificador):
+    projetos = [PROJETOS[0], {'altura_maxima': None}, PROJETOS[-1], 'projeto']
+    assert classificador.classificar_lote(projetos, ignorar_invalidos=True) == [
+        classificador.classificar(PROJETOS[0]), None, classificador.classificar(PROJETOS[-1]), None
+    ]
+
+def test_rota_lote_com_erro_por_projeto(cliente):
+    resposta = cliente.post('/api/analisar-projeto/lote', json={'projetos': [
+        PROJETO_COMPLETO,
+        dict(PROJETO_COMPLETO, altura_maxima=None),
+        dict(PROJETO_COMPLETO, altura_maxima='alta')
+    ]})
+    assert resposta.status_code == 200
+    dados = resposta.get_json()
+    assert dados['total'] == 3
+    assert dados['erros'] == 2
+    assert dados['resultados'][1] == {'error': 'Projeto 1: altura_maxima, complexidade ou ambiente inválidos'}
+    assert 'error' in dados['resultados'][2]
+
+    individual = cliente.post('/api/analisar-projeto', json=PROJETO_COMPLETO).get_json()
+    assert dados['resultados'][0]['projeto'] == individual['projeto']
+    assert dados['resultados'][0]['valor_total'] == pytest.approx(individual['valor_total'])
+
+def _alturas_de_teste(classificador):
+    limites = np.unique(np.concatenate([
+        arvore.tree_.threshold[arvore.tree_.feature == 0]
+        for arvore in classificador.modelo.estimators_
+    ]))
+    fronteiras = limites * classificador._escala_altura + classificador._media_altura
+    aleatorias = np.random.default_rng(7).uniform(-2.0, 60.0, 3000)
+    return np.concatenate([
+        fronteiras,
+        np.nextafter(fronteiras, -np.inf),
+        np.nextafter(fronteiras, np.inf),
+        np.linspace(-5.0, 50.0, 1101),
+        aleatorias
+    ])
+
+def test_tabela_compilada_reproduz_modelo(classificador):
+    assert classificador.tabela_compilada is not None
+    alturas = _alturas_de_teste(classificador)
+    for complexidade in ClassificadorRiscos.VALORES_CATEGORIAS:
+        for ambiente in ClassificadorRiscos.VALORES_CATEGORIAS:
+            X = np.column_stack([
+                alturas,
+                np.full(len(alturas), complexidade),
+                np.full(len(alturas), ambiente)
+            ])
+            esperado = classificador.modelo.predict(classificador.scaler.transform(X))
+            obtido = classificador._prever_indices(X[:, 0], X[:, 1], X[:, 2])
+            assert np.array_equal(esperado, obtido)
+
+def test_consulta_individual_pela_tabela_reproduz_modelo(classificador):
+    niveis = ['baixo', 'medio', 'alto', 'muito_alto']
+    alturas = _alturas_de_teste(classificador)[::7]
+    for complexidade in ClassificadorRiscos.VALORES_CATEGORIAS:
+        for ambiente in ClassificadorRiscos.VALORES_CATEGORIAS:
+            X = np.column_stack([
+                alturas,
+                np.full(len(alturas), complexidade),
+                np.full(len(alturas), ambiente)
+            ])
+            esperado = classificador.modelo.predict(classificador.scaler.transform(X))
+            for altura, indice in zip(alturas.tolist(), esperado.tolist()):
+                nivel, _, _ = classificador._classificar_por_modelo(altura, complexidade, ambiente)
+                assert nivel == niveis[indice]
+
+def test_modo_compilado_igual_ao_modelo(classificador):
+    sem_tabela = ClassificadorRiscos(modo_compilado=False, diretorio_modelos=classificador.diretorio_modelos)
+    assert sem_tabela.tabela_compilada is None
+    assert classificador.classificar_lote(PROJETOS) == sem_tabela.classificar_lote(PROJETOS)
+    assert [classificador.classificar(projeto) for projeto in PROJETOS] == [
+        sem_tabela.classificar(projeto) for projeto in PROJETOS
+    ]
@@ -0,0 +1,85 @@
+import pytest
+
+from catalogo_materiais import CatalogoMateriais
+from estimativa_materiais import estimar_materiais, estimar_materiais_lote
+
+# Materiais dos blocos de estimativa anteriores ao motor de regras:
+# (nome, metros/unidades por m², unidade, preço padrão, ID padrão)
+BLOCOS_ANTERIORES = [
+    ('Tubo Metalon 40x40', 0.8, 'metro', 32.90, 3),
+    ('Tubo Metalon 20x20', 1.2, 'metro', 15.50, 1),
+    ('Chapa Galvanizada #20', 0.7, 'm²', 95.00, 6),
+    ('Parafuso Autobrocante', 15, 'unidade', 0.35, 8),
+    ('Tinta Anticorrosiva', 0.1, 'litro', 85.00, 11),
+]
+
+CATALOGO = CatalogoMateriais(1, [
+    {'id': 21, 'nome': 'Tubo Metalon 40x40', 'preco_unitario': 41.0},
+    {'id': 22, 'nome': 'Chapa Galvanizada #20', 'preco_unitario': 120.5},
+    {'id': 23, 'nome': 'Tinta Anticorrosiva', 'preco_unitario': 79.9},
+])
+
+def estimativa_anterior(area, catalogo):
+    """Estimativa como era feita pelos blocos escritos à mão em routes/api.py"""
+    materiais_estimados = []
+    valor_materiais = 0
+    if area > 0:
+        for nome, coeficiente, unidade, preco_padrao, id_padrao in BLOCOS_ANTERIORES:
+            quantidade = area * coeficiente
+            valor_unitario = catalogo.preco(nome, preco_padrao)
+            materiais_estimados.append({
+                'material_id': catalogo.id(nome, id_padrao),
+                'nome': nome,
+                'quantidade': quantidade,
+                'unidade': unidade,
+                'valor_unitario': valor_unitario,
+                'valor_total': quantidade * valor_unitario
+            })
+            valor_materiais += quantidade * valor_unitario
+    return materiais_estimados, valor_materiais
+
+def _comparar(obtido, esperado):
+    materiais, valor = obtido
+    materiais_esperados, valor_esperado = esperado
+    assert len(materiais) == len(materiais_esperados)
+    for material, material_esperado in zip(materiais, materiais_esperados):
+        assert material == pytest.approx(material_esperado)
+    assert valor == pytest.approx(valor_esperado)
+
+@pytest.mark.parametrize('area', [0.01, 1, 12, 37.5, 1234.56])
+def test_motor_reproduz_blocos_anteriores(area):
+    for catalogo in (CATALOGO, CatalogoMateriais(0, [])):
+        _comparar(
+            estimar_materiais({'area': area, 'perimetro': 10, 'altura': 3}, catalogo),
+            estimativa_anterior(area, catalogo)
+        )
+
+@pytest.mark.parametrize('area', [0, None])
+def test_sem_area_nao_estima_materiais(area):
+    assert estimar_materiais({'area': area, 'perimetro': 10, 'altura': 3}, CATALOGO) == ([], 0)
+
+def test_lote_igual_a_estimativa_individual():
+    projetos = [{'area': area, 'perimetro': area / 2, 'altura': 2} for area in (0, 3, 7.25, 0, 150)]
+    resultados = estimar_materiais_lote(projetos, CATALOGO)
+    assert len(resultados) == len(projetos)
+    for projeto, resultado in zip(projetos, resultados):
+        _comparar(resultado, estimativa_anterior(projeto['area'], CATALOGO))
+    assert estimar_materiais_lote([], CATALOGO) == []
+
+def test_modificadores_das_regras():
+    regras = [{
+        'material': 'Tubo Metalon 40x40',
+        'base': 'perimetro',
+        'coeficiente': 2,
+        'unidade': 'metro',
+        'preco_padrao': 32.90,
+        'id_padrao': 3,
+        'modificadores': {'complexidade': {'alta': 1.5}}
+    }]
+    simples, complexo = estimar_materiais_lote([
+        {'perimetro': 10, 'complexidade': 'baixa'},
+        {'perimetro': 10, 'complexidade': 'alta'}
+    ], CATALOGO, regras)
+    assert simples[0][0]['quantidade'] == pytest.approx(20)
+    assert complexo[0][0]['quantidade'] == pytest.approx(30)
+    assert complexo[1] == pytest.approx(30 * 41.0)
@@ -0,0 +1,150 @@
+import random
+import uuid
+
+import pytest
+
+from estoque_retalhos import RetalhoIndisponivel, buscar_retalhos, buscar_retalhos_candidatos, registrar_cortes
+
+@pytest.fixture
+def material_id(conexao):
+    """Material exclusivo do teste, para que os retalhos não se misturem"""
+    cursor = conexao.execute('''
+    INSERT INTO materiais (nome, tipo, preco_unitario, unidade, fornecedor, ultima_atualizacao)
+    VALUES (?, 'Perfil', 10.0, 'barra', 'Fornecedor de testes', '2026-01-01')
+    ''', (f'Perfil de testes {uuid.uuid4().hex[:8]}',))
+    conexao.commit()
+    return cursor.lastrowid
+
+@pytest.fixture
+def orcamento_id(cliente):
+    projeto = cliente.post('/api/projetos', json={'nome': 'Esquadrias', 'cliente': 'Cliente retalhos'}).get_json()
+    return cliente.post('/api/orcamentos', json={
+        'projeto_id': projeto['id'],
+        'itens': [{'material_id': 1, 'quantidade': 1}]
+    }).get_json()['id']
+
+def _inserir(cliente, material_id, comprimento, quantidade=1):
+    resposta = cliente.post('/api/retalhos', json={
+        'material_id': material_id, 'comprimento': comprimento, 'quantidade': quantidade
+    })
+    assert resposta.status_code == 201
+
+def _estoque(conexao, material_id):
+    return conexao.execute(
+        'SELECT id, comprimento, orcamento_origem_id, orcamento_consumo_id FROM retalhos WHERE material_id = ? ORDER BY id',
+        (material_id,)
+    ).fetchall()
+
+def test_registrar_cortes_consome_retalhos_e_guarda_sobras(conexao, material_id, orcamento_id, cliente):
+    _inserir(cliente, material_id, 1000, 2)
+    (_, primeiro), (_, segundo) = buscar_retalhos(conexao, material_id)
+    resultado = {'barras': [
+        {'retalhoId': primeiro, 'espacoRestante': 50},
+        {'retalhoId': segundo, 'espacoRestante': 400},
+        {'espacoRestante': 2500}
+    ]}
+    assert registrar_cortes(conexao, material_id, resultado, orcamento_id, comprimento_minimo=300) == [400, 2500]
+    conexao.commit()
+
+    assert [(row['comprimento'], row['orcamento_origem_id'], row['orcamento_consumo_id'])
+            for row in _estoque(conexao, material_id)] == [
+        (1000, None, orcamento_id), (1000, None, orcamento_id),
+        (400, orcamento_id, None), (2500, orcamento_id, None)
+    ]
+
+def test_registrar_cortes_com_retalho_ja_consumido(conexao, material_id, orcamento_id, cliente):
+    _inserir(cliente, material_id, 1000, 2)
+    (_, primeiro), (_, segundo) = buscar_retalhos(conexao, material_id)
+    registrar_cortes(conexao, material_id, {'barras': [{'retalhoId': primeiro, 'espacoRestante': 0}]}, orcamento_id)
+    conexao.commit()
+
+    with pytest.raises(RetalhoIndisponivel):
+        registrar_cortes(conexao, material_id, {'barras': [
+            {'retalhoId': segundo, 'espacoRestante': 0},
+            {'retalhoId': primeiro, 'espacoRestante': 0}
+        ]}, orcamento_id)
+    conexao.rollback()
+    assert buscar_retalhos(conexao, material_id) == [(1000, segundo)]
+
+def test_aprovacao_com_corte_invalido_desfaz_tudo(cliente, conexao, material_id, orcamento_id):
+    _inserir(cliente, material_id, 1200, 3)
+    estoque = _estoque(conexao, material_id)
+
+    resposta = cliente.post(f'/api/orcamentos/{orcamento_id}/aprovar', json={'cortes': [
+        {'material_id': material_id, 'pecas': [{'tamanho': 500, 'quantidade': 4}], 'tamanho_barra': 6000},
+        {'material_id': material_id, 'pecas': [{'tamanho': -1, 'quantidade': 1}], 'tamanho_barra': 6000}
+    ]})
+    assert resposta.status_code == 400
+    assert 'error' in resposta.get_json()
+
+    conexao.rollback()
+    assert conexao.execute(
+        'SELECT COUNT(*) FROM aprovacoes_orcamentos WHERE orcamento_id = ?', (orcamento_id,)
+    ).fetchone()[0] == 0
+    assert _estoque(conexao, material_id) == estoque
+
+def test_aprovacao_consome_retalhos_uma_unica_vez(cliente, conexao, material_id, orcamento_id):
+    _inserir(cliente, material_id, 1200, 3)
+    cortes = {'cortes': [
+        {'material_id': material_id, 'pecas': [{'tamanho': 500, 'quantidade': 4}], 'tamanho_barra': 6000}
+    ]}
+    resposta = cliente.post(f'/api/orcamentos/{orcamento_id}/aprovar', json=cortes)
+    assert resposta.status_code == 200
+    resultado = resposta.get_json()['cortes'][0]
+    usados = [barra['retalhoId'] for barra in resultado['barras'] if 'retalhoId' in barra]
+    assert usados
+
+    conexao.rollback()
+    consumidos = [row['id'] for row in _estoque(conexao, material_id) if row['orcamento_consumo_id'] == orcamento_id]
+    assert sorted(consumidos) == sorted(usados)
+
+    assert cliente.post(f'/api/orcamentos/{orcamento_id}/aprovar', json=cortes).status_code == 409
+
+@pytest.mark.parametrize('corpo', [
+    [1],
+    {'material_id': [1], 'comprimento': 1000},
+    {'material_id': {'id': 1}, 'comprimento': 1000},
+    {'material_id': '1', 'comprimento': 1000},
+    {'material_id': True, 'comprimento': 1000}
+])
+def test_entrada_de_retalhos_invalida(cliente, conexao, corpo):
+    total = conexao.execute('SELECT COUNT(*) FROM retalhos').fetchone()[0]
+    resposta = cliente.post('/api/retalhos', json=corpo)
+    assert resposta.status_code == 400
+    assert 'error' in resposta.get_json()
+    assert conexao.execute('SELECT COUNT(*) FROM retalhos').fetchone()[0] == total
+
+@pytest.mark.parametrize('material_id', [[1], 'abc', True, None])
+def test_aprovacao_com_material_id_invalido(cliente, orcamento_id, material_id):
+    resposta = cliente.post(f'/api/orcamentos/{orcamento_id}/aprovar', json={'cortes': [
+        {'material_id': material_id, 'pecas': [{'tamanho': 500, 'quantidade': 1}]}
+    ]})
+    assert resposta.status_code == 400
+    assert 'error' in resposta.get_json()
+
+def test_aprovacao_com_corpo_que_nao_e_objeto(cliente, orcamento_id):
+    resposta = cliente.post(f'/api/orcamentos/{orcamento_id}/aprovar', json=[{'material_id': 1}])
+    assert resposta.status_code == 400
+
+def _candidatos_esperados(conexao, material_id, demanda):
+    """Para cada comprimento, os N menores retalhos que o comportam (N = peças daquele comprimento ou maiores)"""
+    candidatos = set()
+    for comprimento in demanda:
+        pecas = sum(quantidade for outro, quantidade in demanda.items() if outro >= comprimento)
+        candidatos.update(buscar_retalhos(conexao, material_id, comprimento)[:pecas])
+    return sorted(candidatos)
+
+def test_buscar_retalhos_candidatos(cliente, conexao, material_id):
+    aleatorio = random.Random(19)
+    for comprimento in aleatorio.choices(range(300, 3000, 50), k=60):
+        _inserir(cliente, material_id, comprimento)
+
+    assert buscar_retalhos_candidatos(conexao, material_id, {}) == []
+    assert buscar_retalhos_candidatos(conexao, material_id, {5000: 3}) == []
+    assert buscar_retalhos_candidatos(conexao, material_id, {100: 100}) == buscar_retalhos(conexao, material_id)
+    for _ in range(200):
+        demanda = {
+            aleatorio.randrange(200, 3200, 25): aleatorio.randint(1, 8)
+            for _ in range(aleatorio.randint(1, 5))
+        }
+        assert buscar_retalhos_candidatos(conexao, material_id, demanda) == _candidatos_esperados(conexao, material_id, demanda)
@@ -0,0 +1,66 @@
+import io
+import time
+
+import pytest
+from reportlab.pdfgen import canvas
+
+from extracao_pdf import extrair_texto_pdf
+from routes.api import processar_pdf
+from tarefas import GerenciadorTarefas
+
+def _pdf(paginas):
+    """PDF com uma linha de texto por página"""
+    saida = io.BytesIO()
+    documento = canvas.Canvas(saida)
+    for texto in paginas:
+        documento.drawString(72, 720, texto)
+        documento.showPage()
+    documento.save()
+    return saida.getvalue()
+
+PAGINAS = [f'Folha {indice} - detalhe de solda' for indice in range(12)]
+PAGINAS[5] = 'Comprimento: 12 m largura: 8 m altura: 3 m'
+
+def _fila_vazia(tarefas, limite=10):
+    fim = time.time() + limite
+    while tarefas.em_andamento():
+        if time.time() > fim:
+            return False
+        time.sleep(0.05)
+    return True
+
+@pytest.fixture(scope='module')
+def tarefas():
+    gerenciador = GerenciadorTarefas(max_processos=2, max_fila=8, tempo_limite=30)
+    yield gerenciador
+    if gerenciador._pool is not None:
+        gerenciador._pool.shutdown(cancel_futures=True)
+
+def test_extracao_no_pool_igual_a_sequencial(tarefas):
+    conteudo = _pdf(PAGINAS)
+    sequencial = extrair_texto_pdf(io.BytesIO(conteudo))
+    paralela = extrair_texto_pdf(io.BytesIO(conteudo), mapear=tarefas.mapear)
+    assert paralela == sequencial
+    assert paralela[1] == {'paginas_total': 12, 'paginas_lidas': 12, 'interrompida': None}
+    assert tarefas._pool is not None
+    assert _fila_vazia(tarefas)
+
+def test_extracao_no_pool_para_no_criterio(tarefas, tmp_path):
+    caminho = tmp_path / 'projeto.pdf'
+    caminho.write_bytes(_pdf(PAGINAS))
+    texto, info = extrair_texto_pdf(str(caminho), parar_quando=lambda pagina: 'Comprimento' in pagina, mapear=tarefas.mapear)
+    assert info == {'paginas_total': 12, 'paginas_lidas': 6, 'interrompida': 'criterio_atingido'}
+    assert texto.rstrip().endswith(PAGINAS[5])
+    # A reserva da fila é liberada com a parada antecipada
+    assert _fila_vazia(tarefas)
+
+def test_limite_de_paginas_no_pool(tarefas):
+    _, info = extrair_texto_pdf(io.BytesIO(_pdf(PAGINAS)), max_paginas=4, mapear=tarefas.mapear)
+    assert info == {'paginas_total': 12, 'paginas_lidas': 4, 'interrompida': 'limite_paginas'}
+
+def test_processar_pdf_com_paginas_no_pool(tarefas):
+    conteudo = _pdf(PAGINAS)
+    resultados = processar_pdf(io.BytesIO(conteudo), tarefas.mapear)
+    assert resultados == processar_pdf(io.BytesIO(conteudo))
+    assert resultados['dimensoes']['comprimento'] == 12
+    assert resultados['extracao']['paginas_lidas'] == 6
@@ -0,0 +1,89 @@
+import json
+import uuid
+
+import pytest
+
+from routes.api import MAX_LIMITE_PAGINA
+
+TOTAL_PROJETOS = 7
+
+@pytest.fixture(scope='module')
+def projetos_criados(app):
+    """Projetos de um cliente exclusivo deste módulo, em ordem de id"""
+    cliente = f'Cliente {uuid.uuid4().hex[:8]}'
+    ids = []
+    with app.test_client() as cliente_http:
+        for indice in range(TOTAL_PROJETOS):
+            resposta = cliente_http.post('/api/projetos', json={
+                'nome': f'Portão {indice}',
+                'cliente': cliente,
+                'altura_maxima': 1 + indice,
+                'complexidade': 'media',
+                'ambiente': 'externo'
+            })
+            assert resposta.status_code == 201
+            ids.append(resposta.get_json()['id'])
+    return cliente, ids
+
+def _pagina(cliente, nome_cliente, **parametros):
+    return cliente.get('/api/projetos', query_string=dict(parametros, cliente=nome_cliente))
+
+@pytest.mark.parametrize('limite', [1, 2, 3, TOTAL_PROJETOS - 1])
+def test_paginas_cobrem_todos_os_registros(cliente, projetos_criados, limite):
+    nome_cliente, ids = projetos_criados
+    vistos = []
+    apos = None
+    while True:
+        parametros = {'limit': limite}
+        if apos is not None:
+            parametros['after'] = apos
+        dados = _pagina(cliente, nome_cliente, **parametros).get_json()
+        assert 1 <= len(dados['itens']) <= limite
+        vistos.extend(item['id'] for item in dados['itens'])
+        if dados['proximo'] is None:
+            break
+        assert dados['proximo'] == dados['itens'][-1]['id']
+        assert len(dados['itens']) == limite
+        apos = dados['proximo']
+    assert vistos == ids
+
+def test_limite_igual_ao_total_nao_tem_proxima_pagina(cliente, projetos_criados):
+    nome_cliente, ids = projetos_criados
+    dados = _pagina(cliente, nome_cliente, limit=TOTAL_PROJETOS).get_json()
+    assert [item['id'] for item in dados['itens']] == ids
+    assert dados['proximo'] is None
+
+def test_cursor_apos_o_ultimo_registro(cliente, projetos_criados):
+    nome_cliente, ids = projetos_criados
+    assert _pagina(cliente, nome_cliente, limit=5, after=ids[-1]).get_json() == {'itens': [], 'proximo': None}
+    dados = _pagina(cliente, nome_cliente, limit=5, after=ids[-2]).get_json()
+    assert [item['id'] for item in dados['itens']] == ids[-1:]
+    assert dados['proximo'] is None
+
+def test_projecao_de_campos(cliente, projetos_criados):
+    nome_cliente, ids = projetos_criados
+    dados = _pagina(cliente, nome_cliente, limit=2, campos='nome,cliente').get_json()
+    assert dados['itens'] == [{'nome': 'Portão 0', 'cliente': nome_cliente}, {'nome': 'Portão 1', 'cliente': nome_cliente}]
+    assert dados['proximo'] == ids[1]
+    assert _pagina(cliente, nome_cliente, campos='nome,senha').status_code == 400
+
+def test_listagem_sem_limite_e_ndjson(cliente, projetos_criados):
+    nome_cliente, ids = projetos_criados
+    assert [item['id'] for item in _pagina(cliente, nome_cliente).get_json()] == ids
+    assert [item['id'] for item in _pagina(cliente, nome_cliente, after=ids[2]).get_json()] == ids[3:]
+
+    resposta = _pagina(cliente, nome_cliente, limit=3, after=ids[0], formato='ndjson')
+    linhas = resposta.get_data(as_text=True).splitlines()
+    assert [json.loads(linha)['id'] for linha in linhas] == ids[1:4]
+
+@pytest.mark.parametrize('parametros', [
+    {'limit': 0},
+    {'limit': MAX_LIMITE_PAGINA + 1},
+    {'limit': -1},
+    {'limit': 'dez'},
+    {'after': '1.5'},
+])
+def test_parametros_invalidos(cliente, projetos_criados, parametros):
+    resposta = _pagina(cliente, projetos_criados[0], **parametros)
+    assert resposta.status_code == 400
+    assert 'error' in resposta.get_json()
@@ -0,0 +1,166 @@
+import random
+from collections import Counter
+
+import pytest
+
+from otimizacao_cortes import CorteInvalido, OtimizadorCortes, _ArvoreFenwick
+
+@pytest.mark.parametrize('corpo', [[1], 'pecas', 3])
+def test_corpo_que_nao_e_objeto(cliente, corpo):
+    resposta = cliente.post('/api/otimizar-cortes', json=corpo)
+    assert resposta.status_code == 400
+    assert 'error' in resposta.get_json()
+
+@pytest.mark.parametrize('material_id', [[1], {'id': 1}, 'abc', '1', True, 1.5])
+def test_material_id_invalido(cliente, material_id):
+    resposta = cliente.post('/api/otimizar-cortes', json={
+        'material_id': material_id, 'pecas': [{'tamanho': 1000, 'quantidade': 2}]
+    })
+    assert resposta.status_code == 400
+    assert 'error' in resposta.get_json()
+
+def test_material_inexistente(cliente):
+    resposta = cliente.post('/api/otimizar-cortes', json={
+        'material_id': 999999, 'pecas': [{'tamanho': 1000, 'quantidade': 2}]
+    })
+    assert resposta.status_code == 404
+    assert 'error' in resposta.get_json()
+
+def test_material_existente(cliente):
+    resposta = cliente.post('/api/otimizar-cortes', json={
+        'material_id': 1, 'pecas': [{'tamanho': 1000, 'quantidade': 2}]
+    })
+    assert resposta.status_code == 200
+    assert resposta.get_json()['totalBarras'] == 1
+
+# Campos do resultado e das barras lidos por static/js/otimizador_cortes.js
+CAMPOS_RESULTADO = {'barras', 'totalBarras', 'desperdicio', 'eficiencia', 'tamanhoBarraPadrao'}
+CAMPOS_BARRA = {'id', 'tamanhoTotal', 'espacoRestante', 'espacoUtilizado', 'pecas', 'desperdicio', 'eficiencia'}
+
+def _pecas_aleatorias(sorteio, tipos, maior):
+    return [{'tamanho': sorteio.randint(50, maior), 'quantidade': sorteio.randint(1, 4), 'descricao': f'P{indice}'}
+            for indice in range(tipos)]
+
+def _verificar_plano(resultado, pecas, tolerancia, barras=None, retalhos=()):
+    """Cada peça cortada uma única vez, sem exceder barras, estoque ou retalhos"""
+    esperadas = Counter()
+    for peca in pecas:
+        esperadas[(peca['tamanho'] + tolerancia, peca['descricao'])] += peca['quantidade']
+    cortadas = Counter((peca['tamanho'], peca['descricao']) for barra in resultado['barras'] for peca in barra['pecas'])
+    assert cortadas == esperadas
+    identificadores = [peca['id'] for barra in resultado['barras'] for peca in barra['pecas']]
+    assert len(identificadores) == len(set(identificadores))
+
+    for barra in resultado['barras']:
+        utilizado = sum(peca['tamanho'] for peca in barra['pecas'])
+        assert barra['espacoUtilizado'] == utilizado
+        assert barra['espacoRestante'] == barra['desperdicio'] == barra['tamanhoTotal'] - utilizado >= 0
+
+    comprimentos = dict((identificador, comprimento) for comprimento, identificador in retalhos)
+    usados = [barra['retalhoId'] for barra in resultado['barras'] if 'retalhoId' in barra]
+    assert len(usados) == len(set(usados))
+    for barra in resultado['barras']:
+        if 'retalhoId' in barra:
+            assert barra['tamanhoTotal'] == comprimentos[barra['retalhoId']]
+
+    novas = Counter(barra['tamanhoTotal'] for barra in resultado['barras'] if 'retalhoId' not in barra)
+    limites = {barra['tamanho']: barra.get('quantidade') for barra in barras or ({'tamanho': 6000},)}
+    for tamanho, quantidade in novas.items():
+        assert tamanho in limites
+        assert limites[tamanho] is None or quantidade <= limites[tamanho]
+    assert resultado['barrasNovas'] == sum(novas.values())
+    assert resultado['retalhosUtilizados'] == len(usados)
+
+def _material_novo(resultado):
+    return sum(barra['tamanhoTotal'] for barra in resultado['barras'] if 'retalhoId' not in barra)
+
+def test_formato_do_otimizador_do_navegador():
+    resultado = OtimizadorCortes().otimizar([{'tamanho': 2000, 'quantidade': 4, 'descricao': 'Montante'}])
+    assert CAMPOS_RESULTADO <= set(resultado)
+    assert all(set(barra) == CAMPOS_BARRA for barra in resultado['barras'])
+    # Mesmo resultado do navegador: peças de 2003mm, duas por barra de 6000mm
+    assert resultado['totalBarras'] == 2
+    assert resultado['desperdicio'] == 2 * (6000 - 2 * 2003)
+    assert resultado['eficiencia'] == pytest.approx(4 * 2003 / 12000 * 100)
+    assert resultado['tamanhoBarraPadrao'] == 6000
+    assert resultado['barras'][0]['pecas'][0] == {'tamanho': 2003, 'descricao': 'Montante', 'id': 'Montante-1'}
+    assert [barra['id'] for barra in resultado['barras']] == [1, 2]
+
+@pytest.mark.parametrize('semente', range(20))
+def test_planos_aleatorios_com_estoque_e_retalhos(semente):
+    sorteio = random.Random(semente)
+    pecas = _pecas_aleatorias(sorteio, sorteio.randint(1, 12), 2500)
+    barras = [{'tamanho': 6000}, {'tamanho': 3000, 'quantidade': sorteio.randint(0, 3)},
+              {'tamanho': 4500, 'quantidade': sorteio.randint(0, 2)}]
+    retalhos = [(sorteio.randint(30, 2500), 100 + indice) for indice in range(sorteio.randint(0, 5))]
+    resultado = OtimizadorCortes().otimizar(pecas, barras, retalhos=retalhos)
+    _verificar_plano(resultado, pecas, 3, barras, retalhos)
+
+@pytest.mark.parametrize('semente', range(10))
+def test_estoque_limitado_sem_barras_ilimitadas(semente):
+    sorteio = random.Random(semente)
+    pecas = _pecas_aleatorias(sorteio, 6, 1500)
+    barras = [{'tamanho': 3000, 'quantidade': 3}, {'tamanho': 6000, 'quantidade': 3}]
+    _verificar_plano(OtimizadorCortes().otimizar(pecas, barras), pecas, 3, barras)
+
+def test_estoque_insuficiente():
+    with pytest.raises(CorteInvalido):
+        OtimizadorCortes().otimizar([{'tamanho': 2000, 'quantidade': 4}], [{'tamanho': 6000, 'quantidade': 1}])
+
+@pytest.mark.parametrize('semente', range(15))
+def test_modo_exato_nunca_usa_mais_material(semente):
+    sorteio = random.Random(semente)
+    pecas = _pecas_aleatorias(sorteio, sorteio.randint(2, 6), 3000)
+    barras = [{'tamanho': 6000}, {'tamanho': 4000}, {'tamanho': 2500, 'quantidade': 2}]
+    retalhos = [(sorteio.randint(500, 3000), indice) for indice in range(sorteio.randint(0, 3))]
+    otimizador = OtimizadorCortes()
+    rapido = otimizador.otimizar(pecas, barras, retalhos=retalhos)
+    exato = otimizador.otimizar(pecas, barras, modo='exato', tempo_limite=1.0, retalhos=retalhos)
+    assert exato['modo'] == 'exato'
+    _verificar_plano(exato, pecas, 3, barras, retalhos)
+    assert _material_novo(exato) <= _material_novo(rapido)
+
+def test_modo_exato_encontra_o_otimo():
+    # Best-fit decreasing usa 3 barras; o ótimo usa 2 (3000+1000+2000 e 2500+2500+1000)
+    pecas = [{'tamanho': tamanho, 'quantidade': 1} for tamanho in (3000, 2500, 2500, 2000, 1000, 1000)]
+    otimizador = OtimizadorCortes()
+    assert otimizador.otimizar(pecas, tolerancia=0)['totalBarras'] == 3
+    exato = otimizador.otimizar(pecas, tolerancia=0, modo='exato')
+    assert exato['totalBarras'] == 2 and exato['otimo']
+
+def test_cache_indexado_pelo_multiconjunto_estoque_e_retalhos():
+    otimizador = OtimizadorCortes()
+    pecas = [{'tamanho': 1000, 'quantidade': 2, 'descricao': 'A'}, {'tamanho': 500, 'quantidade': 1, 'descricao': 'B'}]
+    primeiro = otimizador.otimizar(pecas)
+    # Ordem e descrições das peças não mudam o plano em cache
+    reordenado = otimizador.otimizar([{'tamanho': 500, 'quantidade': 1, 'descricao': 'C'},
+                                      {'tamanho': 1000, 'quantidade': 2, 'descricao': 'D'}])
+    assert len(otimizador._cache) == 1
+    assert [barra['espacoRestante'] for barra in reordenado['barras']] == [barra['espacoRestante'] for barra in primeiro['barras']]
+    assert {peca['descricao'] for peca in reordenado['barras'][0]['pecas']} == {'C', 'D'}
+
+    # Outro estoque ou outros retalhos não reaproveitam o plano
+    com_estoque = otimizador.otimizar(pecas, [{'tamanho': 3000, 'quantidade': 1}])
+    assert com_estoque['barras'][0]['tamanhoTotal'] == 3000
+    com_retalho = otimizador.otimizar(pecas, retalhos=[(2600, 7)])
+    assert com_retalho['barras'][0]['retalhoId'] == 7
+    assert len(otimizador._cache) == 3
+
+    # Mesmos comprimentos de retalhos, outros IDs: o plano em cache usa os IDs atuais
+    assert otimizador.otimizar(pecas, retalhos=[(2600, 8)])['barras'][0]['retalhoId'] == 8
+    assert len(otimizador._cache) == 3
+
+@pytest.mark.parametrize('semente', range(5))
+def test_arvore_fenwick_primeiro_ocupado(semente):
+    sorteio = random.Random(semente)
+    tamanho = sorteio.randint(1, 40)
+    arvore = _ArvoreFenwick(tamanho)
+    contagens = [0] * tamanho
+    for _ in range(200):
+        posicao = sorteio.randrange(tamanho)
+        valor = -1 if contagens[posicao] and sorteio.random() < 0.5 else 1
+        arvore.somar(posicao, valor)
+        contagens[posicao] += valor
+        inicio = sorteio.randrange(tamanho)
+        esperado = next((indice for indice in range(inicio, tamanho) if contagens[indice]), None)
+        assert arvore.primeiro_ocupado(inicio) == esperado
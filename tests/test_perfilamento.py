@@ -0,0 +1,90 @@
+import os
+import time
+
+import pytest
+from werkzeug.test import Client
+
+from perfilamento import (
+    CABECALHO_ARQUIVO, CABECALHO_PERFIL, MiddlewarePerfil, assinar_perfil, assinatura_valida, perfil_ativo
+)
+
+CHAVE = 'chave-de-testes'
+
+def test_assinatura_valida():
+    valor = assinar_perfil(CHAVE, '/api/projetos')
+    assert assinatura_valida(CHAVE, valor, '/api/projetos')
+
+def test_assinatura_de_outro_caminho_ou_chave():
+    valor = assinar_perfil(CHAVE, '/api/projetos')
+    assert not assinatura_valida(CHAVE, valor, '/api/materiais')
+    assert not assinatura_valida('outra-chave', valor, '/api/projetos')
+
+def test_assinatura_expirada():
+    valor = assinar_perfil(CHAVE, '/api/projetos', validade=-1)
+    assert not assinatura_valida(CHAVE, valor, '/api/projetos')
+
+def test_assinatura_com_validade_alterada():
+    expira, _, assinatura = assinar_perfil(CHAVE, '/api/projetos').partition(':')
+    assert not assinatura_valida(CHAVE, f'{int(expira) + 3600}:{assinatura}', '/api/projetos')
+    alterada = assinatura[:-1] + ('1' if assinatura[-1] == '0' else '0')
+    assert not assinatura_valida(CHAVE, f'{expira}:{alterada}', '/api/projetos')
+
+@pytest.mark.parametrize('valor', ['', ':', 'abc', 'amanha:abc', f'{int(time.time()) + 60}', f'{int(time.time()) + 60}:'])
+def test_assinatura_malformada(valor):
+    assert not assinatura_valida(CHAVE, valor, '/api/projetos')
+
+def aplicacao(environ, start_response):
+    """Aplicação WSGI mínima que informa se a requisição está sob perfil"""
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'perfil' if perfil_ativo() else b'normal']
+
+def _arquivos(diretorio):
+    return sorted(os.listdir(diretorio))
+
+def _requisicao(cliente, caminho, **cabecalhos):
+    resposta = cliente.get(caminho, headers=cabecalhos)
+    corpo = resposta.get_data()
+    # O perfil é concluído quando o servidor fecha a resposta
+    resposta.close()
+    return resposta, corpo
+
+def test_requisicao_assinada_grava_perfil(tmp_path):
+    cliente = Client(MiddlewarePerfil(aplicacao, str(tmp_path), chave=CHAVE))
+    resposta, corpo = _requisicao(cliente, '/api/projetos', **{CABECALHO_PERFIL: assinar_perfil(CHAVE, '/api/projetos')})
+    assert corpo == b'perfil'
+    nome = resposta.headers[CABECALHO_ARQUIVO]
+    assert _arquivos(tmp_path) == [f'{nome}.folded', f'{nome}.prof']
+    assert (tmp_path / f'{nome}.prof').stat().st_size > 0
+    assert not perfil_ativo()
+
+@pytest.mark.parametrize('valor', [None, 'outra', 'caminho_errado'])
+def test_requisicao_sem_assinatura_valida_nao_e_perfilada(tmp_path, valor):
+    cliente = Client(MiddlewarePerfil(aplicacao, str(tmp_path), chave=CHAVE))
+    cabecalhos = {}
+    if valor == 'outra':
+        cabecalhos[CABECALHO_PERFIL] = assinar_perfil('outra-chave', '/api/projetos')
+    elif valor == 'caminho_errado':
+        cabecalhos[CABECALHO_PERFIL] = assinar_perfil(CHAVE, '/api/materiais')
+    resposta, corpo = _requisicao(cliente, '/api/projetos', **cabecalhos)
+    assert corpo == b'normal'
+    assert CABECALHO_ARQUIVO not in resposta.headers
+    assert _arquivos(tmp_path) == []
+
+def test_sem_chave_configurada_ignora_cabecalho(tmp_path):
+    cliente = Client(MiddlewarePerfil(aplicacao, str(tmp_path), chave=None))
+    resposta, corpo = _requisicao(cliente, '/', **{CABECALHO_PERFIL: assinar_perfil('', '/')})
+    assert corpo == b'normal'
+    assert _arquivos(tmp_path) == []
+
+def test_amostragem_e_limite_de_arquivos(tmp_path):
+    cliente = Client(MiddlewarePerfil(aplicacao, str(tmp_path), taxa_amostragem=1.0, max_arquivos=2))
+    nomes = []
+    for _ in range(4):
+        resposta, corpo = _requisicao(cliente, '/api/materiais')
+        assert corpo == b'perfil'
+        nomes.append(resposta.headers[CABECALHO_ARQUIVO])
+        # Horários de modificação distintos para a ordem dos perfis
+        time.sleep(0.01)
+    assert _arquivos(tmp_path) == sorted(
+        f'{nome}{extensao}' for nome in nomes[-2:] for extensao in ('.folded', '.prof')
+    )
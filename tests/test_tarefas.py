@@ -0,0 +1,128 @@
+import time
+
+import pytest
+
+from tarefas import FilaCheia, GerenciadorTarefas, TarefaExpirada
+
+# Funções executadas nos processos do pool (precisam ser de nível de módulo)
+
+def dormir(segundos):
+    time.sleep(segundos)
+    return segundos
+
+def dobro(valor):
+    return 2 * valor
+
+def falhar(mensagem):
+    raise ValueError(mensagem)
+
+def _aguardar(condicao, limite=10):
+    """Espera até a condição ser verdadeira, por no máximo `limite` segundos"""
+    fim = time.time() + limite
+    while not condicao():
+        if time.time() > fim:
+            return False
+        time.sleep(0.05)
+    return True
+
+@pytest.fixture
+def criar_gerenciador():
+    gerenciadores = []
+
+    def criar(**parametros):
+        gerenciador = GerenciadorTarefas(**parametros)
+        gerenciadores.append(gerenciador)
+        return gerenciador
+
+    yield criar
+    for gerenciador in gerenciadores:
+        if gerenciador._pool is not None:
+            for processo in list((gerenciador._pool._processes or {}).values()):
+                processo.terminate()
+            gerenciador._pool.shutdown(wait=False, cancel_futures=True)
+
+def test_executar_no_pool(criar_gerenciador):
+    gerenciador = criar_gerenciador(max_processos=2, max_fila=4, tempo_limite=30)
+    assert gerenciador.executar(dobro, 21) == 42
+    with pytest.raises(ValueError, match='erro da tarefa'):
+        gerenciador.executar(falhar, 'erro da tarefa')
+    assert _aguardar(lambda: gerenciador.em_andamento() == 0)
+
+def test_sem_pool_executa_na_propria_thread(criar_gerenciador):
+    gerenciador = criar_gerenciador(max_processos=0)
+    assert gerenciador.executar(dobro, 4) == 8
+    assert list(gerenciador.mapear(dobro, range(10))) == [2 * valor for valor in range(10)]
+    assert gerenciador._pool is None
+
+def test_fila_cheia(criar_gerenciador):
+    gerenciador = criar_gerenciador(max_processos=2, max_fila=2, tempo_limite=30)
+    ids = [gerenciador.enviar(dormir, 0.5) for _ in range(2)]
+    with pytest.raises(FilaCheia):
+        gerenciador.enviar(dobro, 1)
+    with pytest.raises(FilaCheia):
+        gerenciador.executar(dobro, 1)
+
+    assert _aguardar(lambda: all(gerenciador.consultar(tarefa_id)['status'] == 'concluida' for tarefa_id in ids))
+    assert _aguardar(lambda: gerenciador.em_andamento() == 0)
+    assert gerenciador.executar(dobro, 1) == 2
+
+def test_executar_expira_e_libera_a_vaga(criar_gerenciador):
+    gerenciador = criar_gerenciador(max_processos=1, max_fila=1, tempo_limite=0.5)
+    inicio = time.time()
+    with pytest.raises(TarefaExpirada):
+        gerenciador.executar(dormir, 30)
+    assert time.time() - inicio < 5
+
+    # A vaga é liberada quando o pool antigo é encerrado
+    assert _aguardar(lambda: gerenciador.em_andamento() == 0)
+    assert gerenciador.executar(dobro, 21) == 42
+
+def test_tarefa_enviada_expira(criar_gerenciador):
+    gerenciador = criar_gerenciador(max_processos=1, max_fila=2, tempo_limite=30)
+    tarefa_id = gerenciador.enviar(dormir, 30, tempo_limite=0.3)
+    assert _aguardar(lambda: gerenciador.consultar(tarefa_id)['status'] == 'expirada')
+    assert isinstance(gerenciador.consultar(tarefa_id)['erro'], TarefaExpirada)
+    assert _aguardar(lambda: gerenciador.em_andamento() == 0)
+
+def test_mapear_preserva_a_ordem_e_libera_a_reserva(criar_gerenciador):
+    gerenciador = criar_gerenciador(max_processos=2, max_fila=6, tempo_limite=30)
+    resultados = gerenciador.mapear(dobro, range(20))
+    assert gerenciador.em_andamento() == 4
+    assert list(resultados) == [2 * valor for valor in range(20)]
+    assert _aguardar(lambda: gerenciador.em_andamento() == 0)
+
+    # Gerador descartado sem ser percorrido até o fim
+    resultados = gerenciador.mapear(dobro, range(20))
+    assert next(resultados) == 0
+    resultados.close()
+    assert _aguardar(lambda: gerenciador.em_andamento() == 0)
+
+def test_mapear_nao_conta_a_vaga_duas_vezes(criar_gerenciador, monkeypatch):
+    gerenciador = criar_gerenciador(max_processos=2, max_fila=6, tempo_limite=30)
+    # result() pode retornar antes do callback que libera a vaga: simula o
+    # callback atrasado desligando-o
+    monkeypatch.setattr(gerenciador, '_liberar', lambda future: None)
+    ocupacao = []
+    for _ in gerenciador.mapear(dobro, range(20)):
+        ocupacao.append(gerenciador.em_andamento())
+    assert max(ocupacao) <= 4
+    assert gerenciador.em_andamento() == 0
+
+def test_mapear_com_fila_cheia(criar_gerenciador):
+    gerenciador = criar_gerenciador(max_processos=2, max_fila=4, tempo_limite=30)
+    tarefa_id = gerenciador.enviar(dormir, 0.5)
+    with pytest.raises(FilaCheia):
+        gerenciador.mapear(dobro, range(10))
+    # A reserva não foi feita: apenas a tarefa enviada ocupa a fila
+    assert gerenciador.em_andamento() == 1
+
+    assert _aguardar(lambda: gerenciador.consultar(tarefa_id)['status'] == 'concluida')
+    assert _aguardar(lambda: gerenciador.em_andamento() == 0)
+    assert list(gerenciador.mapear(dobro, range(10))) == [2 * valor for valor in range(10)]
+
+def test_mapear_expira(criar_gerenciador):
+    gerenciador = criar_gerenciador(max_processos=2, max_fila=6, tempo_limite=0.5)
+    with pytest.raises(TarefaExpirada):
+        list(gerenciador.mapear(dormir, [0, 0, 30, 0, 0]))
+    assert _aguardar(lambda: gerenciador.em_andamento() == 0)
+    assert gerenciador.executar(dobro, 2) == 4
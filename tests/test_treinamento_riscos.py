@@ -0,0 +1,101 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+import routes.main
+from banco_dados import caminho_banco
+from classificador_riscos import ClassificadorRiscos
+from treinamento_riscos import (
+    ARQUIVO_MANIFESTO, DIRETORIO_MODELOS, VERSOES_MANTIDAS,
+    carregar_amostras, carregar_modelo, ler_manifesto, marca_publicacao, publicar_modelo, treinar_modelo
+)
+
+@pytest.fixture(scope='module')
+def modelo_treinado():
+    return treinar_modelo(np.empty((0, 3)), np.empty(0, dtype=int), n_jobs=1)
+
+def _arquivos_versoes(diretorio):
+    return sorted(nome for nome in os.listdir(diretorio) if nome.endswith('.joblib'))
+
+def test_publicacao_de_versoes(tmp_path, modelo_treinado):
+    diretorio = str(tmp_path)
+    assert ler_manifesto(diretorio) is None
+    assert marca_publicacao(diretorio) is None
+
+    marcas = []
+    for versao in range(2, 7):
+        manifesto = publicar_modelo(*modelo_treinado, diretorio, amostras=versao)
+        assert manifesto['versao'] == versao
+        assert ler_manifesto(diretorio) == manifesto
+        marcas.append(marca_publicacao(diretorio))
+
+        # Apenas as VERSOES_MANTIDAS mais recentes ficam em disco
+        mantidas = range(max(2, versao - VERSOES_MANTIDAS + 1), versao + 1)
+        assert _arquivos_versoes(diretorio) == sorted(
+            nome for v in mantidas for nome in (f'modelo_v{v}.joblib', f'scaler_v{v}.joblib')
+        )
+    assert len(set(marcas)) == len(marcas)
+
+    # Nenhum arquivo temporário sobra da publicação
+    assert sorted(os.listdir(diretorio)) == sorted([ARQUIVO_MANIFESTO] + _arquivos_versoes(diretorio))
+
+    modelo, scaler = carregar_modelo(ler_manifesto(diretorio), diretorio)
+    X = np.array([[0.3, 0.0, 0.0], [4.0, 0.5, 0.5], [12.0, 1.0, 1.0]])
+    assert np.array_equal(modelo.predict(scaler.transform(X)), modelo_treinado[0].predict(modelo_treinado[1].transform(X)))
+
+def test_publicacao_nao_regride_versao(tmp_path, modelo_treinado):
+    diretorio = str(tmp_path)
+    publicar_modelo(*modelo_treinado, diretorio)
+    # Outro processo já ocupou o próximo número de versão
+    (tmp_path / 'modelo_v3.joblib').write_bytes(b'')
+    manifesto = publicar_modelo(*modelo_treinado, diretorio)
+    assert manifesto['versao'] == 4
+    assert ler_manifesto(diretorio)['versao'] == 4
+
+def test_classificador_carrega_versao_publicada(tmp_path, modelo_treinado):
+    manifesto = publicar_modelo(*modelo_treinado, str(tmp_path))
+    classificador = ClassificadorRiscos(diretorio_modelos=str(tmp_path))
+    assert classificador.versao_modelo == manifesto['versao']
+    assert classificador.tabela_compilada is not None
+
+def test_atualizar_modelo_registra_amostras_e_publica(app, tmp_path, conexao):
+    classificador = ClassificadorRiscos(diretorio_modelos=str(tmp_path))
+    projeto = {'altura_maxima': 1.0, 'complexidade': 'baixa', 'ambiente': 'controlado'}
+    classificador.classificar(projeto)
+    total_antes = len(carregar_amostras(conexao)[1])
+
+    novos_dados = [([1.0, 0.0, 0.0], 3)] * 40 + [([14.0, 1.0, 1.0], 3)]
+    assert classificador.atualizar_modelo(novos_dados, caminho_banco(app.config['DATABASE']), n_jobs=1)
+    assert classificador.atualizar_modelo([], caminho_banco(app.config['DATABASE'])) is False
+
+    X, y = carregar_amostras(conexao)
+    assert len(y) == total_antes + len(novos_dados)
+    assert X[-1].tolist() == [14.0, 1.0, 1.0] and y[-1] == 3
+
+    manifesto = ler_manifesto(str(tmp_path))
+    assert manifesto['versao'] == classificador.versao_modelo == 2
+    assert manifesto['amostras'] == len(y)
+    assert classificador.estatisticas_cache()['tamanho'] == 0
+
+def test_troca_do_classificador_apos_publicacao(app, modelo_treinado):
+    anterior = routes.main.get_classificador()
+    versao_anterior = anterior.versao_modelo
+    routes.main._verificacao_modelo['proxima'] = time.monotonic() + 60
+
+    manifesto = publicar_modelo(*modelo_treinado, DIRETORIO_MODELOS)
+    assert manifesto['versao'] > versao_anterior
+    # Até a próxima verificação, o classificador em uso não muda
+    assert routes.main.get_classificador() is anterior
+
+    routes.main._verificacao_modelo['proxima'] = 0
+    novo = routes.main.get_classificador()
+    assert novo is not anterior
+    assert novo.versao_modelo == manifesto['versao']
+    assert novo.tabela_compilada is not None
+    # O classificador anterior (em uso por requisições em andamento) não é alterado
+    assert anterior.versao_modelo == versao_anterior
+
+    routes.main._verificacao_modelo['proxima'] = 0
+    assert routes.main.get_classificador() is novo
@@ -0,0 +1,32 @@
+import random
+
+import pytest
+
+from benchmarks.varredura_texto import gerar_texto, resultados_referencia, resultados_varredura
+
+TEXTOS = [
+    '',
+    'Comprimento: 4,5 m largura 3m altura: 2.8m',
+    'COMPRIMENTO 12 M, LARGURA: 6,25M, PROFUNDIDADE 1,2 m',
+    'Vão livre de 3m x 4m com h = 2,5 m',
+    'c = 7 m, l = 2 m, alt: 3,1 m',
+    'Cobertura 10x12 em telha metálica sobre estrutura de metalon',
+    'Portão de correr em aço galvanizado com pintura eletrostática',
+    'Escada helicoidal, guarda-corpo em inox e corrimão de alumínio',
+    '2,5 × 3,75',
+]
+
+@pytest.mark.parametrize('texto', TEXTOS)
+def test_textos_conhecidos(texto):
+    assert resultados_varredura(texto) == resultados_referencia(texto)
+
+@pytest.mark.parametrize('inicio', range(0, 2000, 250))
+def test_textos_aleatorios(inicio):
+    for semente in range(inicio, inicio + 250):
+        texto = gerar_texto(random.Random(semente).randint(1, 400), semente)
+        assert resultados_varredura(texto) == resultados_referencia(texto), texto
+
+@pytest.mark.parametrize('semente', [1, 2, 3])
+def test_textos_longos(semente):
+    texto = gerar_texto(20000, semente)
+    assert resultados_varredura(texto) == resultados_referencia(texto)
@@ -0,0 +1,206 @@
+import json
+import os
+import time
+import uuid
+import numpy as np
+import joblib
+from banco_dados import abrir_conexao
+
+# Níveis de risco na ordem dos índices previstos pelo modelo (0-3)
+NIVEIS_RISCO = ('baixo', 'medio', 'alto', 'muito_alto')
+
+# Diretório dos modelos publicados e arquivo que aponta para a versão atual
+DIRETORIO_MODELOS = os.environ.get('MODELOS_RISCO_DIR', 'modelos_risco')
+ARQUIVO_MANIFESTO = 'atual.json'
+
+# Versões publicadas mantidas em disco (workers ainda podem estar lendo as anteriores)
+VERSOES_MANTIDAS = 3
+
+# Paralelismo do treinamento (-1 = todos os núcleos) e tempo limite do retreino em segundo plano
+TREINO_N_JOBS = int(os.environ.get('RISCO_TREINO_N_JOBS', -1))
+TEMPO_LIMITE_TREINO = int(os.environ.get('RISCO_TREINO_TEMPO_LIMITE', 600))
+
+def dados_sinteticos(semente=None):
+    """
+    Exemplos sintéticos baseados nas regras de classificação (50 por nível),
+    usados como base do treinamento para que o modelo funcione mesmo sem
+    dados históricos reais. Retorna (X, y).
+    """
+    rng = np.random.default_rng(semente)
+    # (altura, complexidade, ambiente): faixas de cada nível de risco
+    # complexidade 0=baixa, 0.5=média, 1=alta; ambiente 0=controlado, 0.5=externo, 1=externo_adverso
+    faixas = (
+        ((0, 0.5), (0, 0.3), (0, 0.3)),      # baixo
+        ((0.5, 2.0), (0, 0.6), (0, 0.6)),    # médio
+        ((2.0, 6.0), (0.3, 0.8), (0.3, 0.8)),  # alto
+        ((6.0, 15.0), (0.5, 1.0), (0.5, 1.0))  # muito alto
+    )
+    X = np.concatenate([
+        np.column_stack([rng.uniform(minimo, maximo, 50) for minimo, maximo in faixa])
+        for faixa in faixas
+    ])
+    y = np.repeat(np.arange(len(faixas)), 50)
+    return X, y
+
+def registrar_amostras(conn, amostras):
+    """
+    Insere amostras rotuladas (sem commit) e retorna a quantidade inserida.
+    Cada amostra é uma tupla (altura, complexidade, ambiente, nivel, projeto_id),
+    com as características já convertidas para os valores do modelo.
+    """
+    criada_em = time.time()
+    conn.executemany('''
+    INSERT INTO amostras_risco (altura, complexidade, ambiente, nivel, projeto_id, criada_em)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ''', [tuple(amostra) + (criada_em,) for amostra in amostras])
+    return len(amostras)
+
+def carregar_amostras(conn):
+    """Todas as amostras rotuladas, como (X, y)"""
+    linhas = conn.execute('SELECT altura, complexidade, ambiente, nivel FROM amostras_risco ORDER BY id').fetchall()
+    if not linhas:
+        return np.empty((0, 3)), np.empty(0, dtype=int)
+    dados = np.array(linhas, dtype=float)
+    return dados[:, :3], dados[:, 3].astype(int)
+
+def treinar_modelo(X, y, n_jobs=TREINO_N_JOBS):
+    """
+    Treina scaler e floresta sobre os exemplos sintéticos somados às
+    amostras informadas. Retorna (modelo, scaler).
+    """
+    # Importado apenas quando é preciso treinar
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    X_base, y_base = dados_sinteticos(semente=42)
+    X = np.concatenate([X_base, np.asarray(X, dtype=float).reshape(-1, 3)])
+    y = np.concatenate([y_base, np.asarray(y, dtype=int)])
+
+    scaler = StandardScaler()
+    modelo = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=n_jobs)
+    modelo.fit(scaler.fit_transform(X), y)
+    # Predições nos workers são de poucas linhas: sem paralelismo
+    modelo.set_params(n_jobs=None)
+    return modelo, scaler
+
+def ler_manifesto(diretorio=DIRETORIO_MODELOS):
+    """Manifesto da versão publicada ({versao, modelo, scaler, ...}) ou None"""
+    try:
+        with open(os.path.join(diretorio, ARQUIVO_MANIFESTO), encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+
+def _gravar_temporario(diretorio, escrever):
+    """Grava um arquivo temporário no diretório de destino e retorna seu caminho"""
+    caminho = os.path.join(diretorio, f'.tmp-{uuid.uuid4().hex}')
+    try:
+        escrever(caminho)
+    except BaseException:
+        if os.path.exists(caminho):
+            os.remove(caminho)
+        raise
+    return caminho
+
+def publicar_modelo(modelo, scaler, diretorio=DIRETORIO_MODELOS, amostras=0):
+    """
+    Publica uma nova versão do modelo sem afetar quem está lendo a atual:
+    modelo e scaler são gravados em arquivos temporários e ligados a nomes
+    com o número da versão (a criação falha se outro processo já tiver
+    publicado o mesmo número, e o próximo é tentado); por fim o manifesto é
+    substituído atomicamente com os.replace. Retorna o novo manifesto.
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    temporarios = [
+        _gravar_temporario(diretorio, lambda caminho: joblib.dump(modelo, caminho)),
+        _gravar_temporario(diretorio, lambda caminho: joblib.dump(scaler, caminho))
+    ]
+    try:
+        atual = ler_manifesto(diretorio)
+        # A versão 1 é a do modelo original (arquivos na raiz do projeto)
+        versao = (atual['versao'] if atual else 1) + 1
+        while True:
+            nomes = [f'modelo_v{versao}.joblib', f'scaler_v{versao}.joblib']
+            try:
+                os.link(temporarios[0], os.path.join(diretorio, nomes[0]))
+            except FileExistsError:
+                versao += 1
+                continue
+            os.replace(temporarios[1], os.path.join(diretorio, nomes[1]))
+            break
+
+        manifesto = {
+            'versao': versao,
+            'modelo': nomes[0],
+            'scaler': nomes[1],
+            'amostras': int(amostras),
+            'publicado_em': time.time()
+        }
+        # Não regredir se outro processo publicou uma versão mais nova enquanto isso
+        atual = ler_manifesto(diretorio)
+        if atual is None or atual['versao'] < versao:
+            caminho = _gravar_temporario(
+                diretorio,
+                lambda caminho: _escrever_json(caminho, manifesto)
+            )
+            os.replace(caminho, os.path.join(diretorio, ARQUIVO_MANIFESTO))
+    finally:
+        for caminho in temporarios:
+            if os.path.exists(caminho):
+                os.remove(caminho)
+
+    _remover_versoes_antigas(diretorio, versao)
+    return manifesto
+
+def _escrever_json(caminho, dados):
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(dados, arquivo)
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+
+def _remover_versoes_antigas(diretorio, versao):
+    """Remove os arquivos das versões anteriores às VERSOES_MANTIDAS mais recentes"""
+    for nome in os.listdir(diretorio):
+        prefixo, _, resto = nome.partition('_v')
+        if prefixo in ('modelo', 'scaler') and resto.endswith('.joblib'):
+            try:
+                if int(resto[:-len('.joblib')]) <= versao - VERSOES_MANTIDAS:
+                    os.remove(os.path.join(diretorio, nome))
+            except (ValueError, OSError):
+                pass
+
+def marca_publicacao(diretorio=DIRETORIO_MODELOS):
+    """
+    Marca barata da versão publicada (inode, mtime e tamanho do manifesto),
+    sem ler o arquivo; muda a cada publicação, já que o manifesto é
+    substituído por os.replace. None se não houver modelo publicado.
+    """
+    try:
+        info = os.stat(os.path.join(diretorio, ARQUIVO_MANIFESTO))
+    except OSError:
+        return None
+    return (info.st_ino, info.st_mtime_ns, info.st_size)
+
+def carregar_modelo(manifesto, diretorio=DIRETORIO_MODELOS):
+    """Carrega (modelo, scaler) da versão descrita pelo manifesto"""
+    modelo = joblib.load(os.path.join(diretorio, manifesto['modelo']))
+    scaler = joblib.load(os.path.join(diretorio, manifesto['scaler']))
+    return modelo, scaler
+
+def retreinar_modelo(caminho_banco, diretorio=DIRETORIO_MODELOS, n_jobs=TREINO_N_JOBS):
+    """
+    Tarefa de retreino (executada no pool de tarefas): treina sobre todo o
+    histórico de amostras rotuladas e publica uma nova versão.
+    Retorna o manifesto publicado.
+    """
+    conn = abrir_conexao(caminho_banco)
+    try:
+        X, y = carregar_amostras(conn)
+    finally:
+        conn.fechar()
+
+    inicio = time.perf_counter()
+    modelo, scaler = treinar_modelo(X, y, n_jobs)
+    manifesto = publicar_modelo(modelo, scaler, diretorio, amostras=len(y))
+    manifesto['tempo_treino'] = time.perf_counter() - inicio
+    return manifesto
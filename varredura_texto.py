@@ -0,0 +1,344 @@
+import re
+import numpy as np
+
+# Padrões de dimensões (primeira ocorrência de cada um)
+PADROES_DIMENSOES = {
+    'comprimento': r'comprimento[:\s]*(\d+[.,]?\d*)[\s]*m',
+    'largura': r'largura[:\s]*(\d+[.,]?\d*)[\s]*m',
+    'altura': r'altura[:\s]*(\d+[.,]?\d*)[\s]*m',
+    'profundidade': r'profundidade[:\s]*(\d+[.,]?\d*)[\s]*m'
+}
+
+# Padrões alternativos, usados quando o principal não é encontrado
+PADROES_DIMENSOES_ALT = {
+    'comprimento': [r'(\d+[.,]?\d*)[\s]*m[\s]*[x×]', r'c\s*=\s*(\d+[.,]?\d*)[\s]*m'],
+    'largura': [r'[x×][\s]*(\d+[.,]?\d*)[\s]*m', r'l\s*=\s*(\d+[.,]?\d*)[\s]*m'],
+    'altura': [r'h\s*=\s*(\d+[.,]?\d*)[\s]*m', r'alt[:\s]*(\d+[.,]?\d*)[\s]*m']
+}
+
+# Padrão "LxC", usado quando comprimento ou largura não foram encontrados
+# (diferencia maiúsculas de minúsculas)
+PADRAO_LARGURA_X_COMPRIMENTO = r'(\d+[.,]?\d*)[\s]*[x×][\s]*(\d+[.,]?\d*)'
+
+# Elementos estruturais: todas as ocorrências são contadas
+PADROES_ELEMENTOS = {
+    'viga': r'viga[s]?',
+    'coluna': r'coluna[s]?',
+    'pilar': r'pilar(es)?',
+    'treliça': r'treliça[s]?',
+    'perfil': r'perfil(is)?',
+    'metalon': r'metalon',
+    'chapa': r'chapa[s]?',
+    'telha': r'telha[s]?',
+    'grade': r'grade[s]?',
+    'tela': r'tela[s]?',
+    'vidro': r'vidro[s]?'
+}
+
+# Distância (em caracteres) em que se buscam quantidade e dimensões de um elemento
+CONTEXTO_ELEMENTO = 50
+
+# Materiais comuns em serralheria: basta uma ocorrência
+PADROES_MATERIAIS = {
+    'Tubo Metalon 20x20': r'metalon[\s]*20[\s]*x[\s]*20',
+    'Tubo Metalon 30x30': r'metalon[\s]*30[\s]*x[\s]*30',
+    'Tubo Metalon 40x40': r'metalon[\s]*40[\s]*x[\s]*40',
+    'Tubo Metalon 50x30': r'metalon[\s]*50[\s]*x[\s]*30',
+    'Chapa Galvanizada #18': r'chapa[\s]*galvanizada[\s]*#?18',
+    'Chapa Galvanizada #20': r'chapa[\s]*galvanizada[\s]*#?20',
+    'Telha Trapezoidal': r'telha[\s]*trapezoidal',
+    'Parafuso Autobrocante': r'parafuso[\s]*autobrocante',
+    'Eletrodo 6013': r'eletrodo[\s]*6013',
+    'Disco de Corte': r'disco[\s]*de[\s]*corte',
+    'Tinta Anticorrosiva': r'tinta[\s]*anticorrosiva'
+}
+
+# Caracteres que re.IGNORECASE considera iguais a letras minúsculas, mas que
+# str.lower() não converte (ou converte em mais de um caractere)
+_EQUIVALENTES_MINUSCULAS = {'İ': 'i', 'ı': 'i', 'ſ': 's'}
+
+def _minusculas(texto):
+    """
+    Texto em minúsculas, com o mesmo tamanho do original, em que padrões
+    em minúsculas casam exatamente como com re.IGNORECASE no original.
+    Sem a flag, o motor de regex consegue saltar direto aos candidatos.
+    """
+    for caractere, equivalente in _EQUIVALENTES_MINUSCULAS.items():
+        if caractere in texto:
+            texto = texto.replace(caractere, equivalente)
+    return texto.lower()
+
+def _sem_captura(padrao):
+    """Troca os grupos de captura do padrão por grupos sem captura"""
+    return re.sub(r'\((?!\?)', '(?:', padrao)
+
+def _grupo(padrao):
+    """Grupo de despacho de um padrão: seu primeiro caractere"""
+    if padrao.startswith('(\\d'):
+        return 'digito'
+    if padrao.startswith('[x×]'):
+        return 'x'
+    return padrao[0]
+
+def _resto(padrao):
+    """Parte do padrão após o primeiro caractere (para a expressão combinada)"""
+    padrao = _sem_captura(padrao)
+    if padrao.startswith('(?:\\d+'):
+        return '(?:\\d*' + padrao[len('(?:\\d+'):]
+    if padrao.startswith('[x×]'):
+        return padrao[len('[x×]'):]
+    return padrao[1:]
+
+class VarredorTexto:
+    """
+    Varre o texto de um documento uma única vez e identifica dimensões,
+    elementos estruturais e materiais, com os mesmos resultados da busca
+    padrão a padrão (re.search / re.finditer com re.IGNORECASE).
+
+    Uma expressão combinada localiza as posições em que algum padrão casa;
+    em cada uma, só os padrões com o mesmo primeiro caractere são testados,
+    ancorados na posição. Padrões que só precisam da primeira ocorrência
+    (dimensões e materiais) saem da expressão combinada assim que são
+    encontrados. A quantidade de cada elemento vem do número imediatamente
+    anterior a ele, sem novas buscas no contexto.
+    """
+
+    def __init__(self, dimensoes=True, elementos=True, materiais=True):
+        self.dimensoes = dimensoes
+        self.elementos = elementos
+        self.materiais = materiais
+
+        # (tipo, chave, padrão, diferencia maiúsculas)
+        padroes = []
+        if dimensoes:
+            for dim, padrao in PADROES_DIMENSOES.items():
+                padroes.append(('dimensao', dim, padrao, False))
+            for dim, lista in PADROES_DIMENSOES_ALT.items():
+                for i, padrao in enumerate(lista):
+                    padroes.append(('dimensao_alt', (dim, i), padrao, False))
+            padroes.append(('largura_x_comprimento', None, PADRAO_LARGURA_X_COMPRIMENTO, True))
+        if elementos:
+            for elemento, padrao in PADROES_ELEMENTOS.items():
+                padroes.append(('elemento', elemento, padrao, False))
+        if materiais:
+            for material, padrao in PADROES_MATERIAIS.items():
+                padroes.append(('material', material, padrao, False))
+
+        # Cada padrão: (índice, tipo, chave, grupo, padrão ancorado, diferencia
+        # maiúsculas, resto para a expressão combinada). A expressão combinada
+        # roda no texto em minúsculas; os padrões que diferenciam maiúsculas
+        # são confirmados no texto original.
+        self._padroes = [
+            (indice, tipo, chave, _grupo(padrao), re.compile(padrao), diferencia, _resto(padrao))
+            for indice, (tipo, chave, padrao, diferencia) in enumerate(padroes)
+        ]
+
+        self._buscas = {}
+
+    def _busca(self, ativos):
+        """
+        Expressão combinada dos padrões ativos (compilada uma vez por
+        conjunto). Retorna (expressão, candidatos), onde candidatos[n] são os
+        padrões a testar quando a alternativa marcada pelo grupo n casa: o
+        próprio padrão e os seguintes do mesmo grupo (os anteriores já
+        falharam na expressão combinada).
+        """
+        if ativos not in self._buscas:
+            # Padrões que buscam só a primeira ocorrência antes dos elementos,
+            # que só podem casar um por posição
+            por_grupo = {}
+            for padrao in sorted(self._padroes, key=lambda padrao: padrao[1] == 'elemento'):
+                if padrao[0] in ativos:
+                    por_grupo.setdefault(padrao[3], []).append(padrao)
+
+            alternativas = []
+            candidatos = {}
+            for grupo, lista in por_grupo.items():
+                if grupo == 'digito':
+                    inicio = r'\d(?<!\d\d)'
+                elif grupo == 'x':
+                    inicio = '[x×]'
+                else:
+                    inicio = re.escape(grupo)
+                # Um grupo vazio no fim de cada resto identifica o padrão que casou
+                restos = []
+                for i, padrao in enumerate(lista):
+                    candidatos[len(candidatos) + 1] = tuple(lista[i:])
+                    restos.append(f'{padrao[6]}()')
+                alternativas.append(f'{inicio}(?=(?:{"|".join(restos)}))')
+
+            busca = re.compile('|'.join(alternativas)) if alternativas else None
+            self._buscas[ativos] = (busca, candidatos)
+        return self._buscas[ativos]
+
+    def varrer(self, texto):
+        """
+        Retorna {'dimensoes': {...}, 'elementos': [...], 'materiais': [...]}.
+        As dimensões não incluem valores padrão para as não encontradas.
+        """
+        primeiros = {}      # primeira ocorrência de cada padrão de dimensão
+        encontrados = set() # materiais
+        ocorrencias = {elemento: [] for elemento in PADROES_ELEMENTOS}
+
+        minusculas = _minusculas(texto)
+
+        # Padrões ainda procurados (os de elementos ficam sempre ativos)
+        ativos = frozenset(padrao[0] for padrao in self._padroes)
+        posicao_inicial = 0
+        while True:
+            busca, candidatos = self._busca(ativos)
+            if busca is None:
+                break
+            resolvidos = []
+            for ancora in busca.finditer(minusculas, posicao_inicial):
+                posicao = ancora.start()
+                elemento_encontrado = False
+                for indice, tipo, chave, _, padrao, diferencia, _ in candidatos[ancora.lastindex]:
+                    if tipo == 'elemento':
+                        lista = ocorrencias[chave]
+                        # Ocorrências sem sobreposição, como em re.finditer
+                        if elemento_encontrado or (lista and posicao < lista[-1][1]):
+                            continue
+                        match = padrao.match(minusculas, posicao)
+                        if match:
+                            lista.append(match.span())
+                            elemento_encontrado = True
+                    else:
+                        match = padrao.match(texto if diferencia else minusculas, posicao)
+                        if match:
+                            if tipo == 'material':
+                                encontrados.add(chave)
+                            else:
+                                primeiros[(tipo, chave)] = match.groups()
+                            resolvidos.append(indice)
+
+                if resolvidos:
+                    # Recomeçar após esta posição sem os padrões já encontrados
+                    ativos = ativos.difference(resolvidos)
+                    posicao_inicial = posicao + 1
+                    break
+            else:
+                break
+
+        resultado = {'dimensoes': {}, 'elementos': [], 'materiais': []}
+        if self.dimensoes:
+            resultado['dimensoes'] = self._montar_dimensoes(primeiros)
+        if self.elementos:
+            resultado['elementos'] = self._montar_elementos(texto, ocorrencias)
+        if self.materiais:
+            resultado['materiais'] = [material for material in PADROES_MATERIAIS if material in encontrados]
+        return resultado
+
+    @staticmethod
+    def _montar_dimensoes(primeiros):
+        """Aplica a prioridade entre padrões principais, alternativos e "LxC\""""
+        dimensoes = {}
+        for dim in PADROES_DIMENSOES:
+            grupos = primeiros.get(('dimensao', dim))
+            if grupos:
+                dimensoes[dim] = float(grupos[0].replace(',', '.'))
+
+        for dim, lista in PADROES_DIMENSOES_ALT.items():
+            if dim not in dimensoes:
+                for i in range(len(lista)):
+                    grupos = primeiros.get(('dimensao_alt', (dim, i)))
+                    if grupos:
+                        dimensoes[dim] = float(grupos[0].replace(',', '.'))
+                        break
+
+        if 'comprimento' not in dimensoes or 'largura' not in dimensoes:
+            grupos = primeiros.get(('largura_x_comprimento', None))
+            if grupos:
+                dimensoes['largura'] = float(grupos[0].replace(',', '.'))
+                dimensoes['comprimento'] = float(grupos[1].replace(',', '.'))
+
+        return dimensoes
+
+    @staticmethod
+    def _montar_elementos(texto, ocorrencias):
+        """
+        Soma as quantidades de cada elemento. Para cada ocorrência, a
+        quantidade é o primeiro "N elemento" dentro de CONTEXTO_ELEMENTO
+        caracteres; as dimensões são o primeiro "NxN" no contexto da primeira
+        ocorrência (números cortados pelo limite do contexto são
+        considerados apenas na parte interna).
+        """
+        tamanho = len(texto)
+        elementos = []
+
+        for elemento in PADROES_ELEMENTOS:
+            lista = ocorrencias.get(elemento)
+            if not lista:
+                continue
+
+            # Ocorrências precedidas de número: (fim do número, início do número, início do elemento)
+            com_numero = []
+            for inicio, _ in lista:
+                fim_numero = inicio
+                while fim_numero > 0 and texto[fim_numero - 1].isspace():
+                    fim_numero -= 1
+                inicio_numero = fim_numero
+                while inicio_numero > 0 and texto[inicio_numero - 1].isdecimal():
+                    inicio_numero -= 1
+                if inicio_numero < fim_numero:
+                    com_numero.append((fim_numero, inicio_numero, inicio))
+
+            # Quantidade de cada ocorrência: o primeiro número seguido do
+            # elemento cujo fim está dentro do contexto (busca binária nos
+            # fins dos números, que são crescentes)
+            quantidade_total = len(lista)
+            if com_numero:
+                fins_numeros = np.array([numero[0] for numero in com_numero])
+                inicios_contexto = np.array([max(0, inicio - CONTEXTO_ELEMENTO) for inicio, _ in lista])
+                fins_contexto = np.array([fim + CONTEXTO_ELEMENTO for _, fim in lista])
+                posicoes = np.searchsorted(fins_numeros, inicios_contexto, side='right')
+                validas = posicoes < len(com_numero)
+                inicios_elementos = np.array([numero[2] for numero in com_numero] + [0])
+                validas &= inicios_elementos[posicoes] + len(elemento) <= fins_contexto
+                for i in np.flatnonzero(validas):
+                    fim_numero, inicio_numero, _ = com_numero[posicoes[i]]
+                    quantidade_total += int(texto[max(inicio_numero, inicios_contexto[i]):fim_numero]) - 1
+
+            # Dimensões: o primeiro "NxN" no contexto da primeira ocorrência
+            inicio, fim = lista[0]
+            contexto_inicio = max(0, inicio - CONTEXTO_ELEMENTO)
+            contexto_fim = min(tamanho, fim + CONTEXTO_ELEMENTO)
+            dimensoes = ''
+            juncao = next(
+                (j for j in range(contexto_inicio + 1, contexto_fim - 1)
+                 if texto[j] in 'x×' and texto[j - 1].isdecimal() and texto[j + 1].isdecimal()),
+                None
+            )
+            if juncao is not None:
+                esquerda = juncao
+                while esquerda > contexto_inicio and texto[esquerda - 1].isdecimal():
+                    esquerda -= 1
+                direita = juncao + 1
+                while direita < contexto_fim and texto[direita].isdecimal():
+                    direita += 1
+                dimensoes = f'{texto[esquerda:juncao]}x{texto[juncao + 1:direita]}'
+
+            elementos.append({
+                'tipo': elemento,
+                'quantidade': quantidade_total,
+                'dimensoes': dimensoes
+            })
+
+        return elementos
+
+_varredor = None
+_varredor_dimensoes = None
+
+def varrer_texto(texto):
+    """Dimensões (sem valores padrão), elementos e materiais do texto"""
+    global _varredor
+    if _varredor is None:
+        _varredor = VarredorTexto()
+    return _varredor.varrer(texto)
+
+def buscar_dimensoes(texto):
+    """Dimensões encontradas no texto, sem os valores padrão"""
+    global _varredor_dimensoes
+    if _varredor_dimensoes is None:
+        _varredor_dimensoes = VarredorTexto(elementos=False, materiais=False)
+    return _varredor_dimensoes.varrer(texto)['dimensoes']